@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Campaign, CampaignItem
+from .models import Campaign, CampaignItem, GenerationJob, ImageAsset
 
 class CampaignItemInline(admin.TabularInline):
     """
@@ -37,4 +37,29 @@ class CampaignItemAdmin(admin.ModelAdmin):
     # Fields to search by, including the parent campaign's title
     search_fields = ('title', 'input_content', 'campaign__title')
     # Filters in the sidebar
-    list_filter = ('campaign',)
\ No newline at end of file
+    list_filter = ('campaign',)
+
+
+@admin.register(GenerationJob)
+class GenerationJobAdmin(admin.ModelAdmin):
+    """
+    Customizes the display for the GenerationJob model in the admin.
+    """
+    # Columns to display in the job list view
+    list_display = ('item', 'status', 'attempts', 'created_at', 'finished_at')
+    # Filters in the sidebar
+    list_filter = ('status',)
+    # Avoid loading every item into a dropdown
+    raw_id_fields = ('item',)
+
+@admin.register(ImageAsset)
+class ImageAssetAdmin(admin.ModelAdmin):
+    """
+    Customizes the display for the ImageAsset model in the admin.
+    """
+    # Columns to display in the image list view
+    list_display = ('sha256', 'original', 'width', 'height', 'status', 'created_at')
+    # Filters in the sidebar
+    list_filter = ('status',)
+    # The derivatives are written by the worker
+    readonly_fields = ('sha256', 'width', 'height', 'derivatives', 'processed_at')
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class CampaignsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.campaigns'
\ No newline at end of file
+    name = 'apps.campaigns'
+
+    def ready(self):
+        # Connects the signal receivers that keep the search index and page cache current.
+        from . import pagecache, search  # noqa: F401
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_GENERATION_CACHE = {
+    'BACKEND': 'apps.campaigns.cache.DatabaseBackend',
+    'TTL': 60 * 60 * 24 * 30,  # 30 days
+    'MAX_ENTRIES': 10000,
+    'OPTIONS': {},
+}
+
+
+def generation_cache_key(input_content, org_context, campaign_context, model_name, prompt_version, fields) -> str:
+    """
+    Returns a content-addressed key for a generation request.
+
+    Any change to the three contexts, the model, the prompt template or the
+    requested fields produces a different key, so stale content is never served.
+    """
+    payload = json.dumps(
+        [input_content, org_context, campaign_context, model_name, prompt_version, sorted(fields)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class BaseBackend:
+    """
+    Interface for generation cache backends.
+
+    Args:
+        ttl: Seconds an entry stays valid.
+        max_entries: Entries kept before the least recently used are evicted.
+    """
+    def __init__(self, ttl, max_entries, **options):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def get(self, key) -> dict | None:
+        raise NotImplementedError
+
+    def set(self, key, content: dict) -> None:
+        raise NotImplementedError
+
+
+class DjangoCacheBackend(BaseBackend):
+    """
+    Stores entries in one of the configured Django caches (OPTIONS['ALIAS']).
+    Eviction follows the cache's own policy; locmem and Redis (allkeys-lru)
+    both evict least recently used keys when full, so MAX_ENTRIES is left to
+    the cache's configuration.
+    """
+    key_prefix = 'campaigns:generation:'
+
+    def __init__(self, ttl, max_entries, **options):
+        super().__init__(ttl, max_entries)
+        self.cache = caches[options.get('ALIAS', 'default')]
+
+    def get(self, key):
+        return self.cache.get(self.key_prefix + key)
+
+    def set(self, key, content):
+        self.cache.set(self.key_prefix + key, content, timeout=self.ttl)
+
+
+class DatabaseBackend(BaseBackend):
+    """
+    Stores entries in the GeneratedContentCache table, shared by every
+    process. Expired rows are dropped when read, and the least recently used
+    rows are evicted once the table grows past MAX_ENTRIES.
+
+    Eviction costs a scan of the table, so like Django's CULL_FREQUENCY it
+    only runs on about one set() in OPTIONS['EVICT_EVERY'] (default 100);
+    the table may overshoot MAX_ENTRIES by roughly that many rows meanwhile.
+    """
+    def __init__(self, ttl, max_entries, **options):
+        super().__init__(ttl, max_entries)
+        self.evict_every = max(1, options.get('EVICT_EVERY', 100))
+
+    def get(self, key):
+        from .models import GeneratedContentCache
+
+        entry = GeneratedContentCache.objects.filter(key=key).first()
+        if entry is None:
+            return None
+
+        now = timezone.now()
+        if entry.created_at < now - timedelta(seconds=self.ttl):
+            entry.delete()
+            return None
+
+        GeneratedContentCache.objects.filter(key=key).update(last_used_at=now)
+        return entry.content
+
+    def set(self, key, content):
+        from .models import GeneratedContentCache
+
+        GeneratedContentCache.objects.update_or_create(
+            key=key,
+            defaults={'content': content, 'created_at': timezone.now()},
+        )
+        if random.randrange(self.evict_every) == 0:
+            self._evict()
+
+    def _evict(self):
+        from .models import GeneratedContentCache
+
+        surplus = list(
+            GeneratedContentCache.objects
+            .order_by('-last_used_at')
+            .values_list('key', flat=True)[self.max_entries:]
+        )
+        if surplus:
+            GeneratedContentCache.objects.filter(key__in=surplus).delete()
+
+
+def get_generation_cache() -> BaseBackend | None:
+    """
+    Builds the backend configured by the GENERATION_CACHE setting.
+
+    Returns:
+        A cache backend instance, or None if caching is disabled
+        (GENERATION_CACHE['BACKEND'] set to None).
+    """
+    config = {**DEFAULT_GENERATION_CACHE, **getattr(settings, 'GENERATION_CACHE', {})}
+    if not config['BACKEND']:
+        return None
+    backend_class = import_string(config['BACKEND'])
+    return backend_class(config['TTL'], config['MAX_ENTRIES'], **config['OPTIONS'])
@@ -0,0 +1,102 @@
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import models
+
+try:
+    import zstandard
+except ImportError:  # Optional; values are written with zlib instead.
+    zstandard = None
+
+DEFAULT_COMPRESSED_TEXT = {
+    # 'zstd' (needs the zstandard package, else falls back to zlib) or 'zlib'.
+    'CODEC': 'zstd',
+    'LEVEL': None,  # None uses the codec's default level.
+    # Values shorter than this many bytes are stored uncompressed.
+    'THRESHOLD': 256,
+}
+
+# The first byte of every stored value says how the rest is encoded, so the
+# codec can change without rewriting old rows. Values from before the column
+# was compressed have no header; real text never starts with these bytes.
+FORMAT_RAW = 0x00
+FORMAT_ZLIB = 0x01
+FORMAT_ZSTD = 0x02
+
+
+def _config():
+    return {**DEFAULT_COMPRESSED_TEXT, **getattr(settings, 'COMPRESSED_TEXT', {})}
+
+
+def compress_text(text: str) -> bytes:
+    """
+    Encodes text for storage: a format byte followed by the compressed UTF-8,
+    or by the plain UTF-8 when the text is short or does not compress.
+    """
+    config = _config()
+    data = text.encode('utf-8')
+    if len(data) < config['THRESHOLD']:
+        return bytes([FORMAT_RAW]) + data
+
+    level = config['LEVEL']
+    if config['CODEC'] == 'zstd' and zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        header, compressed = FORMAT_ZSTD, compressor.compress(data)
+    else:
+        header, compressed = FORMAT_ZLIB, zlib.compress(data, -1 if level is None else level)
+
+    if len(compressed) >= len(data):
+        return bytes([FORMAT_RAW]) + data
+    return bytes([header]) + compressed
+
+
+def decompress_text(value) -> str:
+    """Decodes a value written by compress_text(), or a legacy plain text value."""
+    if isinstance(value, str):
+        return value
+    value = bytes(value)
+    if not value:
+        return ''
+    header, data = value[0], value[1:]
+    if header == FORMAT_RAW:
+        return data.decode('utf-8')
+    if header == FORMAT_ZLIB:
+        return zlib.decompress(data).decode('utf-8')
+    if header == FORMAT_ZSTD:
+        if zstandard is None:
+            raise ImproperlyConfigured("Reading zstd-compressed text requires the zstandard package.")
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return value.decode('utf-8')
+
+
+class CompressedTextField(models.TextField):
+    """
+    A TextField stored compressed in a binary column. It reads and writes str
+    like a TextField (forms, serialization and update_fields all work), but the
+    database only sees bytes, so only exact and isnull lookups are allowed;
+    anything else (icontains, startswith, ...) raises FieldError instead of
+    silently matching nothing. Search uses the text Django indexes (see
+    search.py) instead.
+    """
+    description = "Text (stored compressed)"
+    allowed_lookups = ('exact', 'isnull')
+
+    def get_lookup(self, lookup_name):
+        if lookup_name not in self.allowed_lookups:
+            return None
+        return super().get_lookup(lookup_name)
+
+    def get_internal_type(self):
+        return 'BinaryField'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return decompress_text(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        if value is None:
+            return value
+        return connection.Database.Binary(compress_text(value))
@@ -1,4 +1,5 @@
 from django import forms
+from django.utils.text import capfirst
 from .models import Campaign, CampaignItem
 
 # --- Reusable Widget Attributes for consistent styling ---
@@ -57,4 +58,27 @@ class CampaignItemForm(forms.ModelForm):
             'video_prompt': forms.Textarea(attrs={**common_textarea_attrs, 'rows': 2}),
             'image': forms.ClearableFileInput(attrs=common_file_input_attrs),
             'video': forms.ClearableFileInput(attrs=common_file_input_attrs),
-        }
\ No newline at end of file
+        }
+
+
+class RegenerateFieldsForm(forms.Form):
+    """
+    Selects which generated fields of a CampaignItem to regenerate.
+    """
+    fields = forms.MultipleChoiceField(
+        choices=[
+            (name, capfirst(CampaignItem._meta.get_field(name).verbose_name))
+            for name in CampaignItem.GENERATED_FIELDS
+        ],
+    )
+
+
+class CampaignItemImportForm(forms.Form):
+    """
+    Uploads a CSV or JSONL file of items (`title`, `input_content`) for bulk import.
+    """
+    file = forms.FileField(
+        help_text="CSV with a header row, or JSONL with one object per line. "
+                  "Each row needs a title and input_content.",
+        widget=forms.ClearableFileInput(attrs={**common_file_input_attrs, 'accept': '.csv,.jsonl,.ndjson'}),
+    )
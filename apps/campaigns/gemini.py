@@ -0,0 +1,153 @@
+import asyncio
+import atexit
+import logging
+import os
+import threading
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+
+if TYPE_CHECKING:
+    from google import genai
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+# One client per process. Building a genai.Client creates fresh httpx clients
+# and an SSL context, so every call that builds its own client pays for a new
+# TCP/TLS handshake. Sharing one keeps connections alive between generations.
+_client = None
+_client_pid = None
+_client_key = None
+_client_lock = threading.Lock()
+# Async closes scheduled on a running loop, kept referenced until they finish.
+_closing = set()
+
+
+def _build_client(api_key: str) -> 'genai.Client':
+    """Creates a genai.Client with pooled keep-alive connections and explicit timeouts."""
+    # The SDK takes most of a second to import, so processes that never
+    # generate (and every cold start) skip it until the first call.
+    import httpx
+    from google import genai
+    from google.genai import types
+
+    max_connections = getattr(settings, 'GEMINI_MAX_CONNECTIONS', 20)
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=getattr(settings, 'GEMINI_KEEPALIVE_EXPIRY', 60.0),
+    )
+    http_options = types.HttpOptions(
+        # HttpOptions.timeout is in milliseconds. Without it the SDK waits forever.
+        timeout=int(getattr(settings, 'GEMINI_TIMEOUT', 60.0) * 1000),
+        client_args={'limits': limits},
+        async_client_args={'limits': limits},
+    )
+    base_url = getattr(settings, 'GEMINI_BASE_URL', None)
+    if base_url:
+        # Lets benchmarks and tests point the service at a local stand-in server.
+        http_options.base_url = base_url
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+
+def _close_client(client: 'genai.Client') -> None:
+    """
+    Releases the pooled connections held by a client that is being replaced:
+    the sync transport and the async one behind `client.aio`.
+
+    Uses the SDK's Client.close() and AsyncClient.aclose() where they exist
+    (newer google-genai releases); the pinned 1.24 only exposes its httpx clients.
+    """
+    try:
+        if hasattr(client, 'close'):
+            client.close()
+        else:
+            client._api_client._httpx_client.close()
+    except Exception as e:
+        logger.warning(f"Could not close the previous Gemini client: {e}")
+
+    aclose = getattr(client.aio, 'aclose', None) or client._api_client._async_httpx_client.aclose
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    try:
+        if loop is not None:
+            # Called from async code (e.g. agenerate_campaign_content): close on this loop.
+            task = loop.create_task(aclose())
+            _closing.add(task)
+            task.add_done_callback(_closing.discard)
+        else:
+            asyncio.run(aclose())
+    except Exception as e:
+        logger.warning(f"Could not close the previous async Gemini client: {e}")
+
+
+def close_client() -> None:
+    """Closes the shared client and drops it. Runs at interpreter exit."""
+    global _client, _client_pid, _client_key
+
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _close_client(_client)
+        _client = None
+        _client_pid = None
+        _client_key = None
+
+
+def get_client() -> 'genai.Client | None':
+    """
+    Returns the process-wide Gemini client, building it on first use.
+
+    The client is rebuilt lazily when the process has been forked (e.g. by
+    gunicorn's pre-fork model, since sockets must not be shared between
+    workers) or when GEMINI_API_KEY has changed.
+
+    Returns:
+        A genai.Client, or None if no API key is configured.
+    """
+    global _client, _client_pid, _client_key
+
+    api_key = getattr(settings, 'GEMINI_API_KEY', None)
+    if not api_key:
+        return None
+
+    pid = os.getpid()
+    client = _client
+    if client is not None and _client_pid == pid and _client_key == api_key:
+        return client
+
+    with _client_lock:
+        # Another thread may have rebuilt the client while we waited.
+        if _client is not None and _client_pid == pid and _client_key == api_key:
+            return _client
+
+        if _client is not None and _client_pid == pid:
+            # Same process, rotated key: the old pool is ours to close.
+            _close_client(_client)
+
+        _client = _build_client(api_key)
+        _client_pid = pid
+        _client_key = api_key
+        return _client
+
+
+def reset_client() -> None:
+    """
+    Drops the shared client so the next call to get_client() builds a new one.
+
+    Registered to run in forked children. The inherited connections belong to
+    the parent, so they are abandoned rather than closed.
+    """
+    global _client, _client_pid, _client_key, _client_lock
+    _client = None
+    _client_pid = None
+    _client_key = None
+    # A lock held by another thread at fork time would stay locked forever in the child.
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_client)
+atexit.register(close_client)
@@ -0,0 +1,183 @@
+import hashlib
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+try:
+    import pillow_avif  # noqa: F401  Registers the AVIF plugin on older Pillow builds.
+except ImportError:
+    pass
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_IMAGE_DERIVATIVES = {
+    # Output widths in pixels; widths above the original's are skipped.
+    'WIDTHS': (160, 480, 960, 1920),
+    # AVIF is only written when Pillow can encode it.
+    'FORMATS': ('avif', 'webp'),
+    'QUALITY': {'avif': 55, 'webp': 75},
+}
+
+DERIVATIVE_PREFIX = 'campaign_images/derivatives'
+
+
+def _config():
+    return {**DEFAULT_IMAGE_DERIVATIVES, **getattr(settings, 'IMAGE_DERIVATIVES', {})}
+
+
+def available_formats():
+    Image.init()
+    return [name for name in _config()['FORMATS'] if name.upper() in Image.SAVE]
+
+
+def content_hash(file) -> str:
+    """Returns the SHA-256 of an uploaded or stored file, leaving it rewound."""
+    digest = hashlib.sha256()
+    file.open('rb')
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def attach_image(image):
+    """
+    Returns the ImageAsset for an item's image field, creating it (and
+    queueing its derivatives) the first time the content is seen.
+
+    A new upload whose content is already stored is not saved again: the
+    field is pointed at the existing file instead.
+
+    Returns:
+        The ImageAsset, or None if the file cannot be read.
+    """
+    from .models import ImageAsset
+
+    try:
+        digest = content_hash(image)
+    except OSError as e:
+        logger.warning(f"Could not read image {image.name!r}: {e}")
+        return None
+
+    asset = ImageAsset.objects.filter(sha256=digest).first()
+    if asset is not None:
+        if not image._committed:
+            image.name = asset.original.name
+            image._committed = True
+        return asset
+
+    if not image._committed:
+        image.save(os.path.basename(image.name), image.file, save=False)
+    try:
+        with transaction.atomic():
+            return ImageAsset.objects.create(sha256=digest, original=image.name)
+    except IntegrityError:
+        # Uploaded concurrently by another request; use its copy.
+        asset = ImageAsset.objects.get(sha256=digest)
+        image.name = asset.original.name
+        return asset
+
+
+def claim_next_asset():
+    """
+    Atomically claims the oldest pending ImageAsset, like claim_next_job().
+
+    Returns:
+        The claimed ImageAsset, or None if there is nothing to process.
+    """
+    from .models import ImageAsset
+
+    candidates = (
+        ImageAsset.objects
+        .filter(status=ImageAsset.Status.PENDING)
+        .order_by('created_at', 'pk')
+        .values_list('pk', flat=True)[:10]
+    )
+    for pk in candidates:
+        claimed = ImageAsset.objects.filter(pk=pk, status=ImageAsset.Status.PENDING).update(
+            status=ImageAsset.Status.PROCESSING,
+            started_at=timezone.now(),
+        )
+        if claimed:
+            return ImageAsset.objects.get(pk=pk)
+    return None
+
+
+def requeue_stale_assets(stale_after):
+    """Puts assets left PROCESSING by a dead worker back into the queue."""
+    from .models import ImageAsset
+
+    return ImageAsset.objects.filter(
+        status=ImageAsset.Status.PROCESSING,
+        started_at__lt=timezone.now() - stale_after,
+    ).update(status=ImageAsset.Status.PENDING)
+
+
+def _encode(image, image_format, quality):
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format.upper(), quality=quality)
+    return buffer.getvalue()
+
+
+def build_derivatives(asset) -> list[dict]:
+    """
+    Writes a resized copy of the original per configured width and format.
+    File names are derived from the content hash, so reprocessing an asset
+    overwrites its files rather than adding new ones.
+    """
+    config = _config()
+    derivatives = []
+    with asset.original.open('rb') as file, Image.open(file) as original:
+        # Apply the EXIF orientation, since the derivatives carry no EXIF.
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+        asset.width, asset.height = original.size
+
+        widths = sorted({min(width, original.width) for width in config['WIDTHS']})
+        for width in widths:
+            height = max(1, round(original.height * width / original.width))
+            resized = original if width == original.width else original.resize((width, height), Image.Resampling.LANCZOS)
+            for image_format in available_formats():
+                data = _encode(resized, image_format, config['QUALITY'].get(image_format, 75))
+                name = f"{DERIVATIVE_PREFIX}/{asset.sha256[:2]}/{asset.sha256}/{width}.{image_format}"
+                if default_storage.exists(name):
+                    default_storage.delete(name)
+                name = default_storage.save(name, ContentFile(data))
+                derivatives.append({
+                    'width': width, 'height': height, 'format': image_format, 'name': name, 'size': len(data),
+                })
+    return derivatives
+
+
+def process_asset(asset):
+    """
+    Builds the asset's derivatives and marks it READY (or FAILED), then
+    invalidates the cached pages of the campaigns showing it.
+    """
+    from .models import ImageAsset
+    from .pagecache import bump, campaign_scope
+
+    try:
+        asset.derivatives = build_derivatives(asset)
+        asset.status = ImageAsset.Status.READY
+        asset.error = ''
+    except Exception as e:
+        logger.exception(f"Image asset {asset.pk} could not be processed: {e}")
+        asset.status = ImageAsset.Status.FAILED
+        asset.error = str(e)
+    asset.processed_at = timezone.now()
+    asset.save(update_fields=['width', 'height', 'derivatives', 'status', 'error', 'processed_at'])
+
+    campaign_ids = set(asset.items.values_list('campaign_id', flat=True))
+    bump([campaign_scope(pk) for pk in campaign_ids])
+    return asset
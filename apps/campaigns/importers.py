@@ -0,0 +1,195 @@
+import asyncio
+import csv
+import io
+import json
+import logging
+
+from asgiref.sync import async_to_sync
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Campaign, CampaignItem
+from .ratelimit import GeminiUnavailable
+from .search import get_search_backend
+from .touch import touch_campaigns
+from .services import agenerate_campaign_content
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+BATCH_SIZE = 500
+TITLE_MAX_LENGTH = CampaignItem._meta.get_field('title').max_length
+
+
+class RowError:
+    """A problem with one row of an import file (row numbers start at 1)."""
+    def __init__(self, row, message):
+        self.row = row
+        self.message = message
+
+    def __str__(self):
+        return f"Row {self.row}: {self.message}"
+
+
+def detect_format(filename: str) -> str:
+    """Guesses the import format from a file name, defaulting to CSV."""
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(fileobj, file_format: str):
+    """
+    Reads rows from a CSV (with a header line) or JSONL file, one at a time.
+
+    Args:
+        fileobj: A binary or text file object.
+        file_format: 'csv' or 'jsonl'.
+
+    Yields:
+        (row number, dict or RowError) tuples.
+    """
+    if isinstance(fileobj.read(0), bytes):
+        fileobj = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+    if file_format == 'csv':
+        for number, row in enumerate(csv.DictReader(fileobj), start=1):
+            yield number, row
+    elif file_format == 'jsonl':
+        for number, line in enumerate(fileobj, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield number, RowError(number, f"Invalid JSON ({e}).")
+                continue
+            if not isinstance(row, dict):
+                yield number, RowError(number, "Expected a JSON object.")
+                continue
+            yield number, row
+    else:
+        raise ValueError(f"Unsupported import format: {file_format}")
+
+
+def build_items(campaign: Campaign, rows):
+    """
+    Validates rows and turns them into unsaved CampaignItems.
+
+    Returns:
+        A tuple of (list of CampaignItem, list of RowError).
+    """
+    items, errors = [], []
+    for number, row in rows:
+        if isinstance(row, RowError):
+            errors.append(row)
+            continue
+        title = str(row.get('title') or '').strip()
+        input_content = str(row.get('input_content') or '').strip()
+        if not title:
+            errors.append(RowError(number, "Missing title."))
+        elif len(title) > TITLE_MAX_LENGTH:
+            errors.append(RowError(number, f"Title is longer than {TITLE_MAX_LENGTH} characters."))
+        elif not input_content:
+            errors.append(RowError(number, "Missing input_content."))
+        else:
+            item = CampaignItem(campaign=campaign, title=title, input_content=input_content)
+            # Remembered so generation errors can be reported against the file's rows.
+            item.import_row = number
+            items.append(item)
+    return items, errors
+
+
+def import_items(campaign: Campaign, fileobj, file_format: str):
+    """
+    Bulk-inserts the valid rows of an import file into the campaign.
+
+    Items are written with bulk_create in batches, so the per-item save()
+    (and its parent campaign save) is skipped; the campaign is touched once.
+    All batches are written in one transaction: a batch that fails leaves
+    none of the file's items behind. Callers that queue jobs for the items
+    should do so inside their own transaction.atomic() around this call.
+
+    Returns:
+        A tuple of (list of created CampaignItem, list of RowError).
+    """
+    items, errors = build_items(campaign, read_rows(fileobj, file_format))
+    if items:
+        with transaction.atomic():
+            CampaignItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+            # bulk_create sends no post_save signals, so index and touch here.
+            get_search_backend().index_items(items)
+            touch_campaigns([campaign.pk])
+    return items, errors
+
+
+async def _generate_all(items, org_context, campaign_context, concurrency, progress):
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {}
+    done = 0
+
+    async def generate(item):
+        nonlocal done
+        async with semaphore:
+            try:
+                results[item.pk] = await agenerate_campaign_content(
+                    input_content=item.input_content,
+                    org_context=org_context,
+                    campaign_context=campaign_context,
+                    campaign_id=item.campaign_id,
+                )
+            except Exception as e:
+                logger.error(f"Generation for imported item {item.pk} failed: {e}")
+                results[item.pk] = e
+        done += 1
+        if progress:
+            progress(done, len(items))
+
+    await asyncio.gather(*(generate(item) for item in items))
+    return results
+
+
+def generate_items(campaign: Campaign, items, concurrency=8, progress=None):
+    """
+    Generates content for many items with at most `concurrency` Gemini calls
+    in flight, then saves the results with bulk_update.
+
+    Args:
+        campaign: The parent campaign of all items.
+        items: CampaignItems saved by import_items.
+        concurrency: Maximum number of simultaneous generations.
+        progress: Optional callable(done, total) invoked after each item.
+
+    Returns:
+        A list of RowError for the items whose generation failed.
+    """
+    # Safely get organization objectives from the campaign owner's profile
+    try:
+        org_objectives = campaign.user.profile.org_objectives
+    except AttributeError:
+        org_objectives = None
+
+    # The generation cache's database calls (sync_to_async) come back to this thread.
+    results = async_to_sync(_generate_all)(items, org_objectives, campaign.objectives, concurrency, progress)
+
+    generated_items, errors = [], []
+    for item in items:
+        generated_data = results.get(item.pk)
+        if isinstance(generated_data, Exception) or not generated_data:
+            message = f"Generation failed for '{item.title}'."
+            if isinstance(generated_data, GeminiUnavailable):
+                message = f"{message} {generated_data}"
+            errors.append(RowError(getattr(item, 'import_row', item.pk), message))
+            continue
+        for key in CampaignItem.GENERATED_FIELDS:
+            if key in generated_data:
+                setattr(item, key, generated_data[key])
+        item.updated_at = timezone.now()
+        generated_items.append(item)
+
+    if generated_items:
+        CampaignItem.objects.bulk_update(
+            generated_items, [*CampaignItem.GENERATED_FIELDS, 'updated_at'], batch_size=BATCH_SIZE
+        )
+        get_search_backend().index_items(generated_items)
+        touch_campaigns([campaign.pk])
+    return errors
@@ -0,0 +1,225 @@
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import GenerationJob
+from .ratelimit import GeminiUnavailable
+from .services import agenerate_campaign_content, generate_campaign_content
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+# Jobs left in RUNNING longer than this are assumed to belong to a dead worker.
+DEFAULT_STALE_AFTER = timedelta(minutes=10)
+
+# A job deferred because Gemini is unavailable is retried this many times in total,
+# waiting RETRY_DELAY * 2 ** (attempts - 1) between tries.
+MAX_JOB_ATTEMPTS = 5
+RETRY_DELAY = timedelta(seconds=30)
+
+
+def enqueue_generation(item, fields=None):
+    """
+    Queues a content generation job for the given CampaignItem.
+
+    If the item already has a job waiting to be picked up, that job is reused
+    so repeated saves do not pile up duplicate Gemini calls. A partial request
+    is merged into the pending job's fields; a full request widens it to all.
+
+    Args:
+        item: The CampaignItem to generate content for.
+        fields: Optional subset of generated fields to refresh.
+
+    Returns:
+        The pending GenerationJob for the item.
+    """
+    fields = list(fields or [])
+    job = item.generation_jobs.filter(status=GenerationJob.Status.PENDING).first()
+    if job is None:
+        return GenerationJob.objects.create(item=item, fields=fields)
+
+    if job.fields:
+        merged = [] if not fields else [
+            name for name in item.GENERATED_FIELDS if name in job.fields or name in fields
+        ]
+        if merged != job.fields:
+            updated = GenerationJob.objects.filter(
+                pk=job.pk, status=GenerationJob.Status.PENDING,
+            ).update(fields=merged)
+            if not updated:
+                # A worker claimed the job in the meantime; queue a new one.
+                return GenerationJob.objects.create(item=item, fields=fields)
+            job.fields = merged
+    return job
+
+
+def enqueue_generation_bulk(items):
+    """
+    Queues full generation jobs for many new items with a single bulk insert.
+
+    Returns:
+        The list of created GenerationJobs.
+    """
+    return GenerationJob.objects.bulk_create(
+        [GenerationJob(item=item) for item in items], batch_size=500
+    )
+
+
+def latest_job_for(item):
+    """Returns the most recent GenerationJob for the item, or None."""
+    return item.generation_jobs.order_by('-created_at', '-pk').first()
+
+
+def requeue_stale_jobs(stale_after=DEFAULT_STALE_AFTER):
+    """
+    Puts jobs that have been RUNNING for too long back into the queue.
+
+    Returns:
+        The number of jobs that were requeued.
+    """
+    cutoff = timezone.now() - stale_after
+    return GenerationJob.objects.filter(
+        status=GenerationJob.Status.RUNNING,
+        started_at__lt=cutoff,
+    ).update(status=GenerationJob.Status.PENDING)
+
+
+def claim_next_job():
+    """
+    Atomically claims the oldest pending job for this worker.
+
+    The claim is a conditional UPDATE on the job's status, so several workers
+    can poll the same table without ever running a job twice, on any database
+    backend.
+
+    Returns:
+        The claimed GenerationJob, or None if the queue is empty.
+    """
+    now = timezone.now()
+    candidates = (
+        GenerationJob.objects
+        .filter(status=GenerationJob.Status.PENDING)
+        .filter(Q(run_after__isnull=True) | Q(run_after__lte=now))
+        .order_by('created_at', 'pk')
+        .values_list('pk', flat=True)[:10]
+    )
+    for pk in candidates:
+        claimed = GenerationJob.objects.filter(
+            pk=pk,
+            status=GenerationJob.Status.PENDING,
+        ).update(
+            status=GenerationJob.Status.RUNNING,
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return GenerationJob.objects.select_related('item__campaign__user').get(pk=pk)
+    return None
+
+
+def _finish(job, status, error=''):
+    job.status = status
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+
+
+def _defer(job, error):
+    """Puts the job back in the queue, to be picked up after an exponential delay."""
+    job.status = GenerationJob.Status.PENDING
+    job.error = error
+    job.run_after = timezone.now() + RETRY_DELAY * 2 ** (job.attempts - 1)
+    job.save(update_fields=['status', 'error', 'run_after'])
+
+
+def _generation_kwargs(job):
+    """The generate_campaign_content() arguments for a job."""
+    item = job.item
+    campaign = item.campaign
+
+    # Safely get organization objectives from the campaign owner's profile
+    try:
+        org_objectives = campaign.user.profile.org_objectives
+    except AttributeError:
+        org_objectives = None
+
+    return {
+        'input_content': item.input_content,
+        'org_context': org_objectives,
+        'campaign_context': campaign.objectives,
+        'fields': job.fields or None,
+        'campaign_id': campaign.pk,
+    }
+
+
+def _unavailable(job, e):
+    """Defers a job refused by the rate limiter or circuit breaker, or fails it after MAX_JOB_ATTEMPTS."""
+    if job.attempts < MAX_JOB_ATTEMPTS:
+        logger.warning(f"Deferring generation job {job.pk}: {e}")
+        _defer(job, "Gemini is busy right now; generation will be retried automatically.")
+    else:
+        _finish(job, GenerationJob.Status.FAILED,
+                "Gemini is unavailable right now. Please try again later.")
+
+
+def _store(job, generated_data):
+    """Writes the generated fields to the job's item and finishes the job."""
+    if not generated_data:
+        _finish(job, GenerationJob.Status.FAILED,
+                "There was an error generating content. Please check your API key and try again.")
+        return
+
+    # Ignore any unexpected keys the model may have returned, and never
+    # touch fields outside a partial job's subset.
+    item = job.item
+    requested = job.fields or item.GENERATED_FIELDS
+    updated_fields = [key for key in generated_data if key in requested]
+    for key in updated_fields:
+        setattr(item, key, generated_data[key])
+    item.save(update_fields=[*updated_fields, 'updated_at'])
+
+    _finish(job, GenerationJob.Status.SUCCEEDED)
+
+
+def run_job(job):
+    """
+    Generates content for the job's item and stores it on the item.
+
+    Only the generated fields are written back, so edits made to other
+    fields while the job was running are preserved. If Gemini is rate
+    limited or its circuit breaker is open, the job is deferred rather than
+    failed, up to MAX_JOB_ATTEMPTS.
+    """
+    try:
+        generated_data = generate_campaign_content(**_generation_kwargs(job))
+    except GeminiUnavailable as e:
+        _unavailable(job, e)
+        return job
+    except Exception as e:
+        logger.exception(f"Generation job {job.pk} crashed: {e}")
+        generated_data = None
+
+    _store(job, generated_data)
+    return job
+
+
+async def arun_job(job):
+    """
+    Async variant of run_job, built on agenerate_campaign_content. The
+    generation is awaited on the event loop, so `runworker --concurrency N`
+    runs N jobs in one process; the database writes go through sync_to_async.
+    """
+    try:
+        generated_data = await agenerate_campaign_content(**await sync_to_async(_generation_kwargs)(job))
+    except GeminiUnavailable as e:
+        await sync_to_async(_unavailable)(job, e)
+        return job
+    except Exception as e:
+        logger.exception(f"Generation job {job.pk} crashed: {e}")
+        generated_data = None
+
+    await sync_to_async(_store)(job, generated_data)
+    return job
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.campaigns.search import get_search_backend, rebuild_index
+
+
+class Command(BaseCommand):
+    """
+    Re-indexes every campaign and item for full-text search.
+
+    The index is kept current on save; run this after restoring data with
+    raw SQL or loading fixtures:
+
+        python manage.py rebuild_search_index
+    """
+    help = "Rebuilds the full-text search index for campaigns and items."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help="Database alias (default: default).")
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options['database'])
+        rebuild_index(options['database'])
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt with {type(backend).__name__}."))
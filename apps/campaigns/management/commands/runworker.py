@@ -0,0 +1,157 @@
+import asyncio
+import signal
+import time
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.campaigns.images import claim_next_asset, process_asset, requeue_stale_assets
+from apps.campaigns.jobs import arun_job, claim_next_job, requeue_stale_jobs, run_job
+from apps.campaigns.uploads import (
+    assemble_upload, claim_next_upload, delete_expired_uploads, requeue_stale_uploads,
+)
+from contentgen import metrics
+
+
+class Command(BaseCommand):
+    """
+    Runs queued content generation jobs, builds the resized copies of
+    uploaded images, joins completed video uploads and deletes abandoned ones.
+
+    Start one or more of these alongside the web processes:
+
+        python manage.py runworker
+
+    With --concurrency N, up to N generation jobs run at once on an event
+    loop (see arun_job), so one process can keep many Gemini calls in flight.
+    """
+    help = "Processes queued campaign item generation jobs, image derivatives and video uploads."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Drain the queue and exit instead of polling forever.",
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help="Seconds to sleep when the queue is empty (default: 2).",
+        )
+        parser.add_argument(
+            '--stale-after', type=int, default=600,
+            help="Requeue jobs left running for this many seconds by a dead worker (default: 600).",
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help="Generation jobs to run at once, on the async Gemini client (default: 1).",
+        )
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        stale_after = timedelta(seconds=options['stale_after'])
+        self.stdout.write("Generation worker started.")
+
+        if options['concurrency'] > 1:
+            # The database calls made through sync_to_async come back to this thread.
+            async_to_sync(self.run_concurrently)(options, stale_after)
+        else:
+            self.run(options, stale_after)
+
+        self.stdout.write("Generation worker stopped.")
+
+    def run(self, options, stale_after):
+        while not self._stopping:
+            self.housekeeping(stale_after)
+
+            job = claim_next_job()
+            if job is not None:
+                run_job(job)
+                self.finished(job)
+                continue
+
+            if self.process_next_file():
+                continue
+
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+
+    async def run_concurrently(self, options, stale_after):
+        running = set()
+        while not self._stopping:
+            await sync_to_async(self.housekeeping)(stale_after)
+
+            while len(running) < options['concurrency']:
+                job = await sync_to_async(claim_next_job)()
+                if job is None:
+                    break
+                running.add(asyncio.create_task(self.arun(job)))
+            full = len(running) >= options['concurrency']
+
+            if not full and await sync_to_async(self.process_next_file)():
+                continue
+
+            if options['once'] and not running:
+                break
+            if running:
+                # Claim more as soon as a slot frees up, but keep polling while there are free slots.
+                _, running = await asyncio.wait(
+                    running, timeout=None if full else options['poll_interval'],
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+            else:
+                await asyncio.sleep(options['poll_interval'])
+
+        # Finish the jobs in flight before exiting.
+        await asyncio.gather(*running)
+
+    async def arun(self, job):
+        await arun_job(job)
+        self.finished(job)
+
+    def housekeeping(self, stale_after):
+        # Long-running processes must release connections Django would
+        # otherwise only recycle at the end of a request.
+        close_old_connections()
+
+        requeued = (
+            requeue_stale_jobs(stale_after) + requeue_stale_assets(stale_after) + requeue_stale_uploads(stale_after)
+        )
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+        expired = delete_expired_uploads()
+        if expired:
+            self.stdout.write(f"Deleted {expired} abandoned video upload(s).")
+
+    def process_next_asset(self):
+        asset = claim_next_asset()
+        if asset is None:
+            return False
+        process_asset(asset)
+        self.stdout.write(f"Image {asset.pk}: {asset.status} ({len(asset.derivatives)} derivatives)")
+        return True
+
+    def process_next_upload(self):
+        upload = claim_next_upload()
+        if upload is None:
+            return False
+        assemble_upload(upload)
+        self.stdout.write(f"Video upload {upload.pk} for item {upload.item_id}: {upload.status}")
+        return True
+
+    def process_next_file(self):
+        """Processes one image or video upload, if any is waiting."""
+        return self.process_next_asset() or self.process_next_upload()
+
+    def finished(self, job):
+        # No requests pass through the metrics middleware here.
+        metrics.flush()
+        self.stdout.write(f"Job {job.pk} for item {job.item_id}: {job.status}")
+
+    def _stop(self, signum, frame):
+        # Finish the current job, then exit the loop.
+        self._stopping = True
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0003_generatedcontentcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='fields',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:09
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+ITEM_SEARCH_FIELDS = (
+    'input_content', 'linkedin_content', 'x_content', 'facebook_content', 'instagram_content',
+    'youtube_content', 'quora_content', 'reddit_content', 'blog_content',
+)
+POSTGRES_ITEM_BODY = "concat_ws(E'\\n', " + ', '.join(ITEM_SEARCH_FIELDS) + ")"
+SQLITE_ITEM_BODY = " || char(10) || ".join(f"coalesce(i.{name}, '')" for name in ITEM_SEARCH_FIELDS)
+
+POSTGRES_FORWARDS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX campaign_search_idx ON campaigns_campaign USING gin (search_vector)",
+    "CREATE INDEX campaignitem_search_idx ON campaigns_campaignitem USING gin (search_vector)",
+    "CREATE INDEX campaign_title_trgm_idx ON campaigns_campaign USING gin (title gin_trgm_ops)",
+    "CREATE INDEX campaignitem_title_trgm_idx ON campaigns_campaignitem USING gin (title gin_trgm_ops)",
+    # Backfill; from now on search.py updates the vectors on save.
+    "UPDATE campaigns_campaign SET search_vector = "
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(objectives, '')), 'B')",
+    "UPDATE campaigns_campaignitem SET search_vector = "
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('english', {POSTGRES_ITEM_BODY}), 'B')",
+]
+
+POSTGRES_BACKWARDS = [
+    "DROP INDEX IF EXISTS campaign_search_idx",
+    "DROP INDEX IF EXISTS campaignitem_search_idx",
+    "DROP INDEX IF EXISTS campaign_title_trgm_idx",
+    "DROP INDEX IF EXISTS campaignitem_title_trgm_idx",
+    "DROP EXTENSION IF EXISTS pg_trgm",
+]
+
+SQLITE_FORWARDS = [
+    # `owner` holds a "u<user id>" token so queries only score the searching user's rows.
+    "CREATE VIRTUAL TABLE campaigns_campaign_fts USING fts5(owner, title, body, tokenize = 'porter unicode61')",
+    "CREATE VIRTUAL TABLE campaigns_campaignitem_fts USING fts5(owner, title, body, tokenize = 'porter unicode61')",
+    # Deletes (including cascades) clean up the index in the database itself.
+    "CREATE TRIGGER campaigns_campaign_fts_delete AFTER DELETE ON campaigns_campaign BEGIN "
+    "DELETE FROM campaigns_campaign_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER campaigns_campaignitem_fts_delete AFTER DELETE ON campaigns_campaignitem BEGIN "
+    "DELETE FROM campaigns_campaignitem_fts WHERE rowid = old.id; END",
+    "INSERT INTO campaigns_campaign_fts (rowid, owner, title, body) "
+    "SELECT id, 'u' || user_id, title, objectives FROM campaigns_campaign",
+    "INSERT INTO campaigns_campaignitem_fts (rowid, owner, title, body) "
+    f"SELECT i.id, 'u' || c.user_id, i.title, {SQLITE_ITEM_BODY} "
+    "FROM campaigns_campaignitem i JOIN campaigns_campaign c ON c.id = i.campaign_id",
+]
+
+SQLITE_BACKWARDS = [
+    "DROP TRIGGER IF EXISTS campaigns_campaign_fts_delete",
+    "DROP TRIGGER IF EXISTS campaigns_campaignitem_fts_delete",
+    "DROP TABLE IF EXISTS campaigns_campaign_fts",
+    "DROP TABLE IF EXISTS campaigns_campaignitem_fts",
+]
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def _statements(schema_editor, forwards):
+    """
+    Picks the index statements for the database vendor; other databases get
+    none. The pg_trgm extension is created and dropped here too, so neither
+    direction touches pg_extension on other databases.
+    """
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        return POSTGRES_FORWARDS if forwards else POSTGRES_BACKWARDS
+    if connection.vendor == 'sqlite' and _sqlite_has_fts5(connection):
+        return SQLITE_FORWARDS if forwards else SQLITE_BACKWARDS
+    return []
+
+
+def create_search_index(apps, schema_editor):
+    for statement in _statements(schema_editor, forwards=True):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    for statement in _statements(schema_editor, forwards=False):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0005_generationjob_run_after'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='campaignitem',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0006_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='campaign',
+            options={'ordering': ['-updated_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='campaign',
+            index=models.Index(fields=['user', '-updated_at', '-id'], name='campaign_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,128 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:25
+
+import apps.campaigns.fields
+from django.db import migrations, models
+
+TABLE = 'campaigns_campaignitem'
+COMPRESSED_FIELDS = {
+    'linkedin_content': None,
+    'x_content': "X (Twitter) Content",
+    'facebook_content': None,
+    'instagram_content': None,
+    'youtube_content': "YouTube Description/Script",
+    'quora_content': None,
+    'reddit_content': None,
+    'blog_content': None,
+    'image_prompt': None,
+    'video_prompt': None,
+}
+BATCH_SIZE = 500
+
+# Rebuilding the table on SQLite drops its triggers; this one is from 0006_search.
+SQLITE_FTS_TRIGGER = (
+    "CREATE TRIGGER IF NOT EXISTS campaigns_campaignitem_fts_delete AFTER DELETE ON campaigns_campaignitem "
+    "BEGIN DELETE FROM campaigns_campaignitem_fts WHERE rowid = old.id; END"
+)
+
+
+def _text_field(name):
+    return models.TextField(blank=True, null=True, verbose_name=COMPRESSED_FIELDS[name])
+
+
+def _compressed_field(name):
+    return apps.campaigns.fields.CompressedTextField(blank=True, null=True, verbose_name=COMPRESSED_FIELDS[name])
+
+
+def _alter_columns(apps, schema_editor, make_old, make_new, postgres_using):
+    """
+    Changes the column types. PostgreSQL converts in place with one ALTER
+    TABLE; other databases go through the schema editor (a table rebuild on
+    SQLite, which keeps the text values as they are).
+    """
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        new_type = make_new('x').db_type(connection)
+        clauses = ', '.join(
+            f"ALTER COLUMN {name} TYPE {new_type} USING {postgres_using.format(name)}"
+            for name in COMPRESSED_FIELDS
+        )
+        schema_editor.execute(f"ALTER TABLE {TABLE} {clauses}")
+        return
+
+    model = apps.get_model('campaigns', 'CampaignItem')
+    for name in COMPRESSED_FIELDS:
+        old_field, new_field = make_old(name), make_new(name)
+        for field in (old_field, new_field):
+            field.set_attributes_from_name(name)
+            field.model = model
+        schema_editor.alter_field(model, old_field, new_field)
+    if connection.vendor == 'sqlite' and 'campaigns_campaignitem_fts' in connection.introspection.table_names():
+        schema_editor.execute(SQLITE_FTS_TRIGGER)
+
+
+def to_binary_columns(apps, schema_editor):
+    _alter_columns(apps, schema_editor, _text_field, _compressed_field, "convert_to({}, 'UTF8')")
+
+
+def to_text_columns(apps, schema_editor):
+    _alter_columns(apps, schema_editor, _compressed_field, _text_field, "convert_from({}, 'UTF8')")
+
+
+def compress_rows(apps, schema_editor):
+    """
+    Rewrites every item, a batch at a time. The values read back as plain
+    text (the field accepts values without a format byte) and are written
+    compressed.
+    """
+    CampaignItem = apps.get_model('campaigns', 'CampaignItem')
+    items = CampaignItem.objects.using(schema_editor.connection.alias).order_by('pk')
+    last_pk = 0
+    while batch := list(items.filter(pk__gt=last_pk).only('pk', *COMPRESSED_FIELDS)[:BATCH_SIZE]):
+        CampaignItem.objects.using(schema_editor.connection.alias).bulk_update(batch, list(COMPRESSED_FIELDS))
+        last_pk = batch[-1].pk
+
+
+def decompress_rows(apps, schema_editor):
+    """
+    Writes the values back as plain UTF-8 (bytes on PostgreSQL, text
+    elsewhere) so the columns can be turned back into text.
+    """
+    CampaignItem = apps.get_model('campaigns', 'CampaignItem')
+    connection = schema_editor.connection
+    items = CampaignItem.objects.using(connection.alias).order_by('pk')
+    assignments = ', '.join(f"{name} = %s" for name in COMPRESSED_FIELDS)
+    last_pk = 0
+    while batch := list(items.filter(pk__gt=last_pk).only('pk', *COMPRESSED_FIELDS)[:BATCH_SIZE]):
+        rows = []
+        for item in batch:
+            values = [getattr(item, name) for name in COMPRESSED_FIELDS]
+            if connection.vendor == 'postgresql':
+                values = [None if value is None else value.encode('utf-8') for value in values]
+            rows.append([*values, item.pk])
+        with connection.cursor() as cursor:
+            cursor.executemany(f"UPDATE {TABLE} SET {assignments} WHERE id = %s", rows)
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0007_campaign_user_updated_idx'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='campaignitem',
+                    name=name,
+                    field=_compressed_field(name),
+                )
+                for name in COMPRESSED_FIELDS
+            ],
+            database_operations=[
+                migrations.RunPython(to_binary_columns, to_text_columns),
+            ],
+        ),
+        migrations.RunPython(compress_rows, decompress_rows),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0010_videoupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PromptPrefixCache',
+            fields=[
+                ('campaign', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='prompt_prefix_cache', serialize=False, to='campaigns.campaign')),
+                ('prefix_hash', models.CharField(max_length=64)),
+                ('name', models.CharField(max_length=255)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
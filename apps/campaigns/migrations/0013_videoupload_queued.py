@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0012_pagecacheversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoupload',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='videoupload',
+            name='status',
+            field=models.CharField(choices=[('uploading', 'Uploading'), ('queued', 'Queued'), ('assembling', 'Assembling'), ('complete', 'Complete')], default='uploading', max_length=16),
+        ),
+    ]
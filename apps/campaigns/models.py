@@ -1,7 +1,16 @@
+import math
+import uuid
+
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models.functions import Substr
 from django.conf import settings
 from django.urls import reverse
 
+from .fields import CompressedTextField
+from .images import attach_image
+from .touch import touch_campaigns
+
 class Campaign(models.Model):
     """
     Represents a marketing or content campaign created by a user.
@@ -15,12 +24,19 @@ class Campaign(models.Model):
     objectives = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Full-text index (Postgres only; SQLite uses an FTS5 table). Maintained by search.py.
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         # This is crucial for your home page requirement.
         # It ensures that by default, all queries for campaigns
-        # will be ordered by the most recently updated.
-        ordering = ['-updated_at']
+        # will be ordered by the most recently updated. The id breaks ties,
+        # so the order is total and keyset pagination is stable.
+        ordering = ['-updated_at', '-id']
+        indexes = [
+            # Serves the dashboard: one user's campaigns, newest first.
+            models.Index(fields=['user', '-updated_at', '-id'], name='campaign_user_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -30,10 +46,97 @@ class Campaign(models.Model):
         return reverse('campaign-detail', kwargs={'pk': self.pk})
 
 
+class ImageAsset(models.Model):
+    """
+    One uploaded image, stored once however many items use it (keyed by the
+    SHA-256 of its content), plus the resized WebP/AVIF copies the worker
+    derives from it. See images.py.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        PROCESSING = 'processing', 'Processing'
+        READY = 'ready', 'Ready'
+        FAILED = 'failed', 'Failed'
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    original = models.ImageField(upload_to='campaign_images/%Y/%m/%d/')
+    width = models.PositiveIntegerField(blank=True, null=True)
+    height = models.PositiveIntegerField(blank=True, null=True)
+    # [{"width": 480, "height": 270, "format": "webp", "name": "...", "size": 18234}, ...]
+    derivatives = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    error = models.TextField(blank=True)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # The worker polls for the oldest pending asset.
+            models.Index(fields=['status', 'created_at'], name='imageasset_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Image {self.sha256[:12]} ({self.status})"
+
+    def srcset(self, image_format):
+        """Returns the `srcset` attribute value for the derivatives in one format."""
+        from django.core.files.storage import default_storage
+
+        return ', '.join(
+            f"{default_storage.url(derivative['name'])} {derivative['width']}w"
+            for derivative in sorted(self.derivatives, key=lambda d: d['width'])
+            if derivative['format'] == image_format
+        )
+
+    @property
+    def sources(self):
+        """(MIME type, srcset) pairs for a <picture>, smallest format first."""
+        formats = [name for name in ('avif', 'webp') if any(d['format'] == name for d in self.derivatives)]
+        return [(f'image/{name}', self.srcset(name)) for name in formats]
+
+    @property
+    def fallback_url(self):
+        """The smallest derivative, for browsers that ignore <source>."""
+        from django.core.files.storage import default_storage
+
+        webp = [d for d in self.derivatives if d['format'] == 'webp']
+        if not webp:
+            return self.original.url
+        return default_storage.url(min(webp, key=lambda d: d['width'])['name'])
+
+class CampaignItemQuerySet(models.QuerySet):
+    # Characters of input_content loaded for the item cards on the campaign page.
+    PREVIEW_LENGTH = 300
+
+    def summaries(self):
+        """
+        Loads only what the item cards show: the title and a `preview` of the
+        brief cut short by the database. The generated content and prompts
+        stay in the database until an item is opened.
+        """
+        return (
+            self.select_related('image_asset')
+            .only(
+                'pk', 'campaign_id', 'title',
+                *(f'image_asset__{name}' for name in ('original', 'width', 'height', 'status', 'derivatives')),
+            )
+            .annotate(preview=Substr('input_content', 1, self.PREVIEW_LENGTH))
+        )
+
 class CampaignItem(models.Model):
     """
     Represents a single piece of content within a campaign.
     """
+    # The fields populated by the Gemini content generation service.
+    GENERATED_FIELDS = (
+        'linkedin_content', 'x_content', 'facebook_content', 'instagram_content',
+        'youtube_content', 'quora_content', 'reddit_content', 'blog_content',
+        'image_prompt', 'video_prompt',
+    )
+
     campaign = models.ForeignKey(
         Campaign,
         on_delete=models.CASCADE,
@@ -43,27 +146,42 @@ class CampaignItem(models.Model):
     
     # Content Fields
     input_content = models.TextField(help_text="The base content or brief for generation.")
-    linkedin_content = models.TextField(blank=True, null=True)
-    x_content = models.TextField(blank=True, null=True, verbose_name="X (Twitter) Content")
-    facebook_content = models.TextField(blank=True, null=True)
-    instagram_content = models.TextField(blank=True, null=True)
-    youtube_content = models.TextField(blank=True, null=True, verbose_name="YouTube Description/Script")
-    quora_content = models.TextField(blank=True, null=True)
-    reddit_content = models.TextField(blank=True, null=True)
-    blog_content = models.TextField(blank=True, null=True)
+    # Generated content is long and rarely read, so it is stored compressed (see fields.py).
+    linkedin_content = CompressedTextField(blank=True, null=True)
+    x_content = CompressedTextField(blank=True, null=True, verbose_name="X (Twitter) Content")
+    facebook_content = CompressedTextField(blank=True, null=True)
+    instagram_content = CompressedTextField(blank=True, null=True)
+    youtube_content = CompressedTextField(blank=True, null=True, verbose_name="YouTube Description/Script")
+    quora_content = CompressedTextField(blank=True, null=True)
+    reddit_content = CompressedTextField(blank=True, null=True)
+    blog_content = CompressedTextField(blank=True, null=True)
 
     # Prompt Fields
-    image_prompt = models.TextField(blank=True, null=True)
-    video_prompt = models.TextField(blank=True, null=True)
+    image_prompt = CompressedTextField(blank=True, null=True)
+    video_prompt = CompressedTextField(blank=True, null=True)
     
     # Media Fields
     image = models.ImageField(upload_to='campaign_images/%Y/%m/%d/', blank=True, null=True)
+    # The deduplicated image and its resized copies; set from `image` on save.
+    image_asset = models.ForeignKey(
+        ImageAsset,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False,
+        related_name='items'
+    )
     video = models.FileField(upload_to='campaign_videos/%Y/%m/%d/', blank=True, null=True)
 
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Full-text index (Postgres only; SQLite uses an FTS5 table). Maintained by search.py.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = CampaignItemQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
@@ -71,8 +189,192 @@ class CampaignItem(models.Model):
         """
         Custom save method to update the parent campaign's timestamp.
         """
+        # A new upload is stored once per distinct image; see images.py.
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'image' in update_fields:
+            if not self.image:
+                self.image_asset = None
+            elif not self.image._committed or self.image_asset_id is None:
+                self.image_asset = attach_image(self.image)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'image_asset'}
+
         # First, save the CampaignItem instance
         super().save(*args, **kwargs)
-        # Then, trigger a save on the parent campaign to update its 'updated_at' field.
-        # This makes the campaign "bubble up" to the top of the list.
-        self.campaign.save()
\ No newline at end of file
+        # Then bump the parent campaign's 'updated_at' so it "bubbles up" to the
+        # top of the list. This is a targeted UPDATE by id (the campaign is not
+        # loaded), and is batched inside transactions; see touch.py.
+        touch_campaigns([self.campaign_id], using=self._state.db)
+
+    def delete(self, *args, **kwargs):
+        """
+        Touches the parent campaign too, since its item list changed.
+        QuerySet.delete() skips this; call touch_campaigns() after it.
+        """
+        using = kwargs.get('using') or self._state.db
+        result = super().delete(*args, **kwargs)
+        touch_campaigns([self.campaign_id], using=using)
+        return result
+
+class GenerationJob(models.Model):
+    """
+    A queued request to generate platform content for a CampaignItem.
+    Jobs are created by the item views and executed out-of-band by the
+    `runworker` management command, so web requests never wait on Gemini.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        SUCCEEDED = 'succeeded', 'Succeeded'
+        FAILED = 'failed', 'Failed'
+
+    item = models.ForeignKey(
+        CampaignItem,
+        on_delete=models.CASCADE,
+        related_name='generation_jobs'
+    )
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    # The generated fields to refresh; empty means all of them.
+    fields = models.JSONField(default=list, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    # Set when a job is deferred because Gemini is rate limited or unavailable.
+    run_after = models.DateTimeField(blank=True, null=True)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            # The worker polls for the oldest pending job.
+            models.Index(fields=['status', 'created_at'], name='generationjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Generation job #{self.pk} for '{self.item}' ({self.status})"
+
+    @property
+    def is_active(self):
+        """True while the job is waiting for or being processed by a worker."""
+        return self.status in (self.Status.PENDING, self.Status.RUNNING)
+
+
+class VideoUpload(models.Model):
+    """
+    A resumable upload of a video for a CampaignItem, sent in fixed-size
+    chunks that may arrive in any order. Once every chunk is in, the upload
+    is queued and the worker joins the chunks into the item's `video` file.
+    See uploads.py.
+    """
+    class Status(models.TextChoices):
+        UPLOADING = 'uploading', 'Uploading'
+        QUEUED = 'queued', 'Queued'
+        ASSEMBLING = 'assembling', 'Assembling'
+        COMPLETE = 'complete', 'Complete'
+
+    # Random, so upload URLs cannot be guessed.
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    item = models.ForeignKey(
+        CampaignItem,
+        on_delete=models.CASCADE,
+        related_name='video_uploads'
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    # Optional SHA-256 of the whole file, checked after assembly.
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.UPLOADING)
+    # Why the last assembly failed; the upload is then back to UPLOADING.
+    error = models.TextField(blank=True)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped by every chunk and status change; idle uploads are removed after a while.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload of '{self.filename}' for '{self.item}' ({self.status})"
+
+    @property
+    def chunk_count(self):
+        return math.ceil(self.size / self.chunk_size)
+
+    def chunk_length(self, index):
+        """The exact size in bytes of the chunk at `index`; only the last one is short."""
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+
+class VideoUploadChunk(models.Model):
+    """One received chunk of a VideoUpload, stored as its own file until assembly."""
+    upload = models.ForeignKey(
+        VideoUpload,
+        on_delete=models.CASCADE,
+        related_name='chunks'
+    )
+    index = models.PositiveIntegerField()
+    file = models.FileField(max_length=255)
+    sha256 = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['index']
+        constraints = [
+            models.UniqueConstraint(fields=['upload', 'index'], name='videouploadchunk_unique_index'),
+        ]
+
+    def __str__(self):
+        return f"Chunk {self.index} of {self.upload_id}"
+
+
+class GeneratedContentCache(models.Model):
+    """
+    Stores generated platform content keyed by a hash of everything that went
+    into the prompt. Used by the database backend of the generation cache.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    content = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every hit; the least recently used rows are evicted first.
+    last_used_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
+class PromptPrefixCache(models.Model):
+    """
+    The Gemini cached content holding a campaign's shared prompt prefix (the
+    instructions plus the org and campaign objectives). See promptcache.py.
+    """
+    campaign = models.OneToOneField(
+        Campaign,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='prompt_prefix_cache'
+    )
+    # SHA-256 of the model and the prefix text; a change of objectives changes it.
+    prefix_hash = models.CharField(max_length=64)
+    # The API's resource name, e.g. "cachedContents/abc123".
+    name = models.CharField(max_length=255)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class PageCacheVersion(models.Model):
+    """
+    The current version of a page cache scope (see pagecache.py). Kept in the
+    database rather than the cache so a bump made by any process, the worker
+    included, reaches every process serving pages.
+    """
+    scope = models.CharField(max_length=64, primary_key=True)
+    version = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"{self.scope} @ {self.version}"
@@ -0,0 +1,133 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .touch import campaigns_touched
+
+DEFAULT_PAGE_CACHE = {
+    'ALIAS': 'default',
+    # Seconds a rendered page is kept; 0 disables page caching.
+    'TIMEOUT': 60 * 10,
+}
+
+PAGE_PREFIX = 'campaigns:page:'
+
+
+def _config():
+    return {**DEFAULT_PAGE_CACHE, **getattr(settings, 'PAGE_CACHE', {})}
+
+
+def _cache():
+    return caches[_config()['ALIAS']]
+
+
+def page_cache_enabled() -> bool:
+    return _config()['TIMEOUT'] > 0
+
+
+def user_scope(user_id) -> str:
+    """Covers everything on a user's dashboard: their campaigns and the order they are in."""
+    return f'user:{user_id}'
+
+
+def campaign_scope(campaign_id) -> str:
+    """Covers a campaign page: the campaign and its items."""
+    return f'campaign:{campaign_id}'
+
+
+def get_versions(scopes, using=DEFAULT_DB_ALIAS) -> list[str]:
+    """
+    Returns the current version of each scope, in one query. Versions live in
+    the database (PageCacheVersion), not in the page cache: a locmem cache is
+    per process, and bumps made by runworker or another web process would
+    never reach it. A scope that was never bumped has the empty version.
+    """
+    from .models import PageCacheVersion
+
+    versions = dict(
+        PageCacheVersion.objects.using(using).filter(scope__in=scopes).values_list('scope', 'version')
+    )
+    return [versions.get(scope, '') for scope in scopes]
+
+
+def bump(scopes, using=DEFAULT_DB_ALIAS) -> None:
+    """Invalidates every cached page that depends on one of the scopes."""
+    from .models import PageCacheVersion
+
+    PageCacheVersion.objects.using(using).bulk_create(
+        [PageCacheVersion(scope=scope, version=uuid.uuid4().hex) for scope in set(scopes)],
+        update_conflicts=True, unique_fields=['scope'], update_fields=['version'],
+    )
+
+
+def bump_on_commit(scopes, using=DEFAULT_DB_ALIAS) -> None:
+    # Bumping before the commit would let another request cache the old rows
+    # under the new version.
+    scopes = list(scopes)
+    transaction.on_commit(lambda: bump(scopes, using=using), using=using)
+
+
+def page_cache_key(request, scopes) -> str | None:
+    """
+    Returns the cache key for the page the request asks for, or None if the
+    page must not be cached: non-GET requests, requests with messages waiting
+    to be shown, and requests without a CSRF cookie (rendering would set one).
+    """
+    if request.method not in ('GET', 'HEAD') or not page_cache_enabled():
+        return None
+    if len(messages.get_messages(request)):
+        return None
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    if not csrf_cookie:
+        return None
+
+    # The CSRF cookie is part of the key: the cached page carries a token
+    # that is only valid with that cookie.
+    versions = get_versions(scopes)
+    fingerprint = '\n'.join([request.get_full_path(), csrf_cookie, *scopes, *versions])
+    digest = hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
+    return f'{PAGE_PREFIX}{request.user.pk}:{digest}'
+
+
+def get_page(key):
+    """Returns the (content, content type) stored for a page, or None."""
+    return _cache().get(key)
+
+
+def set_page(key, content, content_type) -> None:
+    _cache().set(key, (content, content_type), timeout=_config()['TIMEOUT'])
+
+
+# --- Signal receivers invalidating cached pages ---
+
+@receiver(post_save, sender='campaigns.Campaign')
+@receiver(post_delete, sender='campaigns.Campaign')
+def campaign_changed(sender, instance, using=DEFAULT_DB_ALIAS, **kwargs):
+    if page_cache_enabled():
+        bump_on_commit([user_scope(instance.user_id), campaign_scope(instance.pk)], using=using)
+
+
+@receiver(campaigns_touched)
+def campaigns_touched_changed(sender, campaign_ids, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Item saves and deletes, imports and other bulk writes touch their
+    campaigns (see touch.py), which is what invalidates the item pages.
+    """
+    if not page_cache_enabled():
+        return
+    owners = (
+        sender.objects.using(using)
+        .filter(pk__in=campaign_ids)
+        .order_by()
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+    scopes = [campaign_scope(pk) for pk in campaign_ids]
+    scopes += [user_scope(user_id) for user_id in owners]
+    bump_on_commit(scopes, using=using)
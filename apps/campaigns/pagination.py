@@ -0,0 +1,169 @@
+import base64
+import binascii
+import json
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+# Exact counts are only made up to this many rows; beyond it the count is estimated.
+COUNT_CAP = 1000
+
+
+def estimate_count(queryset, cap=COUNT_CAP) -> tuple[int, bool]:
+    """
+    Counts a queryset without scanning all of its rows.
+
+    Counts at most `cap` + 1 rows. Past the cap, PostgreSQL's planner
+    estimate is used; other databases just report the cap.
+
+    Returns:
+        A tuple of (count, is_exact).
+    """
+    count = queryset.order_by()[:cap + 1].count()
+    if count <= cap:
+        return count, True
+
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return max(int(plan[0]['Plan']['Plan Rows']), cap + 1), False
+    return cap, False
+
+
+class KeysetPage:
+    """
+    One page of a KeysetPaginator. Mirrors the parts of django.core.paginator.Page
+    used by templates, with cursors in place of page numbers.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginates by the values of the ordering fields instead of OFFSET, so
+    every page is an index range scan and deep pages cost the same as the
+    first. The queryset must be ordered by unique fields (end with the id).
+
+    Usage:
+        paginator = KeysetPaginator(queryset, 10, ordering=('-updated_at', '-id'))
+        page = paginator.page(request.GET.get('cursor'))
+    """
+    def __init__(self, queryset, per_page, ordering=('-updated_at', '-id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [name.lstrip('-') for name in ordering]
+
+    @cached_property
+    def _count(self):
+        return estimate_count(self.queryset)
+
+    @property
+    def count(self):
+        """The (possibly estimated) number of objects, without a full COUNT(*)."""
+        return self._count[0]
+
+    @property
+    def count_is_exact(self):
+        return self._count[1]
+
+    @property
+    def count_label(self):
+        count, exact = self._count
+        if exact:
+            return f"{count:,}"
+        if count > COUNT_CAP:
+            return f"about {count:,}"
+        return f"{count:,}+"
+
+    def encode_cursor(self, obj, direction):
+        # value_to_string keeps full microsecond precision, unlike DjangoJSONEncoder.
+        values = [obj._meta.get_field(name).value_to_string(obj) for name in self.fields]
+        payload = json.dumps([direction, values])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """
+        Returns (direction, values) for a cursor, or None if it is missing or
+        malformed (which shows the first page).
+        """
+        if not cursor:
+            return None
+        try:
+            payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(payload)
+            model = self.queryset.model
+            values = [model._meta.get_field(name).to_python(value) for name, value in zip(self.fields, values)]
+        except (binascii.Error, ValueError, TypeError):
+            return None
+        if direction not in ('next', 'previous') or len(values) != len(self.fields):
+            return None
+        return direction, values
+
+    def _after(self, values, reverse=False):
+        """
+        Builds the filter for rows strictly after `values` in the ordering
+        (or before, when reverse is set), as a lexicographic comparison.
+        """
+        condition = Q()
+        equal = Q()
+        for ordering, name, value in zip(self.ordering, self.fields, values):
+            descending = ordering.startswith('-') != reverse
+            condition |= equal & Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+            equal &= Q(**{name: value})
+        # A plain range on the leading field lets the database seek the index.
+        leading_descending = self.ordering[0].startswith('-') != reverse
+        leading = Q(**{f"{self.fields[0]}__{'lte' if leading_descending else 'gte'}": values[0]})
+        return leading & condition
+
+    def page(self, cursor=None) -> KeysetPage:
+        decoded = self.decode_cursor(cursor)
+        queryset = self.queryset.order_by(*self.ordering)
+        backwards = decoded is not None and decoded[0] == 'previous'
+        if decoded is not None:
+            queryset = queryset.filter(self._after(decoded[1], reverse=backwards))
+        if backwards:
+            reversed_ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+            queryset = queryset.order_by(*reversed_ordering)
+
+        # Fetch one extra row to learn whether there is another page.
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if backwards:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, decoded is not None
+        next_cursor = self.encode_cursor(rows[-1], 'next') if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], 'previous') if rows and has_previous else None
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
@@ -0,0 +1,214 @@
+"""
+Gemini context caching for the prompt prefix shared by a campaign's items.
+
+Every generation for a campaign starts with the same instructions, org
+objectives and campaign objectives; only INPUT_CONTENT changes. That prefix
+is uploaded once as a Gemini cached content, one per campaign (recorded in
+PromptPrefixCache), and each item's call then sends just its input and the
+cache's name. Cached tokens are billed at a reduced rate and are not
+processed again, which also shortens the time to the first token.
+
+Entries carry a hash of the prefix, so a change to the org or campaign
+objectives replaces the cache on the next generation and deletes the old
+one. Prefixes shorter than MIN_TOKENS (usually campaigns with short
+objectives) are sent in full: the API refuses to cache them, and Gemini
+2.5 models already cache short repeated prefixes implicitly.
+
+Workers generating for the same campaign at once may each create a cache.
+The entry is only written if it still holds what the worker read before
+creating (a compare-and-set), and a worker that loses deletes its own
+cache and uses the winner's, so no cache is left behind unrecorded.
+"""
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .ratelimit import estimate_tokens, get_guard
+
+if TYPE_CHECKING:
+    # Imported where used; see gemini.py.
+    from google.genai import types
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPT_CACHE = {
+    'ENABLED': True,
+    # Seconds a cache lives on Gemini's side; its storage is billed per hour.
+    'TTL': 60 * 60,
+    # The smallest prefix the API will cache (1,024 tokens for Gemini 2.5 Flash).
+    'MIN_TOKENS': 1024,
+    # A cache this close to expiring is replaced rather than risk it expiring mid-call.
+    'MIN_REMAINING': 60,
+}
+
+
+def _config():
+    return {**DEFAULT_PROMPT_CACHE, **getattr(settings, 'PROMPT_CACHE', {})}
+
+
+def prefix_hash(model: str, prefix: str) -> str:
+    return hashlib.sha256(json.dumps([model, prefix], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _delete_remote(client, name):
+    try:
+        client.caches.delete(name=name)
+    except Exception as e:
+        # It expires on its own after TTL anyway.
+        logger.warning(f"Could not delete the cached prompt prefix {name}: {e}")
+
+
+async def _adelete_remote(client, name):
+    try:
+        await client.aio.caches.delete(name=name)
+    except Exception as e:
+        logger.warning(f"Could not delete the cached prompt prefix {name}: {e}")
+
+
+def _cache_config(config, campaign_id, prefix: str) -> 'types.CreateCachedContentConfig':
+    from google.genai import types
+
+    return types.CreateCachedContentConfig(
+        contents=prefix,
+        ttl=f"{config['TTL']}s",
+        display_name=f'campaign-{campaign_id}',
+    )
+
+
+def _usable(config, campaign_id, prefix: str) -> bool:
+    return config['ENABLED'] and campaign_id is not None and estimate_tokens(prefix) >= config['MIN_TOKENS']
+
+
+def _lookup(config, campaign_id, digest: str):
+    """
+    Returns (entry, name): the campaign's PromptPrefixCache, if any, and its
+    cache name if it holds this prefix and is not about to expire.
+    """
+    from .models import PromptPrefixCache
+
+    entry = PromptPrefixCache.objects.filter(campaign_id=campaign_id).first()
+    if (
+        entry is not None and entry.prefix_hash == digest
+        and entry.expires_at > timezone.now() + timedelta(seconds=config['MIN_REMAINING'])
+    ):
+        return entry, entry.name
+    return entry, None
+
+
+def _record(config, campaign_id, previous, digest: str, name: str):
+    """
+    Records a newly created cache, unless another worker replaced `previous`
+    (the entry read before creating it) in the meantime.
+
+    Returns:
+        (name, stale): the cache name to use (this one, or the winner's if it
+        holds the same prefix, else None) and the caches no longer recorded
+        anywhere, which the caller deletes.
+    """
+    from .models import PromptPrefixCache
+
+    values = {
+        'prefix_hash': digest,
+        'name': name,
+        'expires_at': timezone.now() + timedelta(seconds=config['TTL']),
+    }
+    if previous is None:
+        try:
+            with transaction.atomic():
+                PromptPrefixCache.objects.create(campaign_id=campaign_id, **values)
+            won = True
+        except IntegrityError:
+            won = False
+    else:
+        won = bool(PromptPrefixCache.objects.filter(campaign_id=campaign_id, name=previous.name).update(**values))
+
+    if won:
+        # Objectives changed, so the old prefix will never be sent again. A
+        # cache that is merely expiring is left to Gemini's TTL, in case a
+        # call is still using it.
+        stale = [previous.name] if previous is not None and previous.prefix_hash != digest else []
+        return name, stale
+    winner = PromptPrefixCache.objects.filter(campaign_id=campaign_id).first()
+    return (winner.name if winner is not None and winner.prefix_hash == digest else None), [name]
+
+
+def get_cached_prefix(client, model: str, campaign_id, prefix: str) -> str | None:
+    """
+    Returns the name of the Gemini cached content holding `prefix` for the
+    campaign, creating it (and deleting an outdated one) if needed.
+
+    Returns:
+        None if caching is disabled, no campaign is given, the prefix is too
+        short, or the cache could not be created; the caller then sends the
+        whole prompt.
+    """
+    config = _config()
+    if not _usable(config, campaign_id, prefix):
+        return None
+
+    digest = prefix_hash(model, prefix)
+    previous, name = _lookup(config, campaign_id, digest)
+    if name is not None:
+        return name
+
+    try:
+        cached = get_guard().call(
+            lambda: client.caches.create(model=model, config=_cache_config(config, campaign_id, prefix)),
+            estimated_tokens=estimate_tokens(prefix),
+        )
+    except Exception as e:
+        logger.warning(f"Could not cache the prompt prefix of campaign {campaign_id}: {e}")
+        return None
+
+    name, stale = _record(config, campaign_id, previous, digest, cached.name)
+    for stale_name in stale:
+        _delete_remote(client, stale_name)
+    return name
+
+
+async def aget_cached_prefix(client, model: str, campaign_id, prefix: str) -> str | None:
+    """
+    Async variant of get_cached_prefix: the SDK calls go through the async
+    client, the bookkeeping is the same.
+    """
+    config = _config()
+    if not _usable(config, campaign_id, prefix):
+        return None
+
+    digest = prefix_hash(model, prefix)
+    previous, name = await sync_to_async(_lookup)(config, campaign_id, digest)
+    if name is not None:
+        return name
+
+    try:
+        cached = await get_guard().acall(
+            lambda: client.aio.caches.create(model=model, config=_cache_config(config, campaign_id, prefix)),
+            estimated_tokens=estimate_tokens(prefix),
+        )
+    except Exception as e:
+        logger.warning(f"Could not cache the prompt prefix of campaign {campaign_id}: {e}")
+        return None
+
+    name, stale = await sync_to_async(_record)(config, campaign_id, previous, digest, cached.name)
+    for stale_name in stale:
+        await _adelete_remote(client, stale_name)
+    return name
+
+
+def forget_cached_prefix(campaign_id, name: str) -> None:
+    """
+    Drops a cache that Gemini no longer accepts (expired or deleted early),
+    so the next generation creates a new one.
+    """
+    from .models import PromptPrefixCache
+
+    PromptPrefixCache.objects.filter(campaign_id=campaign_id, name=name).delete()
+
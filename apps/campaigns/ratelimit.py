@@ -0,0 +1,298 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to an in-process lock only.
+    fcntl = None
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_GEMINI_RATE_LIMIT = {
+    # Token buckets shared by every process on the host.
+    'REQUESTS_PER_MINUTE': 60,
+    'TOKENS_PER_MINUTE': 250000,
+    # Longest a caller waits for the buckets to refill before giving up.
+    'MAX_WAIT': 30.0,
+    'STATE_FILE': os.path.join(tempfile.gettempdir(), 'contentgen-gemini-limits.json'),
+    # Jittered exponential backoff for retryable errors.
+    'MAX_ATTEMPTS': 4,
+    'BASE_DELAY': 1.0,
+    'MAX_DELAY': 20.0,
+    # Circuit breaker: open after this many consecutive upstream failures...
+    'FAILURE_THRESHOLD': 5,
+    # ...and let a trial request through after this many seconds.
+    'RESET_TIMEOUT': 30.0,
+}
+
+# HTTP statuses worth retrying: timeouts, quota exhaustion and upstream trouble.
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class GeminiUnavailable(Exception):
+    """The Gemini API cannot be called right now; the request may succeed later."""
+
+
+class RateLimitExceeded(GeminiUnavailable):
+    """The shared quota did not free up within MAX_WAIT seconds."""
+
+
+class CircuitOpenError(GeminiUnavailable):
+    """Recent calls failed, so calls are refused until RESET_TIMEOUT has passed."""
+
+
+def is_retryable(exc: Exception) -> bool:
+    """True for transient errors: retryable HTTP statuses, timeouts and connection failures."""
+    # Only reached once a call has failed, so the SDK is already imported.
+    import httpx
+    from google.genai import errors
+
+    if isinstance(exc, errors.APIError):
+        return exc.code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, (httpx.TimeoutException, httpx.TransportError))
+
+
+def _retry_after(exc: Exception) -> float:
+    """Returns the server's Retry-After hint in seconds, if any."""
+    response = getattr(exc, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after', 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class SharedState:
+    """
+    A small JSON document shared between processes through a locked file.
+    Every read-modify-write happens under an exclusive flock, so gunicorn
+    workers on the same host see one consistent set of buckets.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def locked(self):
+        with self._thread_lock, open(self.path, 'a+', encoding='utf-8') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            handle.seek(0)
+            try:
+                state = json.loads(handle.read() or '{}')
+            except ValueError:
+                state = {}
+            yield state
+            handle.seek(0)
+            handle.truncate()
+            json.dump(state, handle)
+            handle.flush()
+
+
+class GeminiGuard:
+    """
+    Wraps Gemini calls with a shared token-bucket limiter (requests/min and
+    tokens/min), jittered exponential backoff and a circuit breaker.
+
+    Usage:
+        response = get_guard().call(lambda: client.models.generate_content(...), estimated_tokens=n)
+    """
+    def __init__(self, config=None):
+        self.config = {**DEFAULT_GEMINI_RATE_LIMIT, **(config or {})}
+        self.state = SharedState(self.config['STATE_FILE'])
+
+    # --- Token buckets ---
+
+    def _refill(self, bucket, capacity, now):
+        """Tops a bucket up for the time elapsed since it was last touched."""
+        tokens = bucket.get('tokens', capacity)
+        elapsed = max(0.0, now - bucket.get('updated', now))
+        bucket['tokens'] = min(capacity, tokens + elapsed * capacity / 60.0)
+        bucket['updated'] = now
+        return bucket
+
+    def try_acquire(self, tokens):
+        """
+        Takes one request and `tokens` tokens if both buckets allow it,
+        without waiting.
+
+        Returns:
+            0 on success, otherwise the seconds to wait before trying again.
+        """
+        rpm = self.config['REQUESTS_PER_MINUTE']
+        tpm = self.config['TOKENS_PER_MINUTE']
+        # A single request larger than the whole bucket could never be admitted.
+        tokens = min(tokens, tpm)
+        now = time.time()
+        with self.state.locked() as state:
+            requests = self._refill(state.setdefault('requests', {}), rpm, now)
+            token_bucket = self._refill(state.setdefault('tokens', {}), tpm, now)
+            if requests['tokens'] >= 1 and token_bucket['tokens'] >= tokens:
+                requests['tokens'] -= 1
+                token_bucket['tokens'] -= tokens
+                return 0.0
+            return max(
+                (1 - requests['tokens']) * 60.0 / rpm,
+                (tokens - token_bucket['tokens']) * 60.0 / tpm,
+            )
+
+    def acquire(self, tokens, sleep=time.sleep):
+        """
+        Blocks until the shared buckets admit the call.
+
+        Raises:
+            RateLimitExceeded: If that would take longer than MAX_WAIT seconds.
+        """
+        deadline = time.time() + self.config['MAX_WAIT']
+        while wait := self.try_acquire(tokens):
+            self._check_deadline(wait, deadline)
+            sleep(wait)
+
+    async def aacquire(self, tokens):
+        """Async variant of acquire(): waits on the event loop, not in a thread."""
+        deadline = time.time() + self.config['MAX_WAIT']
+        while wait := await sync_to_async(self.try_acquire, thread_sensitive=False)(tokens):
+            self._check_deadline(wait, deadline)
+            await asyncio.sleep(wait)
+
+    @staticmethod
+    def _check_deadline(wait, deadline):
+        if time.time() + wait > deadline:
+            raise RateLimitExceeded("Gemini quota exhausted; try again shortly.")
+
+    def reconcile(self, estimated, actual):
+        """Corrects the token bucket once the real token count of a call is known."""
+        if actual is None or actual == estimated:
+            return
+        tpm = self.config['TOKENS_PER_MINUTE']
+        with self.state.locked() as state:
+            bucket = self._refill(state.setdefault('tokens', {}), tpm, time.time())
+            bucket['tokens'] = min(tpm, bucket['tokens'] + estimated - actual)
+
+    # --- Circuit breaker ---
+
+    def check_circuit(self):
+        """
+        Raises CircuitOpenError while the circuit is open. Once RESET_TIMEOUT
+        has passed, one trial call is let through (half-open).
+        """
+        with self.state.locked() as state:
+            breaker = state.setdefault('breaker', {})
+            opened_at = breaker.get('opened_at')
+            if opened_at is None:
+                return
+            if time.time() - opened_at < self.config['RESET_TIMEOUT']:
+                raise CircuitOpenError("Gemini is currently unavailable; try again shortly.")
+            # Half-open: admit this caller, and keep others out until it reports back.
+            breaker['opened_at'] = time.time()
+            breaker['half_open'] = True
+
+    def record_success(self):
+        with self.state.locked() as state:
+            state['breaker'] = {}
+
+    def record_failure(self):
+        with self.state.locked() as state:
+            breaker = state.setdefault('breaker', {})
+            breaker['failures'] = breaker.get('failures', 0) + 1
+            if breaker.get('half_open') or breaker['failures'] >= self.config['FAILURE_THRESHOLD']:
+                if breaker.get('opened_at') is None:
+                    logger.warning("Opening the Gemini circuit breaker after repeated failures.")
+                breaker['opened_at'] = time.time()
+                breaker['half_open'] = False
+
+    def record_outcome(self, exc=None):
+        """Feeds the result of a call made outside call()/acall() (e.g. a stream) to the breaker."""
+        if exc is None:
+            self.record_success()
+        elif is_retryable(exc):
+            self.record_failure()
+
+    # --- Calls ---
+
+    def _backoff(self, attempt, exc):
+        """Full-jitter exponential delay, never shorter than the server's Retry-After."""
+        ceiling = min(self.config['MAX_DELAY'], self.config['BASE_DELAY'] * 2 ** attempt)
+        return max(random.uniform(0, ceiling), _retry_after(exc))
+
+    def begin(self, estimated_tokens, sleep=time.sleep):
+        """Fails fast if the circuit is open, then waits for quota."""
+        self.check_circuit()
+        self.acquire(estimated_tokens, sleep=sleep)
+
+    async def abegin(self, estimated_tokens):
+        """Async variant of begin()."""
+        await sync_to_async(self.check_circuit, thread_sensitive=False)()
+        await self.aacquire(estimated_tokens)
+
+    def _after_failure(self, attempt, exc):
+        """Records a failed attempt. Returns the delay before retrying, or re-raises."""
+        if not is_retryable(exc):
+            raise exc
+        self.record_failure()
+        if attempt + 1 >= self.config['MAX_ATTEMPTS']:
+            raise exc
+        delay = self._backoff(attempt, exc)
+        logger.warning(f"Gemini call failed ({exc}); retrying in {delay:.1f}s.")
+        return delay
+
+    def _after_success(self, response, estimated_tokens):
+        self.record_success()
+        usage = getattr(response, 'usage_metadata', None)
+        self.reconcile(estimated_tokens, getattr(usage, 'prompt_token_count', None))
+
+    def call(self, func, estimated_tokens=0, sleep=time.sleep):
+        """
+        Runs func() under the limiter, retrying transient failures.
+
+        Raises:
+            RateLimitExceeded, CircuitOpenError: When the call was not attempted.
+            The last error from func() when retries are exhausted or it is not retryable.
+        """
+        attempt = 0
+        while True:
+            self.begin(estimated_tokens, sleep=sleep)
+            try:
+                response = func()
+            except Exception as exc:
+                sleep(self._after_failure(attempt, exc))
+                attempt += 1
+                continue
+            self._after_success(response, estimated_tokens)
+            return response
+
+    async def acall(self, func, estimated_tokens=0):
+        """Async variant of call(); func must return an awaitable."""
+        attempt = 0
+        while True:
+            await self.abegin(estimated_tokens)
+            try:
+                response = await func()
+            except Exception as exc:
+                delay = await sync_to_async(self._after_failure, thread_sensitive=False)(attempt, exc)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            await sync_to_async(self._after_success, thread_sensitive=False)(response, estimated_tokens)
+            return response
+
+
+def get_guard() -> GeminiGuard:
+    """Returns a guard configured from the GEMINI_RATE_LIMIT setting."""
+    return GeminiGuard(getattr(settings, 'GEMINI_RATE_LIMIT', {}))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for quota accounting (about four characters per token)."""
+    return max(1, len(text) // 4)
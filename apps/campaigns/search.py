@@ -0,0 +1,306 @@
+import logging
+import re
+from collections.abc import Sequence
+from itertools import islice
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F, Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+# CampaignItem fields indexed as body text, alongside the item title.
+ITEM_SEARCH_FIELDS = (
+    'input_content', 'linkedin_content', 'x_content', 'facebook_content', 'instagram_content',
+    'youtube_content', 'quora_content', 'reddit_content', 'blog_content',
+)
+
+# Postgres text search configuration (stemming and stop words).
+SEARCH_CONFIG = 'english'
+
+# Minimum pg_trgm similarity for a title to match despite typos. The `%`
+# operator (trigram_similar) compares against pg_trgm.similarity_threshold,
+# which is set to this for the query.
+TRIGRAM_THRESHOLD = 0.3
+
+# SQLite FTS5 tables, keyed by rowid = the campaign / item primary key.
+CAMPAIGN_FTS_TABLE = 'campaigns_campaign_fts'
+ITEM_FTS_TABLE = 'campaigns_campaignitem_fts'
+
+BATCH_SIZE = 500
+
+
+def campaign_document(campaign) -> tuple[str, str]:
+    """Returns the (title, body) text indexed for a Campaign."""
+    return campaign.title or '', campaign.objectives or ''
+
+
+def item_document(item) -> tuple[str, str]:
+    """Returns the (title, body) text indexed for a CampaignItem."""
+    body = '\n'.join(value for value in (getattr(item, name) for name in ITEM_SEARCH_FIELDS) if value)
+    return item.title or '', body
+
+
+def _batches(objects):
+    objects = iter(objects)
+    while batch := list(islice(objects, BATCH_SIZE)):
+        yield batch
+
+
+class BaseSearchBackend:
+    """
+    Interface for search backends. Titles are weighted above body text, and
+    a campaign matches when its own text or any of its items' text matches.
+    """
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def index_campaigns(self, campaigns) -> None:
+        pass
+
+    def index_items(self, items) -> None:
+        pass
+
+    def rank_campaigns(self, user, query: str) -> dict[int, float]:
+        """Returns {campaign id: rank} for the user's campaigns matching the query."""
+        raise NotImplementedError
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """
+    Unindexed substring search, for databases without full-text support.
+    Campaign matches rank above matches found only in items. Generated
+    content is stored compressed, so only item titles and briefs are searched.
+    """
+    def rank_campaigns(self, user, query):
+        from .models import Campaign, CampaignItem
+
+        ranks = {}
+        item_filter = Q(title__icontains=query) | Q(input_content__icontains=query)
+        item_matches = (
+            CampaignItem.objects.using(self.using)
+            .filter(item_filter, campaign__user=user)
+            .values_list('campaign_id', flat=True)
+            .distinct()
+        )
+        ranks.update((pk, 0.5) for pk in item_matches)
+        campaign_matches = (
+            Campaign.objects.using(self.using)
+            .filter(Q(title__icontains=query) | Q(objectives__icontains=query), user=user)
+            .values_list('pk', flat=True)
+        )
+        ranks.update((pk, 1.0) for pk in campaign_matches)
+        return ranks
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Weighted tsvector columns with GIN indexes, plus pg_trgm indexes on the
+    titles so misspelled queries still find them. The vectors are computed
+    from the text Django saves, in one UPDATE per batch.
+
+    The full-text (`@@`) and trigram (`%`) matches are separate branches of
+    a UNION, so each one is answered from its own GIN index; an OR of the
+    two in one WHERE clause, or a filter on a computed similarity, forces a
+    sequential scan. A row found by both keeps its better rank.
+    """
+    def _update_vectors(self, table, documents):
+        for batch in _batches(documents):
+            values = ', '.join(['(%s, %s, %s)'] * len(batch))
+            params = [value for document in batch for value in document]
+            with connections[self.using].cursor() as cursor:
+                cursor.execute(
+                    f"UPDATE {table} AS t SET search_vector = "
+                    f"setweight(to_tsvector('{SEARCH_CONFIG}', v.title), 'A') || "
+                    f"setweight(to_tsvector('{SEARCH_CONFIG}', v.body), 'B') "
+                    f"FROM (VALUES {values}) AS v(id, title, body) WHERE t.id = v.id",
+                    params,
+                )
+
+    def index_campaigns(self, campaigns):
+        self._update_vectors(
+            'campaigns_campaign', [(c.pk, *campaign_document(c)) for c in campaigns]
+        )
+
+    def index_items(self, items):
+        self._update_vectors(
+            'campaigns_campaignitem', [(i.pk, *item_document(i)) for i in items]
+        )
+
+    def rank_campaigns(self, user, query):
+        from .models import Campaign, CampaignItem
+
+        search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+        ranks = {}
+        with connections[self.using].cursor() as cursor:
+            cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, false)", [str(TRIGRAM_THRESHOLD)])
+        for model, owner in ((CampaignItem, 'campaign__user'), (Campaign, 'user')):
+            rows = model.objects.using(self.using).filter(**{owner: user}).order_by()
+            key = 'campaign_id' if model is CampaignItem else 'pk'
+            full_text = (
+                rows.filter(search_vector=search_query)
+                .annotate(rank=SearchRank(F('search_vector'), search_query))
+                .values_list(key, 'rank')
+            )
+            trigram = (
+                rows.filter(title__trigram_similar=query)
+                .annotate(rank=TrigramSimilarity('title', query))
+                .values_list(key, 'rank')
+            )
+            for pk, rank in full_text.union(trigram, all=True):
+                ranks[pk] = max(rank, ranks.get(pk, 0.0))
+        return ranks
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    FTS5 tables (porter stemming) ranked with bm25, for local development.
+    The last query word is matched as a prefix. Rows are removed by DELETE
+    triggers (see the migration), so cascading deletes need no Python work.
+
+    Each row also carries an `owner` token ("u<user id>") that every query
+    matches on, so FTS5 only scores the searching user's rows.
+    """
+    # bm25 column weights: owner, title, body.
+    WEIGHTS = '0.0, 10.0, 1.0'
+
+    @staticmethod
+    def match_expression(user, query):
+        """Quotes every word so user input can never be read as FTS5 syntax."""
+        words = re.findall(r'\w+', query)
+        if not words:
+            return None
+        terms = ' '.join(f'"{word}"' for word in words) + '*'
+        return f'owner : "u{user.pk}" AND {{title body}} : ({terms})'
+
+    def _replace(self, table, documents):
+        """Writes (rowid, title, body, campaign id) rows, taking the owner from the campaign."""
+        with connections[self.using].cursor() as cursor:
+            for batch in _batches(documents):
+                cursor.executemany(
+                    f"INSERT OR REPLACE INTO {table} (rowid, owner, title, body) "
+                    f"SELECT %s, 'u' || user_id, %s, %s FROM campaigns_campaign WHERE id = %s",
+                    batch,
+                )
+
+    def index_campaigns(self, campaigns):
+        self._replace(CAMPAIGN_FTS_TABLE, [(c.pk, *campaign_document(c), c.pk) for c in campaigns])
+
+    def index_items(self, items):
+        self._replace(ITEM_FTS_TABLE, [(i.pk, *item_document(i), i.campaign_id) for i in items])
+
+    def rank_campaigns(self, user, query):
+        expression = self.match_expression(user, query)
+        if expression is None:
+            return {}
+        # bm25 is lower for better matches, and cannot be used inside an aggregate.
+        statements = (
+            f"SELECT i.campaign_id, -bm25({ITEM_FTS_TABLE}, {self.WEIGHTS}) FROM {ITEM_FTS_TABLE} "
+            f"JOIN campaigns_campaignitem i ON i.id = {ITEM_FTS_TABLE}.rowid "
+            f"WHERE {ITEM_FTS_TABLE} MATCH %s",
+            f"SELECT rowid, -bm25({CAMPAIGN_FTS_TABLE}, {self.WEIGHTS}) FROM {CAMPAIGN_FTS_TABLE} "
+            f"WHERE {CAMPAIGN_FTS_TABLE} MATCH %s",
+        )
+        ranks = {}
+        with connections[self.using].cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement, [expression])
+                for pk, rank in cursor.fetchall():
+                    ranks[pk] = max(rank, ranks.get(pk, 0.0))
+        return ranks
+
+
+_backends = {}
+
+
+def get_search_backend(using=DEFAULT_DB_ALIAS) -> BaseSearchBackend:
+    """
+    Picks the search backend for a database: Postgres full-text search,
+    SQLite FTS5 when its tables exist, or unindexed substring search.
+    """
+    if using not in _backends:
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            backend = PostgresSearchBackend(using)
+        elif connection.vendor == 'sqlite' and CAMPAIGN_FTS_TABLE in connection.introspection.table_names():
+            backend = SQLiteSearchBackend(using)
+        else:
+            backend = BasicSearchBackend(using)
+        _backends[using] = backend
+    return _backends[using]
+
+
+class SearchResults(Sequence):
+    """
+    Campaigns ranked best first. Only the ids and ranks are held in memory;
+    slicing (as the Paginator does) loads just the requested campaigns, each
+    with a `search_rank` attribute.
+    """
+    def __init__(self, ranked, using=DEFAULT_DB_ALIAS):
+        self.ranked = ranked
+        self.using = using
+
+    def __len__(self):
+        return len(self.ranked)
+
+    def __getitem__(self, index):
+        from .models import Campaign
+
+        if not isinstance(index, slice):
+            return self[index:index + 1][0] if index >= 0 else self[len(self) + index]
+        page = self.ranked[index]
+        campaigns = Campaign.objects.using(self.using).in_bulk([pk for pk, _ in page])
+        results = []
+        for pk, rank in page:
+            if pk in campaigns:
+                campaigns[pk].search_rank = rank
+                results.append(campaigns[pk])
+        return results
+
+
+def search_campaigns(user, query: str, using=DEFAULT_DB_ALIAS) -> SearchResults:
+    """
+    Full-text search over the user's campaigns and their items.
+
+    Returns:
+        SearchResults ordered by rank, most recently updated first on ties.
+    """
+    ranks = get_search_backend(using).rank_campaigns(user, query)
+    # Campaign ids increase with creation time, a cheap stand-in for recency on ties.
+    ranked = sorted(ranks.items(), key=lambda entry: (-entry[1], -entry[0]))
+    return SearchResults(ranked, using=using)
+
+
+def rebuild_index(using=DEFAULT_DB_ALIAS):
+    """Re-indexes every campaign and item, e.g. after enabling search on existing data."""
+    from .models import Campaign, CampaignItem
+
+    backend = get_search_backend(using)
+    campaigns = Campaign.objects.using(using).only('pk', 'title', 'objectives').order_by('pk')
+    for batch in _batches(campaigns.iterator(chunk_size=BATCH_SIZE)):
+        backend.index_campaigns(batch)
+    items = CampaignItem.objects.using(using).only('pk', 'campaign_id', 'title', *ITEM_SEARCH_FIELDS).order_by('pk')
+    for batch in _batches(items.iterator(chunk_size=BATCH_SIZE)):
+        backend.index_items(batch)
+
+
+# --- Signal receivers keeping the index current ---
+
+def _indexed_fields_changed(update_fields, indexed):
+    return update_fields is None or bool(set(update_fields) & set(indexed))
+
+
+@receiver(post_save, sender='campaigns.Campaign')
+def index_saved_campaign(sender, instance, raw=False, using=DEFAULT_DB_ALIAS, update_fields=None, **kwargs):
+    if not raw and _indexed_fields_changed(update_fields, ('title', 'objectives')):
+        get_search_backend(using).index_campaigns([instance])
+
+
+@receiver(post_save, sender='campaigns.CampaignItem')
+def index_saved_item(sender, instance, raw=False, using=DEFAULT_DB_ALIAS, update_fields=None, **kwargs):
+    if not raw and _indexed_fields_changed(update_fields, ('title', *ITEM_SEARCH_FIELDS)):
+        get_search_backend(using).index_items([instance])
+
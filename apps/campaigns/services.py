@@ -1,52 +1,118 @@
+import asyncio
+import contextvars
 import json
-from google import genai
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+from asgiref.sync import sync_to_async
 from django.conf import settings
 import logging
 
+from contentgen.metrics import Counter, Histogram, record_timing
+
+from .cache import generation_cache_key, get_generation_cache
+from .gemini import get_client
+from .promptcache import aget_cached_prefix, forget_cached_prefix, get_cached_prefix
+from .ratelimit import GeminiUnavailable, estimate_tokens, get_guard, is_retryable
+from .streaming import IncrementalFieldParser
+
+if TYPE_CHECKING:
+    # Imported where used; see gemini.py.
+    from google.genai import types
+
 # Set up a logger for this module
 logger = logging.getLogger(__name__)
 
-def generate_campaign_content(input_content: str, org_context: str, campaign_context: str) -> dict | None:
+# model_name="gemini-2.0-flash-lite"
+MODEL_NAME = "gemini-2.5-flash"
+
+# Bump whenever the prompt below changes so cached results are not reused.
+PROMPT_VERSION = 2
+
+# How many follow-up calls may be made for fields missing from a response.
+MAX_FIELD_RETRIES = 1
+
+# A faster, cheaper model for short fields when generation is fanned out.
+LIGHT_MODEL_NAME = "gemini-2.5-flash-lite"
+
+DEFAULT_GENERATION_FAN_OUT = {
+    # Off: one call on MODEL_NAME writes every field.
+    'ENABLED': False,
+    # Fields generated together by one call, and the model that call goes to.
+    # Requested fields no group lists are generated together on MODEL_NAME.
+    'GROUPS': [
+        {'fields': ['x_content', 'image_prompt', 'video_prompt'], 'model': LIGHT_MODEL_NAME},
+        {'fields': ['blog_content'], 'model': MODEL_NAME},
+        {'fields': ['linkedin_content', 'quora_content', 'reddit_content'], 'model': MODEL_NAME},
+    ],
+}
+
+GEMINI_DURATION = Histogram(
+    'contentgen_gemini_request_duration_seconds',
+    "Time per Gemini API call; streamed calls are timed to their last chunk.",
+    ['model', 'outcome'],
+)
+GEMINI_RETRIES = Counter(
+    'contentgen_gemini_retries_total', "Gemini calls repeated after a transient error.", ['model'],
+)
+GEMINI_TOKENS = Counter(
+    'contentgen_gemini_tokens_total', "Tokens reported in the usage_metadata of Gemini responses.", ['model', 'kind'],
+)
+
+# usage_metadata attribute -> `kind` label of GEMINI_TOKENS.
+USAGE_TOKEN_KINDS = {
+    'prompt_token_count': 'prompt',
+    'cached_content_token_count': 'cached',
+    'candidates_token_count': 'output',
+    'thoughts_token_count': 'thoughts',
+}
+
+# The output structure requested from the model, one entry per CampaignItem field.
+CONTENT_FIELDS = {
+    "linkedin_content": {"description": "Professional content for LinkedIn, business-focused and engaging for a professional audience, including relevant hashtags. Length should be 1 to 1.5 times the input content", "type": "string"},
+    "x_content": {"description": "Short, punchy content for X (formerly Twitter), under 280 characters, using emojis and relevant hashtags.", "type": "string"},
+    "facebook_content": {"description": "Engaging and community-focused content for Facebook, suitable for discussion, including emojis and relevant hashtags.", "type": "string"},
+    "instagram_content": {"description": "Visually-driven caption for an Instagram post, including relevant hashtags and emojis.", "type": "string"},
+    "youtube_content": {"description": "A detailed description for a YouTube video"},
+    "quora_content": {"description": "An answer-style post for Quora, providing value and expertise on the topic. Length should be 1 to 1.5 times the input content", "type": "string"},
+    "reddit_content": {"description": "A post suitable for a relevant subreddit, written in a conversational and authentic tone. Length should be 1 to 1.5 times the input content", "type": "string"},
+    "blog_content": {"description": "A short-form blog post (2-3 paragraphs) that expands on the input content. Length should be 2 to 3 times the input content", "type": "string"},
+    "image_prompt": {"description": "A descriptive prompt for an AI image generator to create a relevant visual.", "type": "string"},
+    "video_prompt": {"description": "A descriptive prompt for an AI video generator to create a short-form video.", "type": "string"},
+}
+
+
+def resolve_fields(fields=None) -> list[str]:
     """
-    Invokes the Gemini API to generate content for all platforms based on an input brief.
+    Normalizes a requested subset of CONTENT_FIELDS, keeping their canonical order.
 
     Args:
-        input_content: The user-provided content or idea.
-        org_context:
-        campaign_context:
+        fields: An iterable of field names, or None/empty for all fields.
 
-    Returns:
-        A dictionary containing the generated content for all fields,
-        or None if an error occurs.
+    Raises:
+        ValueError: If an unknown field name is requested.
     """
-    api_key = getattr(settings, 'GEMINI_API_KEY', None)
-    if not api_key:
-        logger.error("GEMINI_API_KEY is not configured in settings.")
-        return None
+    if not fields:
+        return list(CONTENT_FIELDS)
+    unknown = set(fields) - set(CONTENT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown content fields: {', '.join(sorted(unknown))}")
+    return [name for name in CONTENT_FIELDS if name in fields]
 
-    try:
-        client = genai.Client(api_key=api_key)
-        # model_name="gemini-2.0-flash-lite"
-        model_name = "gemini-2.5-flash"
-        fields = {
-            "linkedin_content": {"description": "Professional content for LinkedIn, business-focused and engaging for a professional audience, including relevant hashtags. Length should be 1 to 1.5 times the input content", "type": "string"},
-            "x_content": {"description": "Short, punchy content for X (formerly Twitter), under 280 characters, using emojis and relevant hashtags.", "type": "string"},
-            "facebook_content": {"description": "Engaging and community-focused content for Facebook, suitable for discussion, including emojis and relevant hashtags.", "type": "string"},
-            "instagram_content": {"description": "Visually-driven caption for an Instagram post, including relevant hashtags and emojis.", "type": "string"},
-            "youtube_content": {"description": "A detailed description for a YouTube video"},
-            "quora_content": {"description": "An answer-style post for Quora, providing value and expertise on the topic. Length should be 1 to 1.5 times the input content", "type": "string"},
-            "reddit_content": {"description": "A post suitable for a relevant subreddit, written in a conversational and authentic tone. Length should be 1 to 1.5 times the input content", "type": "string"},
-            "blog_content": {"description": "A short-form blog post (2-3 paragraphs) that expands on the input content. Length should be 2 to 3 times the input content", "type": "string"},
-            "image_prompt": {"description": "A descriptive prompt for an AI image generator to create a relevant visual.", "type": "string"},
-            "video_prompt": {"description": "A descriptive prompt for an AI video generator to create a short-form video.", "type": "string"},
-        }
-
-        prompt = f"""
+
+def build_prompt_prefix(org_context: str, campaign_context: str) -> str:
+    """
+    Builds the part of the prompt shared by every item of a campaign: the
+    instructions and the two contexts. It may be sent once as a Gemini cached
+    content (see promptcache.py). The output structure is not spelled out
+    here: it is enforced by the response schema (see build_response_schema).
+    """
+    return f"""
         You are a world-class marketing and content creation expert.
-        Your task is to understand the organization and campaign contexts and generate a cohesive set of social media 
+        Your task is to understand the organization and campaign contexts and generate a cohesive set of social media
         and blog content.
-        Use the input content and generate other social media content as specified in the JSON output structure below.
-        Provide the output as a single, valid JSON object. 
+        Use the input content and generate other social media content for each field of the response schema,
+        following each field's description.
 
         ORG_CONTEXT:
         ------------
@@ -56,39 +122,632 @@ def generate_campaign_content(input_content: str, org_context: str, campaign_con
         -----------------
         {campaign_context}
 
-        INPUT_CONTENT: 
+"""
+
+
+def build_prompt_input(input_content: str) -> str:
+    """Builds the part of the prompt that changes from item to item."""
+    return f"""        INPUT_CONTENT:
         {input_content}
+        """
+
+
+def build_prompt(input_content: str, org_context: str, campaign_context: str) -> str:
+    """Builds the whole generation prompt: the shared prefix followed by the input."""
+    return build_prompt_prefix(org_context, campaign_context) + build_prompt_input(input_content)
+
+
+def build_response_schema(fields: list[str]) -> 'types.Schema':
+    """
+    Builds the JSON response schema for the requested fields from CONTENT_FIELDS.
+    Properties are ordered like CONTENT_FIELDS so streamed fields arrive in a
+    predictable order.
+    """
+    from google.genai import types
+
+    return types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            name: types.Schema(type=types.Type.STRING, description=CONTENT_FIELDS[name]["description"])
+            for name in fields
+        },
+        required=list(fields),
+        property_ordering=list(fields),
+    )
+
+
+def build_generation_config(fields: list[str], cached_content: str | None = None) -> 'types.GenerateContentConfig':
+    """
+    Requests JSON output constrained to the schema for the given fields.
+
+    Args:
+        cached_content: Name of a cached prompt prefix the request continues.
+    """
+    from google.genai import types
+
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=build_response_schema(fields),
+        cached_content=cached_content,
+    )
+
+
+def record_gemini_call(model: str, seconds: float, ok=True, usage=None) -> None:
+    """
+    Records one Gemini call in the metrics and in the current request's
+    Server-Timing header.
+
+    Args:
+        usage: The response's usage_metadata, if it has one.
+    """
+    GEMINI_DURATION.observe(seconds, model=model, outcome='ok' if ok else 'error')
+    record_timing('gemini', seconds)
+    for attribute, kind in USAGE_TOKEN_KINDS.items():
+        count = getattr(usage, attribute, None)
+        if count:
+            GEMINI_TOKENS.inc(count, model=model, kind=kind)
+
+
+class _Observed:
+    """
+    Wraps a GeminiGuard.call() target so each attempt is timed and every
+    repeat counts as a retry. Pass the instance to call(), or its `acall`
+    to GeminiGuard.acall() when `func` returns an awaitable.
+    """
+    def __init__(self, func, model: str):
+        self.func = func
+        self.model = model
+        self.attempts = 0
+
+    def _start(self) -> float:
+        self.attempts += 1
+        if self.attempts > 1:
+            GEMINI_RETRIES.inc(model=self.model)
+        return time.perf_counter()
+
+    def _finish(self, start: float, response=None, ok=True) -> None:
+        usage = getattr(response, 'usage_metadata', None)
+        record_gemini_call(self.model, time.perf_counter() - start, ok=ok, usage=usage)
+
+    def __call__(self):
+        start = self._start()
+        try:
+            response = self.func()
+        except Exception:
+            self._finish(start, ok=False)
+            raise
+        self._finish(start, response)
+        return response
+
+    async def acall(self):
+        start = self._start()
+        try:
+            response = await self.func()
+        except Exception:
+            self._finish(start, ok=False)
+            raise
+        self._finish(start, response)
+        return response
+
+
+def parse_generated_content(text: str, fields: list[str]) -> dict:
+    """
+    Extracts the requested fields from a model response, as leniently as possible.
+
+    Tries, in order: the whole text as JSON, the text between the outermost
+    braces (which drops markdown fences or stray prose), and finally the
+    incremental parser, which recovers every field that was completed before
+    the response broke off. Fields that are missing, empty or not strings are
+    left out, so the caller can retry just those.
+    """
+    text = text or ''
+    data = None
+    for candidate in (text, text[text.find('{'):text.rfind('}') + 1]):
+        try:
+            data = json.loads(candidate)
+            break
+        except ValueError:
+            continue
+
+    if not isinstance(data, dict):
+        parser = IncrementalFieldParser()
+        parser.feed(text)
+        data = parser.fields
+
+    return {
+        name: data[name]
+        for name in fields
+        if isinstance(data.get(name), str) and data[name].strip()
+    }
+
+
+def fan_out_groups(fields: list[str]) -> list[tuple[str, list[str]]]:
+    """
+    Splits the requested fields into the (model, fields) groups that are
+    generated by separate, concurrent calls.
+
+    With GENERATION_FAN_OUT disabled, everything is one group on MODEL_NAME.
+    Otherwise each configured group keeps the requested fields it lists, and
+    any field no group lists goes to MODEL_NAME in one last group.
+    """
+    config = {**DEFAULT_GENERATION_FAN_OUT, **getattr(settings, 'GENERATION_FAN_OUT', {})}
+    if not config['ENABLED']:
+        return [(MODEL_NAME, list(fields))]
+    groups = []
+    assigned = set()
+    for group in config['GROUPS']:
+        group_fields = [name for name in fields if name in group['fields'] and name not in assigned]
+        if group_fields:
+            groups.append((group.get('model', MODEL_NAME), group_fields))
+            assigned.update(group_fields)
+    rest = [name for name in fields if name not in assigned]
+    if rest:
+        groups.append((MODEL_NAME, rest))
+    return groups
+
+
+def _generation_model(fields: list[str]) -> str:
+    """The model part of the generation cache key: the model, or the whole routing when fanned out."""
+    groups = fan_out_groups(fields)
+    if len(groups) == 1 and groups[0][0] == MODEL_NAME:
+        return MODEL_NAME
+    return json.dumps(groups)
+
+
+def cached_campaign_content(input_content: str, org_context: str, campaign_context: str, fields=None) -> dict | None:
+    """
+    Returns previously generated content for exactly these inputs, if cached.
+
+    This never calls the Gemini API, so it is cheap enough to use inside a request.
+    """
+    cache = get_generation_cache()
+    if cache is None:
+        return None
+    fields = resolve_fields(fields)
+    key = generation_cache_key(
+        input_content, org_context, campaign_context, _generation_model(fields), PROMPT_VERSION, fields
+    )
+    return cache.get(key)
+
+
+def _build_prompts(input_content: str, org_context: str, campaign_context: str) -> tuple[str, str]:
+    """Returns the campaign's shared prompt prefix and the whole prompt for this input."""
+    prefix = build_prompt_prefix(org_context, campaign_context)
+    return prefix, prefix + build_prompt_input(input_content)
+
+
+def _prefix_for(model: str, cached_prefix):
+    """Cached contents belong to one model; calls to other models get the whole prompt."""
+    return cached_prefix if model == MODEL_NAME else None
+
+
+def _content_request(model: str, prompt: str, input_content: str, fields: list[str], cached_prefix=None) -> dict:
+    """The generate_content arguments; with a cached prefix only the input is sent."""
+    return {
+        'model': model,
+        'contents': build_prompt_input(input_content) if cached_prefix else prompt,
+        'config': build_generation_config(fields, cached_content=cached_prefix),
+    }
+
+
+def _generate_content(client, guard, model: str, prompt: str, input_content: str, fields: list[str],
+                      cached_prefix=None):
+    """One generate_content call through the guard."""
+    request = _content_request(model, prompt, input_content, fields, cached_prefix)
+    return guard.call(
+        _Observed(lambda: client.models.generate_content(**request), model),
+        estimated_tokens=estimate_tokens(prompt),
+    )
+
+
+async def _agenerate_content(client, guard, model: str, prompt: str, input_content: str, fields: list[str],
+                             cached_prefix=None):
+    """Async variant of _generate_content, on the SDK's async client."""
+    request = _content_request(model, prompt, input_content, fields, cached_prefix)
+    return await guard.acall(
+        _Observed(lambda: client.aio.models.generate_content(**request), model).acall,
+        estimated_tokens=estimate_tokens(prompt),
+    )
+
+
+class _FieldGeneration:
+    """
+    The bookkeeping behind _generate_fields and _agenerate_fields, which
+    only differ in how they call the SDK: the fields still missing, the
+    fallback to the whole prompt when Gemini rejects the cached prefix,
+    and what to do when a call fails.
+    """
+    def __init__(self, model: str, fields: list[str], cached_prefix=None):
+        self.model = model
+        self.fields = fields
+        self.cached_prefix = cached_prefix
+        self.generated = {}
+        self.rejected = False
+        # The first pass asks for every field; follow-ups only ask for what is still missing.
+        self.missing = fields
+        self.passes = 0
 
-        JSON_OUTPUT_STRUCTURE:
-        {{
-            "linkedin_content": "{json.dumps(fields['linkedin_content'])}",
-            "x_content": "{json.dumps(fields['x_content'])}",
-            "facebook_content": "{json.dumps(fields['facebook_content'])}",
-            "instagram_content": "{json.dumps(fields['instagram_content'])}",
-            "youtube_content": "{json.dumps(fields['youtube_content'])}",
-            "quora_content": "{json.dumps(fields['quora_content'])}",
-            "reddit_content": "{json.dumps(fields['reddit_content'])}",
-            "blog_content": "{json.dumps(fields['blog_content'])}",
-            "image_prompt": "{json.dumps(fields['image_prompt'])}",
-            "video_prompt": "{json.dumps(fields['video_prompt'])}",
-        }}
+    def pending(self) -> bool:
+        return bool(self.missing) and self.passes < 1 + MAX_FIELD_RETRIES
 
-        Ensure the output is ONLY the JSON object.
-        Do not include any explanatory text, comments, or markdown formatting (like ```json) before or after the JSON object.
+    def falls_back(self, exc: Exception) -> bool:
+        """
+        True if `exc` means the cached prefix expired or was deleted early;
+        the pass is then repeated with the whole prompt.
+        """
+        if not self.cached_prefix or isinstance(exc, GeminiUnavailable) or is_retryable(exc):
+            return False
+        logger.warning(f"Gemini rejected the cached prefix {self.cached_prefix} ({exc}); sending the whole prompt.")
+        self.cached_prefix = None
+        self.rejected = True
+        return True
 
+    def failed(self, exc: Exception) -> None:
+        """
+        Ends the passes after a failed call.
 
+        Raises:
+            GeminiUnavailable: If the guard refused the call before anything
+                was generated, so the caller can retry later.
         """
+        if isinstance(exc, GeminiUnavailable):
+            if not self.generated:
+                raise exc
+        else:
+            logger.error(f"An error occurred while calling the Gemini API ({self.model}): {exc}")
+
+    def add(self, response) -> None:
+        logger.debug(f"Response: {response.text}")
+        self.passes += 1
+        self.generated.update(parse_generated_content(response.text, self.missing))
+        self.missing = [name for name in self.fields if name not in self.generated]
+        if self.missing:
+            logger.warning(f"Gemini response was missing fields {self.missing} (attempt {self.passes}).")
+
+    def result(self) -> tuple[dict, bool]:
+        return self.generated, self.rejected
+
+
+def _generate_fields(client, guard, model: str, prompt: str, input_content: str, fields: list[str],
+                     cached_prefix=None) -> tuple[dict, bool]:
+    """
+    Generates `fields` with one model, making follow-up calls for fields
+    missing from the response (up to MAX_FIELD_RETRIES).
+
+    Returns:
+        The fields generated (possibly empty if the calls failed), and
+        whether Gemini rejected `cached_prefix`, in which case the whole
+        prompt was sent instead.
+
+    Raises:
+        GeminiUnavailable: If the guard refused the call before anything was generated.
+    """
+    generation = _FieldGeneration(model, fields, cached_prefix)
+    while generation.pending():
+        try:
+            try:
+                response = _generate_content(
+                    client, guard, model, prompt, input_content, generation.missing, generation.cached_prefix
+                )
+            except Exception as e:
+                if not generation.falls_back(e):
+                    raise
+                response = _generate_content(client, guard, model, prompt, input_content, generation.missing)
+        except Exception as e:
+            generation.failed(e)
+            break
+        generation.add(response)
+    return generation.result()
+
+
+async def _agenerate_fields(client, guard, model: str, prompt: str, input_content: str, fields: list[str],
+                            cached_prefix=None) -> tuple[dict, bool]:
+    """Async variant of _generate_fields."""
+    generation = _FieldGeneration(model, fields, cached_prefix)
+    while generation.pending():
+        try:
+            try:
+                response = await _agenerate_content(
+                    client, guard, model, prompt, input_content, generation.missing, generation.cached_prefix
+                )
+            except Exception as e:
+                if not generation.falls_back(e):
+                    raise
+                response = await _agenerate_content(client, guard, model, prompt, input_content, generation.missing)
+        except Exception as e:
+            generation.failed(e)
+            break
+        generation.add(response)
+    return generation.result()
+
+
+def _merge_groups(groups, results) -> tuple[dict, bool]:
+    """
+    Merges the _generate_fields results of the fan-out groups, in the order
+    of `groups`. A group that the guard refused only loses its own fields.
+
+    Raises:
+        GeminiUnavailable: If every group was refused by the guard.
+        The error of a group that failed in any other way.
+    """
+    generated_data = {}
+    rejected = False
+    unavailable = None
+    for (_, group_fields), result in zip(groups, results):
+        if isinstance(result, GeminiUnavailable):
+            logger.warning(f"Fields {group_fields} were not generated: {result}")
+            unavailable = result
+            continue
+        if isinstance(result, BaseException):
+            raise result
+        data, group_rejected = result
+        generated_data.update(data)
+        rejected = rejected or group_rejected
+    if not generated_data and unavailable is not None:
+        raise unavailable
+    return generated_data, rejected
+
+
+def _fan_out(client, guard, groups, prompt: str, input_content: str, cached_prefix=None) -> tuple[dict, bool]:
+    """
+    Runs _generate_fields for every group, concurrently on a thread pool
+    when there is more than one, and merges the results (see _merge_groups).
+    """
+    if len(groups) == 1:
+        (model, group_fields), = groups
+        return _generate_fields(
+            client, guard, model, prompt, input_content, group_fields, _prefix_for(model, cached_prefix)
+        )
+    with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+        futures = [
+            # Each thread runs in a copy of this context, so Server-Timing still sees its calls.
+            executor.submit(
+                contextvars.copy_context().run, _generate_fields, client, guard, model, prompt, input_content,
+                group_fields, _prefix_for(model, cached_prefix),
+            )
+            for model, group_fields in groups
+        ]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+    return _merge_groups(groups, results)
+
+
+async def _afan_out(client, guard, groups, prompt: str, input_content: str, cached_prefix=None) -> tuple[dict, bool]:
+    """Async variant of _fan_out: the groups are awaited together instead of on a thread pool."""
+    if len(groups) == 1:
+        (model, group_fields), = groups
+        return await _agenerate_fields(
+            client, guard, model, prompt, input_content, group_fields, _prefix_for(model, cached_prefix)
+        )
+    results = await asyncio.gather(*(
+        _agenerate_fields(
+            client, guard, model, prompt, input_content, group_fields, _prefix_for(model, cached_prefix)
+        )
+        for model, group_fields in groups
+    ), return_exceptions=True)
+    return _merge_groups(groups, results)
+
+
+def _prepare_generation(input_content, org_context, campaign_context, fields, model=None):
+    """
+    Shared setup for the generators, sync and async, streamed or not:
+    resolves fields and checks the cache.
+
+    Streams always call MODEL_NAME and pass it as model, so their output is
+    never stored under the key of a fanned-out or light-model generation.
+    """
+    fields = resolve_fields(fields)
+    cache = get_generation_cache()
+    cache_key = generation_cache_key(
+        input_content, org_context, campaign_context, model or _generation_model(fields), PROMPT_VERSION, fields
+    )
+    cached = cache.get(cache_key) if cache is not None else None
+    return fields, cache, cache_key, cached
+
+
+def _store_generation(cache, cache_key, fields, generated_data) -> None:
+    """Caches a complete result; partial results are returned but not cached."""
+    if cache is not None and generated_data and set(fields) <= set(generated_data):
+        cache.set(cache_key, generated_data)
+
+
+def _finish_generation(cache, cache_key, fields, generated_data, campaign_id, cached_prefix, rejected) -> None:
+    """Forgets a cached prefix Gemini rejected, then caches the result."""
+    if rejected:
+        forget_cached_prefix(campaign_id, cached_prefix)
+    _store_generation(cache, cache_key, fields, generated_data)
+
+
+def generate_campaign_content(input_content: str, org_context: str, campaign_context: str, fields=None,
+                              campaign_id=None) -> dict | None:
+    """
+    Invokes the Gemini API to generate content for all platforms based on an input brief.
+    Results are stored in the generation cache, and identical requests are
+    answered from it without calling the API.
+
+    When GENERATION_FAN_OUT is enabled, the fields are split into groups
+    (see fan_out_groups) generated by concurrent calls, each on its own model,
+    so the total time is that of the slowest group rather than of one call
+    writing every field.
+
+    Args:
+        input_content: The user-provided content or idea.
+        org_context: The organization's objectives, from the owner's Profile.
+        campaign_context: The objectives of the parent Campaign.
+        fields: Optional subset of CONTENT_FIELDS to generate. Only those
+            fields are requested from the model and returned.
+        campaign_id: The parent Campaign's id. When given, the instructions
+            and contexts are sent once as the campaign's cached prefix (see
+            promptcache.py) and each call only sends the input content.
+
+    Returns:
+        A dictionary containing the generated content for the requested fields,
+        or None if an error occurs. If some fields are still missing after
+        MAX_FIELD_RETRIES follow-up calls (or their group failed), the fields
+        that did succeed are returned.
+
+    Raises:
+        GeminiUnavailable: If the shared rate limit or the circuit breaker
+            refused the call (see ratelimit.py); retrying later may succeed.
+    """
+    fields, cache, cache_key, cached = _prepare_generation(input_content, org_context, campaign_context, fields)
+    if cached:
+        return cached
+
+    client = get_client()
+    if client is None:
+        logger.error("GEMINI_API_KEY is not configured in settings.")
+        return None
+
+    prefix, prompt = _build_prompts(input_content, org_context, campaign_context)
+    groups = fan_out_groups(fields)
+    cached_prefix = None
+    if any(model == MODEL_NAME for model, _ in groups):
+        cached_prefix = get_cached_prefix(client, MODEL_NAME, campaign_id, prefix)
+    generated_data, rejected = _fan_out(client, get_guard(), groups, prompt, input_content, cached_prefix)
+    _finish_generation(cache, cache_key, fields, generated_data, campaign_id, cached_prefix, rejected)
+    return generated_data or None
+
+
+async def agenerate_campaign_content(input_content: str, org_context: str, campaign_context: str, fields=None,
+                                     campaign_id=None) -> dict | None:
+    """
+    Async variant of generate_campaign_content, built on the SDK's async client.
+
+    Every Gemini call (with its backoff, follow-ups and fan-out groups) is
+    awaited on the event loop, so one process can keep hundreds of
+    generations waiting on the API without a thread each. Only the database
+    and generation cache work around the calls runs through sync_to_async.
+
+    Returns and raises like generate_campaign_content.
+    """
+    fields, cache, cache_key, cached = await sync_to_async(_prepare_generation)(
+        input_content, org_context, campaign_context, fields
+    )
+    if cached:
+        return cached
+
+    client = get_client()
+    if client is None:
+        logger.error("GEMINI_API_KEY is not configured in settings.")
+        return None
+
+    prefix, prompt = _build_prompts(input_content, org_context, campaign_context)
+    groups = fan_out_groups(fields)
+    cached_prefix = None
+    if any(model == MODEL_NAME for model, _ in groups):
+        cached_prefix = await aget_cached_prefix(client, MODEL_NAME, campaign_id, prefix)
+    generated_data, rejected = await _afan_out(client, get_guard(), groups, prompt, input_content, cached_prefix)
+    await sync_to_async(_finish_generation)(
+        cache, cache_key, fields, generated_data, campaign_id, cached_prefix, rejected
+    )
+    return generated_data or None
+
+
+def _stream_failed(guard, seconds: float, exc: Exception, campaign_id, cached_prefix) -> None:
+    """Records a stream that failed, forgetting the cached prefix if Gemini rejected it."""
+    record_gemini_call(MODEL_NAME, seconds, ok=False)
+    if cached_prefix and not is_retryable(exc):
+        forget_cached_prefix(campaign_id, cached_prefix)
+    guard.record_outcome(exc)
+
+
+def _stream_finished(guard, seconds: float, usage, cache, cache_key, fields, streamed: dict) -> None:
+    """Records a stream that completed and caches what it produced."""
+    record_gemini_call(MODEL_NAME, seconds, usage=usage)
+    guard.record_outcome()
+    _store_generation(cache, cache_key, fields, streamed)
+
+
+def stream_campaign_content(input_content: str, org_context: str, campaign_context: str, fields=None,
+                            campaign_id=None):
+    """
+    Streaming variant of generate_campaign_content.
+
+    Yields (field name, value) pairs as soon as each field is complete in the
+    model's streamed output, instead of waiting for the whole JSON object.
+    Cached content is yielded immediately and complete results are cached.
+
+    A stream cannot be retried once fields have been sent, so it goes through
+    the rate limiter and circuit breaker but not the backoff loop. A cached
+    prefix that Gemini rejects is forgotten, so the next call recreates it.
 
-        #response = model.generate_content(prompt)
-        response = client.models.generate_content(
-            model=model_name,
-            contents=prompt
+    Raises:
+        RuntimeError: If GEMINI_API_KEY is not configured.
+        GeminiUnavailable: If the rate limiter or circuit breaker refused the call.
+    """
+    fields, cache, cache_key, cached = _prepare_generation(
+        input_content, org_context, campaign_context, fields, model=MODEL_NAME
+    )
+    if cached:
+        yield from cached.items()
+        return
+
+    client = get_client()
+    if client is None:
+        raise RuntimeError("GEMINI_API_KEY is not configured in settings.")
+
+    parser = IncrementalFieldParser()
+    prefix, prompt = _build_prompts(input_content, org_context, campaign_context)
+    cached_prefix = get_cached_prefix(client, MODEL_NAME, campaign_id, prefix)
+    guard = get_guard()
+    guard.begin(estimate_tokens(prompt))
+    start = time.perf_counter()
+    usage = None
+    try:
+        stream = client.models.generate_content_stream(
+            **_content_request(MODEL_NAME, prompt, input_content, fields, cached_prefix)
         )
+        for chunk in stream:
+            # Token counts come with the last chunk(s).
+            usage = getattr(chunk, 'usage_metadata', None) or usage
+            yield from parser.feed(chunk.text or '')
+    except Exception as e:
+        _stream_failed(guard, time.perf_counter() - start, e, campaign_id, cached_prefix)
+        raise
+    _stream_finished(guard, time.perf_counter() - start, usage, cache, cache_key, fields, parser.fields)
 
-        logger.error(f"Response: {response.text[7:-3]}")
 
-        return json.loads(response.text[7:-3])
+async def astream_campaign_content(input_content: str, org_context: str, campaign_context: str, fields=None,
+                                   campaign_id=None):
+    """
+    Async variant of stream_campaign_content, built on the SDK's async client.
+    Used when the app is served through ASGI so a stream does not hold a thread.
+    """
+    fields, cache, cache_key, cached = await sync_to_async(_prepare_generation)(
+        input_content, org_context, campaign_context, fields, model=MODEL_NAME
+    )
+    if cached:
+        for item in cached.items():
+            yield item
+        return
+
+    client = get_client()
+    if client is None:
+        raise RuntimeError("GEMINI_API_KEY is not configured in settings.")
 
+    parser = IncrementalFieldParser()
+    prefix, prompt = _build_prompts(input_content, org_context, campaign_context)
+    cached_prefix = await aget_cached_prefix(client, MODEL_NAME, campaign_id, prefix)
+    guard = get_guard()
+    await guard.abegin(estimate_tokens(prompt))
+    start = time.perf_counter()
+    usage = None
+    try:
+        stream = await client.aio.models.generate_content_stream(
+            **_content_request(MODEL_NAME, prompt, input_content, fields, cached_prefix)
+        )
+        async for chunk in stream:
+            usage = getattr(chunk, 'usage_metadata', None) or usage
+            for item in parser.feed(chunk.text or ''):
+                yield item
     except Exception as e:
-        logger.error(f"An error occurred while calling the Gemini API: {e}")
-        return None
\ No newline at end of file
+        await sync_to_async(_stream_failed)(guard, time.perf_counter() - start, e, campaign_id, cached_prefix)
+        raise
+    await sync_to_async(_stream_finished)(
+        guard, time.perf_counter() - start, usage, cache, cache_key, fields, parser.fields
+    )
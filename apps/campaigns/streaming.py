@@ -0,0 +1,141 @@
+import json
+
+
+class IncrementalFieldParser:
+    """
+    Parses a JSON object as it streams in and reports each top-level string
+    field as soon as its closing quote arrives.
+
+    The model's output arrives in arbitrary chunks, so a regular json.loads
+    has to wait for the whole object. This parser only tracks enough state to
+    know where each top-level value ends: nested objects/arrays and other
+    non-string values are skipped. Anything before the opening brace (such
+    as a markdown fence) is ignored.
+
+    Usage:
+        parser = IncrementalFieldParser()
+        for chunk in chunks:
+            for name, value in parser.feed(chunk):
+                ...
+    """
+    # Parser states
+    BEFORE_OBJECT = 'before_object'
+    BEFORE_KEY = 'before_key'
+    IN_KEY = 'in_key'
+    BEFORE_COLON = 'before_colon'
+    BEFORE_VALUE = 'before_value'
+    IN_STRING_VALUE = 'in_string_value'
+    IN_OTHER_VALUE = 'in_other_value'
+    AFTER_VALUE = 'after_value'
+    DONE = 'done'
+
+    def __init__(self):
+        self.state = self.BEFORE_OBJECT
+        self.fields = {}
+        self._buffer = []
+        self._key = None
+        self._escaped = False
+        # For skipped non-string values: nesting depth and string tracking.
+        self._depth = 0
+        self._in_nested_string = False
+
+    @property
+    def done(self):
+        """True once the closing brace of the top-level object has been seen."""
+        return self.state == self.DONE
+
+    def feed(self, chunk: str) -> list[tuple[str, str]]:
+        """
+        Consumes the next chunk of text.
+
+        Returns:
+            A list of (field name, value) pairs completed by this chunk.
+        """
+        completed = []
+        for char in chunk:
+            state = self.state
+
+            if state == self.BEFORE_OBJECT:
+                if char == '{':
+                    self.state = self.BEFORE_KEY
+
+            elif state == self.BEFORE_KEY:
+                if char == '"':
+                    self._buffer = []
+                    self.state = self.IN_KEY
+                elif char == '}':
+                    self.state = self.DONE
+
+            elif state in (self.IN_KEY, self.IN_STRING_VALUE):
+                if self._escaped:
+                    self._escaped = False
+                    self._buffer.append(char)
+                elif char == '\\':
+                    self._escaped = True
+                    self._buffer.append(char)
+                elif char == '"':
+                    text = self._decode(''.join(self._buffer))
+                    if state == self.IN_KEY:
+                        self._key = text
+                        self.state = self.BEFORE_COLON
+                    else:
+                        self.fields[self._key] = text
+                        completed.append((self._key, text))
+                        self.state = self.AFTER_VALUE
+                else:
+                    self._buffer.append(char)
+
+            elif state == self.BEFORE_COLON:
+                if char == ':':
+                    self.state = self.BEFORE_VALUE
+
+            elif state == self.BEFORE_VALUE:
+                if char == '"':
+                    self._buffer = []
+                    self.state = self.IN_STRING_VALUE
+                elif not char.isspace():
+                    self._depth = 1 if char in '{[' else 0
+                    self._in_nested_string = False
+                    self.state = self.IN_OTHER_VALUE
+
+            elif state == self.IN_OTHER_VALUE:
+                self._skip_other_value(char)
+
+            elif state == self.AFTER_VALUE:
+                if char == ',':
+                    self.state = self.BEFORE_KEY
+                elif char == '}':
+                    self.state = self.DONE
+
+        return completed
+
+    def _skip_other_value(self, char):
+        if self._in_nested_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == '\\':
+                self._escaped = True
+            elif char == '"':
+                self._in_nested_string = False
+        elif char == '"':
+            self._in_nested_string = True
+        elif char in '{[':
+            self._depth += 1
+        elif char in '}]':
+            if self._depth == 0:
+                # A scalar value ended by the object's closing brace.
+                self.state = self.DONE
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.state = self.AFTER_VALUE
+        elif char == ',' and self._depth == 0:
+            self.state = self.BEFORE_KEY
+
+    @staticmethod
+    def _decode(raw: str) -> str:
+        """Decodes JSON string escapes; falls back to the raw text if they are malformed."""
+        try:
+            return json.loads(f'"{raw}"')
+        except ValueError:
+            return raw
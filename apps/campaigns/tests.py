@@ -0,0 +1,1390 @@
+import asyncio
+import hashlib
+import json
+import io
+import os
+import tempfile
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import FieldError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from benchmarks.fake_gemini import FakeGeminiServer
+from contentgen import metrics
+from google.genai import errors
+from PIL import Image
+
+from . import gemini
+from .cache import DatabaseBackend
+from .forms import RegenerateFieldsForm
+from .fields import FORMAT_RAW, FORMAT_ZLIB, FORMAT_ZSTD, compress_text, decompress_text
+from .images import claim_next_asset, process_asset
+from .importers import build_items, read_rows
+from .jobs import claim_next_job, enqueue_generation, run_job
+from .pagination import estimate_count
+from .promptcache import get_cached_prefix
+from .models import (
+    Campaign, CampaignItem, CampaignItemQuerySet, ImageAsset, GeneratedContentCache, GenerationJob,
+    PromptPrefixCache, VideoUpload,
+)
+from .ratelimit import CircuitOpenError, GeminiGuard, RateLimitExceeded
+from .search import BasicSearchBackend, search_campaigns
+from .touch import deferred_touches, touch_campaigns
+from .services import (
+    LIGHT_MODEL_NAME, MODEL_NAME, agenerate_campaign_content, build_prompt_prefix, build_response_schema,
+    cached_campaign_content, fan_out_groups, generate_campaign_content, parse_generated_content, stream_campaign_content,
+)
+from .streaming import IncrementalFieldParser
+
+
+GENERATED = {field: f"generated {field}" for field in CampaignItem.GENERATED_FIELDS}
+
+
+def rate_limit_settings(**overrides):
+    """A GEMINI_RATE_LIMIT setting with its own state file, so tests never share quota."""
+    config = {
+        'STATE_FILE': os.path.join(tempfile.mkdtemp(), 'limits.json'),
+        'REQUESTS_PER_MINUTE': 10000,
+        'BASE_DELAY': 0.0,
+    }
+    return {**config, **overrides}
+
+
+def fake_client(payload=GENERATED):
+    """Returns a stand-in genai client whose response looks like Gemini's fenced JSON."""
+    client = mock.Mock()
+    client.models.generate_content.return_value = SimpleNamespace(
+        text='```json\n' + json.dumps(payload) + '\n```'
+    )
+    return client
+
+
+class CampaignTestMixin:
+    """
+    Creates a user with one campaign and one item for each test.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='pass12345')
+        self.campaign = Campaign.objects.create(user=self.user, title='Launch', objectives='Grow signups')
+        self.item = CampaignItem.objects.create(campaign=self.campaign, title='Teaser', input_content='We are live!')
+
+
+class CampaignTouchTests(CampaignTestMixin, TestCase):
+    """
+    Saving an item bumps its campaign with a targeted UPDATE, batched per campaign.
+    """
+    def setUp(self):
+        # Each test runs inside a transaction; flush the touches made by the fixtures.
+        with self.captureOnCommitCallbacks(execute=True):
+            super().setUp()
+        self.other = Campaign.objects.create(user=self.user, title='Other', objectives='Retain users')
+        self.past = timezone.now() - timedelta(days=1)
+        Campaign.objects.update(updated_at=self.past)
+
+    def assertTouched(self, *campaigns):
+        for campaign in campaigns:
+            campaign.refresh_from_db()
+            self.assertGreater(campaign.updated_at, self.past)
+
+    def test_item_save_does_not_load_or_rewrite_campaign(self):
+        item = CampaignItem(campaign_id=self.campaign.pk, title='New', input_content='Brief')
+        # INSERT for the item, its search index row and one UPDATE of updated_at,
+        # without loading the campaign; then the owner's id and the scope version
+        # upsert, to invalidate their cached pages (see pagecache.py).
+        with self.assertNumQueries(5), self.captureOnCommitCallbacks(execute=True):
+            item.save()
+        self.assertTouched(self.campaign)
+
+    def test_touches_in_a_transaction_are_flushed_once_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks, transaction.atomic():
+            for campaign in (self.campaign, self.campaign, self.other):
+                CampaignItem.objects.create(campaign=campaign, title='New', input_content='Brief')
+        # One flush; any other callbacks are the page cache invalidation it triggers.
+        self.assertEqual(len([callback for callback in callbacks if hasattr(callback, 'campaign_ids')]), 1)
+        self.assertTouched(self.campaign, self.other)
+
+    def test_deferred_block_flushes_one_update(self):
+        items = [
+            CampaignItem(campaign=campaign, title='New', input_content='Brief')
+            for campaign in (self.campaign, self.other, self.campaign)
+        ]
+        # Three INSERTs (plus their search index rows), a single UPDATE for both
+        # campaigns and a SELECT of their owners.
+        with self.assertNumQueries(8), deferred_touches():
+            for item in items:
+                item.save()
+        self.assertTouched(self.campaign, self.other)
+
+    def test_bulk_touch_is_one_update(self):
+        # The UPDATE and the owners lookup for the page cache.
+        with self.assertNumQueries(2):
+            with deferred_touches():
+                touch_campaigns([self.campaign.pk, self.other.pk])
+                touch_campaigns([self.campaign.pk])
+        self.assertTouched(self.campaign, self.other)
+
+
+class CampaignSearchTests(CampaignTestMixin, TestCase):
+    """
+    Full-text search over campaigns and items (SQLite FTS5 in tests).
+    """
+    def setUp(self):
+        super().setUp()
+        self.rockets = Campaign.objects.create(user=self.user, title='Rocket launch', objectives='Reach orbit')
+        self.item.blog_content = 'Our rockets are reusable.'
+        self.item.save()
+
+    def titles(self, query, user=None):
+        return [campaign.title for campaign in search_campaigns(user or self.user, query)]
+
+    def test_title_matches_rank_above_item_matches(self):
+        self.assertEqual(self.titles('rocket'), ['Rocket launch', 'Launch'])
+
+    def test_stemming_and_prefix(self):
+        self.assertEqual(self.titles('orbiting'), ['Rocket launch'])
+        self.assertEqual(self.titles('reusa'), ['Launch'])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.item.blog_content = 'Now with parachutes.'
+        self.item.save(update_fields=['blog_content'])
+        self.assertEqual(self.titles('parachutes'), ['Launch'])
+        self.assertEqual(self.titles('reusable'), [])
+        self.item.delete()
+        self.assertEqual(self.titles('parachutes'), [])
+
+    def test_only_own_campaigns_are_searched(self):
+        other = User.objects.create_user(username='other', password='pass12345')
+        self.assertEqual(self.titles('rocket', user=other), [])
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.titles('rocket" OR (NEAR'), [])
+        self.assertEqual(self.titles('***'), [])
+
+    def test_basic_backend_substring_search(self):
+        # Generated content is compressed, so the basic backend only sees briefs.
+        self.assertEqual(BasicSearchBackend().rank_campaigns(self.user, 'reusable'), {})
+        self.item.input_content = 'Rockets, again.'
+        self.item.save()
+        ranks = BasicSearchBackend().rank_campaigns(self.user, 'rocket')
+        self.assertEqual(ranks, {self.rockets.pk: 1.0, self.campaign.pk: 0.5})
+
+    def test_list_view_shows_ranked_results(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('campaign-list'), {'q': 'rocket'})
+        self.assertEqual([c.title for c in response.context['campaigns']], ['Rocket launch', 'Launch'])
+
+
+class CampaignListPaginationTests(CampaignTestMixin, TestCase):
+    """
+    The dashboard is paged by cursor over (updated_at, id), never by OFFSET.
+    """
+    def setUp(self):
+        super().setUp()
+        Campaign.objects.bulk_create(
+            [Campaign(user=self.user, title=f'Campaign {n}', objectives='Grow') for n in range(24)]
+        )
+        # Several campaigns share each timestamp, so the id has to break ties.
+        now = timezone.now()
+        for n, pk in enumerate(Campaign.objects.order_by('pk').values_list('pk', flat=True)):
+            Campaign.objects.filter(pk=pk).update(updated_at=now - timedelta(minutes=n // 3))
+        self.expected = list(Campaign.objects.order_by('-updated_at', '-id').values_list('pk', flat=True))
+        self.client.force_login(self.user)
+
+    def get_page(self, **params):
+        response = self.client.get(reverse('campaign-list'), params)
+        return response, response.context['page_obj']
+
+    def test_pages_forwards_and_backwards_without_gaps(self):
+        pages, cursor = [], None
+        while True:
+            _, page = self.get_page(**({'cursor': cursor} if cursor else {}))
+            pages.append([campaign.pk for campaign in page])
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual([pk for page in pages for pk in page], self.expected)
+        self.assertEqual(len(pages), 3)
+
+        _, page = self.get_page(cursor=page.previous_cursor)
+        self.assertEqual([campaign.pk for campaign in page], pages[1])
+        _, page = self.get_page(cursor=page.previous_cursor)
+        self.assertEqual([campaign.pk for campaign in page], pages[0])
+        self.assertFalse(page.has_previous())
+
+    def test_page_query_seeks_instead_of_offset(self):
+        _, first = self.get_page()
+        with CaptureQueriesContext(connection) as queries:
+            self.get_page(cursor=first.next_cursor)
+        campaign_queries = [q['sql'] for q in queries if 'FROM "campaigns_campaign"' in q['sql']]
+        self.assertTrue(campaign_queries)
+        self.assertFalse(any('OFFSET' in sql for sql in campaign_queries))
+
+    def test_invalid_cursor_shows_first_page(self):
+        _, page = self.get_page(cursor='not-a-cursor')
+        self.assertEqual([campaign.pk for campaign in page], self.expected[:10])
+
+    def test_count_is_capped(self):
+        response, page = self.get_page()
+        self.assertEqual(page.paginator.count_label, '25')
+        self.assertContains(response, '25</span> campaigns')
+        self.assertEqual(estimate_count(Campaign.objects.all(), cap=20), (20, False))
+
+
+class CampaignDetailItemsTests(CampaignTestMixin, TestCase):
+    """
+    The campaign page lists item summaries a page at a time, never the full rows.
+    """
+    def setUp(self):
+        super().setUp()
+        self.item.blog_content = 'A very long blog post. ' * 1000
+        self.item.save()
+        CampaignItem.objects.bulk_create([
+            CampaignItem(campaign=self.campaign, title=f'Item {n}', input_content='Brief ' * 200)
+            for n in range(15)
+        ])
+        self.client.force_login(self.user)
+
+    def test_detail_loads_only_summary_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('campaign-detail', args=[self.campaign.pk]))
+        item_queries = [q['sql'] for q in queries if 'FROM "campaigns_campaignitem"' in q['sql']]
+        self.assertEqual(len(item_queries), 1)
+        self.assertNotIn('blog_content', item_queries[0])
+        # input_content is only read through SUBSTR for the preview.
+        self.assertEqual(item_queries[0].count('input_content'), 1)
+        self.assertIn('SUBSTR(', item_queries[0])
+        items = list(response.context['items_page'])
+        self.assertEqual(len(items), 12)
+        self.assertEqual(items[0].title, 'Teaser')
+        self.assertLessEqual(len(items[1].preview), CampaignItemQuerySet.PREVIEW_LENGTH)
+        self.assertContains(response, 'data-load-more')
+
+    def test_fragment_returns_the_next_page(self):
+        page = self.client.get(reverse('campaign-detail', args=[self.campaign.pk])).context['items_page']
+        response = self.client.get(reverse('campaign-item-list', args=[self.campaign.pk]), {'cursor': page.next_cursor})
+        self.assertEqual([item.title for item in response.context['items_page']], [f'Item {n}' for n in range(11, 15)])
+        self.assertNotContains(response, 'data-load-more')
+
+    def test_fragment_is_owner_only(self):
+        other = User.objects.create_user(username='other', password='pass12345')
+        self.client.force_login(other)
+        response = self.client.get(reverse('campaign-item-list', args=[self.campaign.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CompressedTextFieldTests(CampaignTestMixin, TestCase):
+    """
+    Generated content is compressed in the database and plain text in Python.
+    """
+    def stored(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT {name} FROM campaigns_campaignitem WHERE id = %s", [self.item.pk])
+            return bytes(cursor.fetchone()[0])
+
+    def test_long_text_is_compressed(self):
+        self.item.blog_content = 'Reusable rockets change everything. ' * 200
+        self.item.x_content = 'Short post'
+        self.item.save()
+
+        stored = self.stored('blog_content')
+        self.assertIn(stored[0], (FORMAT_ZLIB, FORMAT_ZSTD))
+        self.assertLess(len(stored), len(self.item.blog_content) // 10)
+        self.assertEqual(self.stored('x_content'), bytes([FORMAT_RAW]) + b'Short post')
+
+        item = CampaignItem.objects.get(pk=self.item.pk)
+        self.assertEqual(item.blog_content, self.item.blog_content)
+        self.assertEqual(item.x_content, 'Short post')
+        self.assertIsNone(item.reddit_content)
+        self.assertEqual(
+            CampaignItem.objects.filter(pk=self.item.pk).values_list('blog_content', flat=True).get(),
+            self.item.blog_content,
+        )
+
+    def test_codec_setting_and_legacy_values(self):
+        text = 'Ünïcode content, repeated. ' * 50
+        with override_settings(COMPRESSED_TEXT={'CODEC': 'zlib'}):
+            self.assertEqual(compress_text(text)[0], FORMAT_ZLIB)
+        self.assertEqual(decompress_text(compress_text(text)), text)
+        # Rows written before the column was compressed have no format byte.
+        self.assertEqual(decompress_text(text), text)
+        self.assertEqual(decompress_text(text.encode('utf-8')), text)
+
+    def test_only_exact_and_isnull_lookups(self):
+        self.item.blog_content = 'Reusable rockets change everything. ' * 200
+        self.item.x_content = 'Short post'
+        self.item.save()
+
+        items = CampaignItem.objects.filter(pk=self.item.pk)
+        self.assertTrue(items.filter(x_content='Short post').exists())
+        self.assertTrue(items.filter(blog_content=self.item.blog_content).exists())
+        self.assertTrue(items.filter(reddit_content__isnull=True).exists())
+        for lookup in ('icontains', 'startswith', 'contains', 'iexact'):
+            with self.subTest(lookup=lookup), self.assertRaises(FieldError):
+                list(items.filter(**{f'x_content__{lookup}': 'Short'}))
+
+
+class GenerationJobTests(CampaignTestMixin, TestCase):
+
+    def test_enqueue_reuses_pending_job(self):
+        first = enqueue_generation(self.item)
+        second = enqueue_generation(self.item)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(GenerationJob.objects.count(), 1)
+
+    def test_claim_marks_job_running_once(self):
+        job = enqueue_generation(self.item)
+        claimed = claim_next_job()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.status, GenerationJob.Status.RUNNING)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNone(claim_next_job())
+
+    @mock.patch('apps.campaigns.jobs.generate_campaign_content', return_value=GENERATED)
+    def test_run_job_stores_generated_content(self, generate):
+        enqueue_generation(self.item)
+        job = run_job(claim_next_job())
+        self.assertEqual(job.status, GenerationJob.Status.SUCCEEDED)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.x_content, 'generated x_content')
+        generate.assert_called_once_with(
+            input_content='We are live!', org_context=None, campaign_context='Grow signups', fields=None,
+            campaign_id=self.campaign.pk,
+        )
+
+    @mock.patch('apps.campaigns.jobs.generate_campaign_content', return_value=None)
+    def test_run_job_records_failure(self, generate):
+        enqueue_generation(self.item)
+        job = run_job(claim_next_job())
+        self.assertEqual(job.status, GenerationJob.Status.FAILED)
+        self.assertTrue(job.error)
+
+    @mock.patch('apps.campaigns.jobs.generate_campaign_content', side_effect=CircuitOpenError('open'))
+    def test_run_job_defers_when_gemini_is_unavailable(self, generate):
+        enqueue_generation(self.item)
+        job = run_job(claim_next_job())
+        self.assertEqual(job.status, GenerationJob.Status.PENDING)
+        self.assertGreater(job.run_after, timezone.now())
+        # Not picked up again until the delay has passed.
+        self.assertIsNone(claim_next_job())
+
+    @mock.patch('apps.campaigns.jobs.agenerate_campaign_content')
+    def test_runworker_runs_jobs_concurrently(self, generate):
+        in_flight = peak = 0
+
+        async def agenerate(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+            return None if kwargs['input_content'] == 'Broken' else GENERATED
+
+        generate.side_effect = agenerate
+        items = [self.item] + [
+            CampaignItem.objects.create(campaign=self.campaign, title=f'Item {n}', input_content=brief)
+            for n, brief in enumerate(['Second', 'Third', 'Broken'])
+        ]
+        for item in items:
+            enqueue_generation(item)
+        call_command('runworker', once=True, concurrency=3, stdout=io.StringIO())
+
+        self.assertEqual(peak, 3)
+        statuses = dict(GenerationJob.objects.values_list('item__input_content', 'status'))
+        self.assertEqual(statuses.pop('Broken'), GenerationJob.Status.FAILED)
+        self.assertEqual(set(statuses.values()), {GenerationJob.Status.SUCCEEDED})
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.x_content, 'generated x_content')
+
+
+class GeminiRateLimitTests(TestCase):
+    """
+    Exercises the shared limiter and circuit breaker against the fake Gemini server.
+    """
+    def setUp(self):
+        self.server = FakeGeminiServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.enterContext(override_settings(GEMINI_API_KEY='test-key', GEMINI_BASE_URL=self.server.url))
+        gemini.reset_client()
+        self.addCleanup(gemini.reset_client)
+
+    def call(self, guard, **kwargs):
+        client = gemini.get_client()
+        return guard.call(lambda: client.models.generate_content(model=MODEL_NAME, contents='hi'), **kwargs)
+
+    def test_generation_recovers_from_transient_errors(self):
+        self.server.fail_next = 2
+        with override_settings(GEMINI_RATE_LIMIT=rate_limit_settings()):
+            result = generate_campaign_content('brief', 'org', 'campaign', fields=['x_content'])
+        self.assertEqual(result, {'x_content': 'Fake x content.'})
+        self.assertEqual(self.server.request_count, 3)
+
+    def test_calls_are_recorded_in_metrics(self):
+        self.server.fail_next = 1
+        values = metrics._store.values
+        retries = values.get('contentgen_gemini_retries_total', {}).get(f'["{MODEL_NAME}"]', 0)
+        with override_settings(GEMINI_RATE_LIMIT=rate_limit_settings(), GENERATION_CACHE={'BACKEND': None}):
+            generate_campaign_content('brief', 'org', 'campaign', fields=['x_content'])
+        self.assertEqual(values['contentgen_gemini_retries_total'][f'["{MODEL_NAME}"]'], retries + 1)
+        durations = values['contentgen_gemini_request_duration_seconds']
+        self.assertIn(f'["{MODEL_NAME}", "error"]', durations)
+        self.assertIn(f'["{MODEL_NAME}", "ok"]', durations)
+        self.assertGreater(values['contentgen_gemini_tokens_total'][f'["{MODEL_NAME}", "output"]'], 0)
+
+    def test_streamed_generation(self):
+        self.server.stream_chunks = 25
+        with override_settings(GEMINI_RATE_LIMIT=rate_limit_settings(), GENERATION_CACHE={'BACKEND': None}):
+            fields = list(stream_campaign_content('brief', 'org', 'campaign', fields=['x_content', 'blog_content']))
+        self.assertEqual(fields, [('x_content', 'Fake x content.'), ('blog_content', 'Fake blog content.')])
+
+    def test_random_errors(self):
+        self.server.error_rate = 1.0
+        guard = GeminiGuard(rate_limit_settings(MAX_ATTEMPTS=1))
+        with self.assertRaises(errors.ServerError):
+            self.call(guard)
+        self.assertEqual(self.server.rejected_count, 1)
+
+    def test_backoff_honours_retry_after(self):
+        self.server.rate_limit = 1
+        guard = GeminiGuard(rate_limit_settings())
+        self.call(guard)
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            time.sleep(seconds)
+
+        self.call(guard, sleep=sleep)
+        self.assertGreaterEqual(sleeps[0], 1.0)
+        self.assertEqual(self.server.rejected_count, 1)
+
+    def test_bucket_is_shared_between_guards(self):
+        config = rate_limit_settings(REQUESTS_PER_MINUTE=2, MAX_WAIT=0)
+        first, second = GeminiGuard(config), GeminiGuard(config)
+        first.acquire(1)
+        first.acquire(1)
+        with self.assertRaises(RateLimitExceeded):
+            second.acquire(1)
+
+    async def test_async_calls_wait_for_quota_on_the_event_loop(self):
+        guard = GeminiGuard(rate_limit_settings(TOKENS_PER_MINUTE=6000))
+        client = gemini.get_client()
+        real_sleep, sleeps = asyncio.sleep, []
+
+        async def sleep(delay):
+            sleeps.append(delay)
+            await real_sleep(delay)
+
+        # Empty the token bucket; the next 30 tokens take 0.3s to refill.
+        await sync_to_async(guard.acquire)(6000)
+        with mock.patch('apps.campaigns.ratelimit.asyncio.sleep', side_effect=sleep):
+            await guard.acall(lambda: client.aio.models.generate_content(model=MODEL_NAME, contents='hi'), 30)
+        # The wait for quota was an asyncio.sleep (httpx's own zero-second yields aside).
+        waits = [delay for delay in sleeps if delay]
+        self.assertTrue(waits)
+        self.assertLessEqual(waits[0], 0.3)
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_circuit_opens_and_fails_fast(self):
+        self.server.fail_next = 10
+        guard = GeminiGuard(rate_limit_settings(MAX_ATTEMPTS=1, FAILURE_THRESHOLD=2))
+        for _ in range(2):
+            with self.assertRaises(errors.ServerError):
+                self.call(guard)
+        with self.assertRaises(CircuitOpenError):
+            self.call(guard)
+        self.assertEqual(self.server.request_count, 2)
+
+    def test_half_open_trial_closes_circuit(self):
+        self.server.fail_next = 1
+        guard = GeminiGuard(rate_limit_settings(MAX_ATTEMPTS=1, FAILURE_THRESHOLD=1, RESET_TIMEOUT=0.05))
+        with self.assertRaises(errors.ServerError):
+            self.call(guard)
+        time.sleep(0.1)
+        self.call(guard)
+        self.call(guard)
+        self.assertEqual(self.server.request_count, 3)
+
+
+@override_settings(GENERATION_CACHE={'BACKEND': None}, PROMPT_CACHE={'MIN_TOKENS': 1})
+class PromptPrefixCacheTests(CampaignTestMixin, TestCase):
+    """
+    A campaign's instructions and contexts are cached once on Gemini's side
+    and each item call only sends its input.
+    """
+    def setUp(self):
+        super().setUp()
+        self.server = FakeGeminiServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.enterContext(override_settings(
+            GEMINI_API_KEY='test-key', GEMINI_BASE_URL=self.server.url, GEMINI_RATE_LIMIT=rate_limit_settings(),
+        ))
+        gemini.reset_client()
+        self.addCleanup(gemini.reset_client)
+
+    def generate(self, input_content='We are live!'):
+        return generate_campaign_content(
+            input_content, 'Org goals', self.campaign.objectives, fields=['x_content'], campaign_id=self.campaign.pk,
+        )
+
+    def test_items_share_the_cached_prefix(self):
+        self.assertEqual(self.generate(), {'x_content': 'Fake x content.'})
+        self.generate('Second item')
+        self.assertEqual(list(self.server.cached_contents), ['cachedContents/fake-1'])
+        for request in self.server.requests:
+            self.assertEqual(request['cachedContent'], 'cachedContents/fake-1')
+            self.assertNotIn('CAMPAIGN_CONTEXT', json.dumps(request['contents']))
+        self.assertIn('Second item', json.dumps(self.server.requests[-1]['contents']))
+
+    def test_changed_objectives_replace_the_cache(self):
+        self.generate()
+        self.campaign.objectives = 'Retain customers'
+        self.generate()
+        # The outdated cache was deleted rather than left to expire.
+        self.assertEqual(list(self.server.cached_contents), ['cachedContents/fake-2'])
+        self.assertEqual(PromptPrefixCache.objects.get(campaign=self.campaign).name, 'cachedContents/fake-2')
+
+    def test_rejected_cache_falls_back_to_the_whole_prompt(self):
+        self.generate()
+        self.server.cached_contents.clear()
+        with self.assertLogs('apps.campaigns.services', 'WARNING'):
+            self.assertEqual(self.generate(), {'x_content': 'Fake x content.'})
+        self.assertNotIn('cachedContent', self.server.requests[-1])
+        self.assertFalse(PromptPrefixCache.objects.exists())
+
+    @override_settings(PROMPT_CACHE={})
+    def test_a_long_campaign_brief_reuses_its_prefix(self):
+        self.campaign.objectives = ' '.join(
+            f"Store {n}: drive sign-ups for the analytics dashboard beta among existing customers before the "
+            f"public launch on 1 March, emphasising that setup takes five minutes and the beta is free."
+            for n in range(1, 40)
+        )
+        org = "We build simple, affordable tools that help independent retailers grow."
+        for brief in ('Beta opens today.', 'Customer story: a bakery doubled repeat orders.', 'Last week of beta.'):
+            generate_campaign_content(brief, org, self.campaign.objectives, campaign_id=self.campaign.pk)
+
+        # With the default MIN_TOKENS, one cache serves every item.
+        self.assertEqual(self.server.cache_count, 1)
+        self.assertGreaterEqual(self.server.cached_contents['cachedContents/fake-1'], 1024)
+        for request in self.server.requests:
+            self.assertEqual(request['cachedContent'], 'cachedContents/fake-1')
+        self.assertEqual(self.server.usage[MODEL_NAME]['requests'], 3)
+
+    @override_settings(PROMPT_CACHE={})
+    def test_a_short_campaign_brief_is_sent_in_full(self):
+        self.generate()
+        self.generate('Second item')
+        self.assertEqual(self.server.cache_count, 0)
+        for request in self.server.requests:
+            self.assertNotIn('cachedContent', request)
+            self.assertIn('CAMPAIGN_CONTEXT', json.dumps(request['contents']))
+
+    def test_concurrent_creations_keep_one_cache(self):
+        client = gemini.get_client()
+        prefix = build_prompt_prefix('Org goals', self.campaign.objectives)
+        create = client.caches.create
+        other = None
+
+        def racing_create(**kwargs):
+            # Another worker creates and records a cache while this one waits on the API.
+            nonlocal other
+            with mock.patch.object(client.caches, 'create', create):
+                other = get_cached_prefix(client, MODEL_NAME, self.campaign.pk, prefix)
+            return create(**kwargs)
+
+        with mock.patch.object(client.caches, 'create', side_effect=racing_create):
+            name = get_cached_prefix(client, MODEL_NAME, self.campaign.pk, prefix)
+
+        # The loser deleted its own cache and uses the winner's.
+        self.assertEqual(name, other)
+        self.assertEqual(list(self.server.cached_contents), [other])
+        self.assertEqual(PromptPrefixCache.objects.get(campaign=self.campaign).name, other)
+
+
+class CampaignItemViewTests(CampaignTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    @mock.patch('apps.campaigns.jobs.generate_campaign_content')
+    def test_create_saves_item_and_enqueues_without_generating(self, generate):
+        response = self.client.post(
+            reverse('campaign-item-create', kwargs={'campaign_pk': self.campaign.pk}),
+            {'title': 'Follow-up', 'input_content': 'Thanks for joining'},
+        )
+        item = CampaignItem.objects.get(title='Follow-up')
+        self.assertRedirects(response, reverse('campaign-item-update', kwargs={'pk': item.pk}))
+        self.assertTrue(item.generation_jobs.filter(status=GenerationJob.Status.PENDING).exists())
+        generate.assert_not_called()
+
+    def test_status_endpoint_reports_latest_job(self):
+        url = reverse('campaign-item-status', kwargs={'pk': self.item.pk})
+        self.assertEqual(self.client.get(url).json()['status'], 'idle')
+        enqueue_generation(self.item)
+        self.assertEqual(self.client.get(url).json()['status'], 'pending')
+
+    def test_status_endpoint_is_owner_only(self):
+        other = User.objects.create_user(username='other', password='pass12345')
+        self.client.force_login(other)
+        response = self.client.get(reverse('campaign-item-status', kwargs={'pk': self.item.pk}))
+        self.assertEqual(response.status_code, 404)
+
+
+class CampaignViewQueryTests(CampaignTestMixin, TestCase):
+    """
+    Query-count regression tests: each view loads its object once, through a
+    queryset scoped to the owner. Every request starts with 2 queries for the
+    session and the user.
+    """
+    def setUp(self):
+        # Flush the campaign touch queued by the fixtures, so later touches are counted.
+        with self.captureOnCommitCallbacks(execute=True):
+            super().setUp()
+        self.client.force_login(self.user)
+
+    def assertQueries(self, count, name, *args, method='get', data=None, status=200):
+        with self.assertNumQueries(count), self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(reverse(name, args=args), data or {})
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def test_campaign_pages(self):
+        self.assertQueries(3, 'campaign-list')
+        # The page cache's scope versions (the list page set the CSRF cookie, so
+        # the page is cacheable), the campaign, then one page of item summaries.
+        self.assertQueries(5, 'campaign-detail', self.campaign.pk)
+        self.assertQueries(5, 'campaign-item-list', self.campaign.pk)
+        self.assertQueries(2, 'campaign-create')
+        self.assertQueries(3, 'campaign-update', self.campaign.pk)
+        self.assertQueries(3, 'campaign-delete', self.campaign.pk)
+
+    def test_campaign_writes(self):
+        # INSERT plus its search index row, then the page cache's scope versions.
+        self.assertQueries(5, 'campaign-create', method='post', data={'title': 'New', 'objectives': 'Grow'}, status=302)
+        self.assertQueries(
+            6, 'campaign-update', self.campaign.pk, method='post', data={'title': 'Renamed', 'objectives': 'Grow'}, status=302
+        )
+        # The campaign, the item and video upload ids for the cascade, four DELETEs
+        # and the page cache's scope versions.
+        self.assertQueries(10, 'campaign-delete', self.campaign.pk, method='post', status=302)
+
+    def test_item_pages(self):
+        self.assertQueries(3, 'campaign-item-create', self.campaign.pk)
+        self.assertQueries(3, 'campaign-item-import', self.campaign.pk)
+        # The item and its campaign in one query, then the latest generation job.
+        self.assertQueries(4, 'campaign-item-update', self.item.pk)
+        self.assertQueries(4, 'campaign-item-status', self.item.pk)
+
+    def test_item_writes(self):
+        data = {'title': 'Follow-up', 'input_content': 'Thanks for joining'}
+        # The campaign, profile, generation cache lookup, INSERT, search index row,
+        # campaign touch (and its owner and scope versions, for the page cache) and
+        # the generation job (checked for duplicates, then queued).
+        self.assertQueries(12, 'campaign-item-create', self.campaign.pk, method='post', data=data, status=302)
+        self.assertQueries(12, 'campaign-item-update', self.item.pk, method='post', data=data, status=302)
+
+    def test_other_users_objects_are_not_found(self):
+        other = User.objects.create_user(username='other', password='pass12345')
+        self.client.force_login(other)
+        for name, pk in (
+            ('campaign-detail', self.campaign.pk), ('campaign-update', self.campaign.pk),
+            ('campaign-delete', self.campaign.pk), ('campaign-item-create', self.campaign.pk),
+            ('campaign-item-import', self.campaign.pk), ('campaign-item-update', self.item.pk),
+        ):
+            with self.subTest(name):
+                self.assertQueries(3, name, pk, status=404)
+        self.assertQueries(
+            3, 'campaign-item-create', self.campaign.pk, method='post',
+            data={'title': 'Intruder', 'input_content': 'Hi'}, status=404,
+        )
+        self.assertFalse(CampaignItem.objects.filter(title='Intruder').exists())
+
+
+class PageCacheTests(CampaignTestMixin, TestCase):
+    """
+    The dashboard and campaign pages are cached per user and invalidated by
+    versioned keys when the data behind them changes.
+    """
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            super().setUp()
+        self.client.force_login(self.user)
+        self.list_url = reverse('campaign-list')
+        self.detail_url = reverse('campaign-detail', args=[self.campaign.pk])
+        # The first page sets the CSRF cookie; pages are only cached once it is sent back.
+        self.client.get(self.list_url)
+
+    def get(self, url, queries, **headers):
+        with self.assertNumQueries(queries):
+            return self.client.get(url, headers=headers)
+
+    def test_repeat_views_are_served_from_cache(self):
+        first = self.get(self.detail_url, 5)
+        # Only the session, the user and the scope versions are loaded.
+        second = self.get(self.detail_url, 3)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertIn('private', second['Cache-Control'])
+
+    def test_unchanged_page_is_not_modified(self):
+        etag = self.get(self.list_url, 4)['ETag']
+        response = self.get(self.list_url, 3, if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_saves_invalidate_the_pages_that_show_them(self):
+        list_etag = self.client.get(self.list_url)['ETag']
+        detail_etag = self.client.get(self.detail_url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            CampaignItem.objects.create(campaign=self.campaign, title='Fresh item', input_content='Brief')
+        response = self.client.get(self.detail_url, headers={'if_none_match': detail_etag})
+        self.assertContains(response, 'Fresh item')
+        self.assertNotEqual(self.client.get(self.list_url)['ETag'], list_etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.campaign.title = 'Renamed launch'
+            self.campaign.save()
+        self.assertContains(self.client.get(self.list_url), 'Renamed launch')
+
+    @mock.patch('apps.campaigns.jobs.generate_campaign_content', return_value=GENERATED)
+    def test_worker_saves_refresh_pages_cached_in_another_process(self, generate):
+        # runworker is its own process: with a locmem cache it never sees the
+        # web process's cache, so the scope versions must not live there.
+        etag = self.get(self.detail_url, 5)['ETag']
+        enqueue_generation(self.item)
+        worker_cache = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker'}
+        with override_settings(CACHES={**settings.CACHES, 'worker': worker_cache}, PAGE_CACHE={'ALIAS': 'worker'}):
+            with self.captureOnCommitCallbacks(execute=True):
+                run_job(claim_next_job())
+
+        response = self.client.get(self.detail_url, headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_pages_with_messages_are_not_cached(self):
+        self.client.get(self.detail_url)
+        # Adds a message without changing any data, then redirects to the campaign.
+        upload = SimpleUploadedFile('items.csv', b'title,input_content\n')
+        self.client.post(reverse('campaign-item-import', args=[self.campaign.pk]), {'file': upload})
+        self.assertContains(self.client.get(self.detail_url), 'The file did not contain any rows.')
+
+    def test_cached_pages_are_per_user(self):
+        self.client.get(self.detail_url)
+        other = User.objects.create_user(username='other', password='pass12345')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(self.detail_url).status_code, 404)
+
+
+def png_upload(name='photo.png', size=(1000, 600), color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ImageDerivativeTests(CampaignTestMixin, TestCase):
+    """
+    Uploads are stored once per distinct content and resized by the worker.
+    """
+    def setUp(self):
+        self.media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root, PAGE_CACHE={'TIMEOUT': 0}))
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def create_item(self, title, upload):
+        self.client.post(
+            reverse('campaign-item-create', args=[self.campaign.pk]),
+            {'title': title, 'input_content': 'Brief', 'image': upload},
+        )
+        return CampaignItem.objects.select_related('image_asset').get(title=title)
+
+    def stored_originals(self):
+        return [
+            name for _, _, files in os.walk(self.media_root) for name in files
+        ]
+
+    def test_identical_uploads_are_stored_once(self):
+        first = self.create_item('First', png_upload('a.png'))
+        second = self.create_item('Second', png_upload('b.png'))
+        third = self.create_item('Third', png_upload('c.png', color='blue'))
+
+        self.assertEqual(first.image_asset, second.image_asset)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image_asset, third.image_asset)
+        self.assertEqual(len(self.stored_originals()), 2)
+        self.assertEqual(first.image_asset.status, ImageAsset.Status.PENDING)
+
+    def test_worker_builds_derivatives_and_pages_use_them(self):
+        item = self.create_item('Photo', png_upload())
+        self.assertNotContains(self.client.get(reverse('campaign-detail', args=[self.campaign.pk])), '<picture>')
+
+        asset = process_asset(claim_next_asset())
+        self.assertEqual(asset.status, ImageAsset.Status.READY)
+        self.assertEqual((asset.width, asset.height), (1000, 600))
+        webp = sorted(d['width'] for d in asset.derivatives if d['format'] == 'webp')
+        self.assertEqual(webp, [160, 480, 960, 1000])
+        self.assertIsNone(claim_next_asset())
+
+        original_size = item.image.size
+        smallest = min(asset.derivatives, key=lambda d: d['size'])
+        self.assertLess(smallest['size'], original_size)
+
+        response = self.client.get(reverse('campaign-detail', args=[self.campaign.pk]))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '160w')
+        response = self.client.get(reverse('campaign-item-update', args=[item.pk]))
+        self.assertContains(response, '1000w')
+
+
+class VideoUploadTests(CampaignTestMixin, TestCase):
+    """
+    Videos are sent in checksummed chunks, in any order, and joined into the
+    item's video by the worker once every chunk is in.
+    """
+    def setUp(self):
+        self.media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(
+            MEDIA_ROOT=self.media_root, PAGE_CACHE={'TIMEOUT': 0}, CHUNKED_UPLOADS={'CHUNK_SIZE': 1000},
+        ))
+        super().setUp()
+        self.client.force_login(self.user)
+        self.video = os.urandom(2500)
+
+    def start(self, **data):
+        data = {'filename': 'launch.mp4', 'size': len(self.video), **data}
+        return self.client.post(
+            reverse('campaign-item-video-upload', args=[self.item.pk]), json.dumps(data), content_type='application/json',
+        )
+
+    def put_chunk(self, upload, index, data=None, checksum=None):
+        data = self.video[index * 1000:(index + 1) * 1000] if data is None else data
+        return self.client.put(
+            reverse('video-upload-chunk', args=[upload['id'], index]), data,
+            content_type='application/octet-stream',
+            headers={'X-Chunk-SHA256': checksum or hashlib.sha256(data).hexdigest()},
+        )
+
+    def complete(self, upload):
+        return self.client.post(reverse('video-upload-complete', args=[upload['id']]))
+
+    def assemble(self, upload):
+        call_command('runworker', once=True, stdout=io.StringIO())
+        return self.client.get(reverse('video-upload', args=[upload['id']])).json()
+
+    def test_out_of_order_chunks_are_assembled_into_the_video(self):
+        upload = self.start(sha256=hashlib.sha256(self.video).hexdigest()).json()
+        self.assertEqual((upload['chunk_count'], upload['received']), (3, []))
+
+        for index in (2, 0, 1):
+            self.assertEqual(self.put_chunk(upload, index).status_code, 200)
+        response = self.complete(upload)
+
+        # The request only queues the upload; the worker joins the chunks.
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'queued')
+        self.item.refresh_from_db()
+        self.assertFalse(self.item.video)
+        state = self.assemble(upload)
+        self.assertEqual(state['status'], 'complete')
+        self.item.refresh_from_db()
+        self.assertEqual(state['video_url'], self.item.video.url)
+        with self.item.video.open('rb') as video:
+            self.assertEqual(video.read(), self.video)
+        self.assertTrue(self.item.video.name.startswith('campaign_videos/'))
+        self.assertFalse(VideoUpload.objects.get().chunks.exists())
+        self.assertFalse(os.listdir(os.path.join(self.media_root, 'campaign_videos', 'chunks', upload['id'])))
+
+    def test_interrupted_upload_resumes_with_missing_chunks(self):
+        upload = self.start().json()
+        self.put_chunk(upload, 0)
+        self.put_chunk(upload, 2)
+        self.assertEqual(self.complete(upload).status_code, 409)
+
+        # Starting the same file again returns the unfinished upload.
+        resumed = self.start().json()
+        self.assertEqual(resumed['id'], upload['id'])
+        self.assertEqual(resumed['received'], [0, 2])
+        self.put_chunk(resumed, 1)
+        self.assertEqual(self.complete(resumed).status_code, 202)
+        self.assertEqual(self.complete(resumed).status_code, 202)
+        self.assertEqual(self.assemble(resumed)['status'], 'complete')
+        self.assertEqual(self.complete(resumed).status_code, 200)
+
+    def test_replaced_video_is_deleted(self):
+        first = self.start().json()
+        for index in range(3):
+            self.put_chunk(first, index)
+        self.complete(first)
+        self.assemble(first)
+        self.item.refresh_from_db()
+        previous = os.path.join(self.media_root, self.item.video.name)
+        self.assertTrue(os.path.exists(previous))
+
+        self.video = os.urandom(2500)
+        second = self.start().json()
+        for index in range(3):
+            self.put_chunk(second, index)
+        self.complete(second)
+        self.assertEqual(self.assemble(second)['status'], 'complete')
+        self.item.refresh_from_db()
+        self.assertFalse(os.path.exists(previous))
+        with self.item.video.open('rb') as video:
+            self.assertEqual(video.read(), self.video)
+
+    def test_checksum_mismatch_sends_the_upload_back(self):
+        upload = self.start(sha256=hashlib.sha256(b'another video').hexdigest()).json()
+        for index in range(3):
+            self.put_chunk(upload, index)
+        self.complete(upload)
+
+        state = self.assemble(upload)
+        self.assertEqual((state['status'], state['received']), ('uploading', []))
+        self.assertIn('checksum', state['error'])
+        self.item.refresh_from_db()
+        self.assertFalse(self.item.video)
+
+    def test_corrupted_or_short_chunks_are_rejected(self):
+        upload = self.start().json()
+        response = self.put_chunk(upload, 0, checksum=hashlib.sha256(b'other').hexdigest())
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.put_chunk(upload, 0, data=self.video[:10]).status_code, 400)
+        self.assertEqual(self.put_chunk(upload, 3, data=b'extra').status_code, 404)
+        self.assertEqual(self.client.get(reverse('video-upload', args=[upload['id']])).json()['received'], [])
+
+    def test_chunks_are_streamed_in_blocks(self):
+        upload = self.start(size=1000).json()
+        data = self.video[:1000]
+        with mock.patch('apps.campaigns.uploads.READ_SIZE', 64), \
+                mock.patch('django.core.handlers.wsgi.WSGIRequest.read', autospec=True,
+                           side_effect=lambda request, size=-1: request._stream.read(size)) as read:
+            self.put_chunk(upload, 0, data=data)
+        self.assertTrue(read.call_args_list)
+        self.assertLessEqual(max(call.args[1] for call in read.call_args_list), 64)
+
+    def test_other_users_cannot_see_or_write_uploads(self):
+        upload = self.start().json()
+        intruder = User.objects.create_user(username='intruder', password='pass12345')
+        self.client.force_login(intruder)
+        self.assertEqual(self.start().status_code, 404)
+        self.assertEqual(self.client.get(reverse('video-upload', args=[upload['id']])).status_code, 404)
+        self.assertEqual(self.put_chunk(upload, 0).status_code, 404)
+
+
+@override_settings(GEMINI_API_KEY='key-one')
+class GeminiClientTests(TestCase):
+
+    def setUp(self):
+        gemini.reset_client()
+        self.addCleanup(gemini.reset_client)
+
+    def test_client_is_shared(self):
+        self.assertIs(gemini.get_client(), gemini.get_client())
+
+    def test_client_rebuilt_after_key_rotation(self):
+        first = gemini.get_client()
+        with override_settings(GEMINI_API_KEY='key-two'):
+            self.assertIsNot(gemini.get_client(), first)
+        # Both transports of the replaced client were closed.
+        self.assertTrue(first._api_client._httpx_client.is_closed)
+        self.assertTrue(first._api_client._async_httpx_client.is_closed)
+
+    async def test_async_transport_is_closed_on_the_running_loop(self):
+        first = gemini.get_client()
+        gemini.close_client()
+        await asyncio.gather(*gemini._closing)
+        self.assertTrue(first._api_client._async_httpx_client.is_closed)
+        self.assertIsNot(gemini.get_client(), first)
+
+    def test_client_rebuilt_in_forked_child(self):
+        first = gemini.get_client()
+        # Simulate running in a child process created after the client was built.
+        gemini._client_pid = -1
+        self.assertIsNot(gemini.get_client(), first)
+
+    @override_settings(GEMINI_API_KEY=None)
+    def test_no_client_without_api_key(self):
+        self.assertIsNone(gemini.get_client())
+
+
+@override_settings(PROMPT_CACHE={'ENABLED': False})
+class GenerationCacheTests(TestCase):
+
+    @mock.patch('apps.campaigns.services.get_client')
+    def test_identical_request_is_served_from_cache(self, get_client):
+        get_client.return_value = fake_client()
+        first = generate_campaign_content('brief', 'org', 'campaign')
+        second = generate_campaign_content('brief', 'org', 'campaign')
+        self.assertEqual(first, second)
+        get_client.return_value.models.generate_content.assert_called_once()
+
+    @mock.patch('apps.campaigns.services.get_client')
+    def test_changed_context_misses_cache(self, get_client):
+        get_client.return_value = fake_client()
+        generate_campaign_content('brief', 'org', 'campaign')
+        generate_campaign_content('brief', 'org', 'new campaign objectives')
+        self.assertEqual(get_client.return_value.models.generate_content.call_count, 2)
+
+    def test_database_backend_expires_entries(self):
+        backend = DatabaseBackend(ttl=60, max_entries=10)
+        backend.set('a', {'x_content': 'hi'})
+        self.assertEqual(backend.get('a'), {'x_content': 'hi'})
+        GeneratedContentCache.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+        self.assertIsNone(backend.get('a'))
+
+    def test_database_backend_evicts_least_recently_used(self):
+        backend = DatabaseBackend(ttl=60, max_entries=2, EVICT_EVERY=1)
+        backend.set('a', {})
+        backend.set('b', {})
+        GeneratedContentCache.objects.filter(key='b').update(last_used_at=timezone.now() - timedelta(minutes=5))
+        backend.get('a')
+        backend.set('c', {})
+        self.assertEqual(set(GeneratedContentCache.objects.values_list('key', flat=True)), {'a', 'c'})
+
+    def test_database_backend_evicts_on_a_sample_of_writes(self):
+        backend = DatabaseBackend(ttl=60, max_entries=1, EVICT_EVERY=1000)
+        with mock.patch('apps.campaigns.cache.random.randrange', return_value=1), \
+                CaptureQueriesContext(connection) as queries:
+            backend.set('a', {})
+            backend.set('b', {})
+        self.assertFalse([query for query in queries if 'DELETE' in query['sql']])
+        with mock.patch('apps.campaigns.cache.random.randrange', return_value=0):
+            backend.set('c', {})
+        self.assertEqual(GeneratedContentCache.objects.count(), 1)
+
+
+@override_settings(PROMPT_CACHE={'ENABLED': False})
+class CachedGenerationViewTests(CampaignTestMixin, TestCase):
+
+    @mock.patch('apps.campaigns.services.get_client')
+    def test_unchanged_resave_uses_cache_instead_of_queueing(self, get_client):
+        get_client.return_value = fake_client()
+        generate_campaign_content('We are live!', None, 'Grow signups')
+
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse('campaign-item-update', kwargs={'pk': self.item.pk}),
+            {'title': 'Teaser', 'input_content': 'We are live!'},
+        )
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.blog_content, 'generated blog_content')
+        self.assertFalse(self.item.generation_jobs.exists())
+
+    @mock.patch('apps.campaigns.services.get_client')
+    def test_cache_hit_keeps_fields_edited_in_the_form(self, get_client):
+        get_client.return_value = fake_client()
+        generate_campaign_content('We are live!', None, 'Grow signups')
+
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse('campaign-item-update', kwargs={'pk': self.item.pk}),
+            {'title': 'Teaser', 'input_content': 'We are live!', 'blog_content': 'My own blog post'},
+        )
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.blog_content, 'My own blog post')
+        self.assertEqual(self.item.x_content, 'generated x_content')
+
+
+class PartialRegenerationTests(CampaignTestMixin, TestCase):
+
+    def test_field_choices_keep_the_verbose_name_casing(self):
+        labels = dict(RegenerateFieldsForm.base_fields['fields'].choices)
+        self.assertEqual(labels['x_content'], 'X (Twitter) Content')
+        self.assertEqual(labels['youtube_content'], 'YouTube Description/Script')
+        self.assertEqual(labels['blog_content'], 'Blog content')
+
+    def test_schema_only_requests_selected_fields(self):
+        schema = build_response_schema(['x_content'])
+        self.assertEqual(list(schema.properties), ['x_content'])
+        self.assertEqual(schema.required, ['x_content'])
+
+    def test_enqueue_merges_partial_requests(self):
+        enqueue_generation(self.item, fields=['x_content'])
+        job = enqueue_generation(self.item, fields=['linkedin_content'])
+        self.assertEqual(job.fields, ['linkedin_content', 'x_content'])
+        job = enqueue_generation(self.item)
+        self.assertEqual(job.fields, [])
+        self.assertEqual(GenerationJob.objects.count(), 1)
+
+    @mock.patch('apps.campaigns.jobs.generate_campaign_content', return_value=GENERATED)
+    def test_partial_job_leaves_other_fields_untouched(self, generate):
+        self.item.blog_content = 'Hand-edited blog post'
+        self.item.save()
+        enqueue_generation(self.item, fields=['x_content'])
+        run_job(claim_next_job())
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.x_content, 'generated x_content')
+        self.assertEqual(self.item.blog_content, 'Hand-edited blog post')
+        self.assertEqual(generate.call_args.kwargs['fields'], ['x_content'])
+
+    def test_regenerate_endpoint_queues_partial_job(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('campaign-item-regenerate', kwargs={'pk': self.item.pk}),
+            {'fields': ['x_content']},
+            HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.json(), {'status': 'queued', 'fields': ['x_content']})
+        self.assertEqual(self.item.generation_jobs.get().fields, ['x_content'])
+
+    def test_regenerate_endpoint_rejects_unknown_fields(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('campaign-item-regenerate', kwargs={'pk': self.item.pk}),
+            {'fields': ['title']},
+            HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+def chunked(text, size=7):
+    """Splits text into stream-like chunks that cut through keys, values and escapes."""
+    return [SimpleNamespace(text=text[i:i + size]) for i in range(0, len(text), size)]
+
+
+class IncrementalFieldParserTests(TestCase):
+
+    def test_emits_each_field_when_its_string_closes(self):
+        text = '```json\n' + json.dumps({'x_content': 'Say "hi" \u2728', 'count': [1, {'a': '}'}], 'blog_content': 'Post'}) + '\n```'
+        parser = IncrementalFieldParser()
+        emitted = []
+        for chunk in chunked(text, size=3):
+            emitted.extend(parser.feed(chunk.text))
+        self.assertEqual(emitted, [('x_content', 'Say "hi" \u2728'), ('blog_content', 'Post')])
+        self.assertTrue(parser.done)
+
+    def test_incomplete_value_is_not_emitted(self):
+        parser = IncrementalFieldParser()
+        self.assertEqual(parser.feed('{"x_content": "Done", "blog_content": "Half a po'), [('x_content', 'Done')])
+
+
+@override_settings(GEMINI_RATE_LIMIT=rate_limit_settings(), PROMPT_CACHE={'ENABLED': False})
+class CampaignItemStreamViewTests(CampaignTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('campaign-item-stream', kwargs={'pk': self.item.pk})
+        self.stream_text = json.dumps(GENERATED)
+
+    @mock.patch('apps.campaigns.services.get_client')
+    def test_streams_fields_and_saves_item(self, get_client):
+        get_client.return_value.models.generate_content_stream.return_value = chunked(self.stream_text)
+        self.client.force_login(self.user)
+        response = self.client.post(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('event: field\ndata: {"field": "linkedin_content"', body)
+        self.assertIn('event: done', body)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.video_prompt, 'generated video_prompt')
+
+    @mock.patch('apps.campaigns.services.get_client')
+    async def test_streams_with_async_client_under_asgi(self, get_client):
+        async def stream(**kwargs):
+            for chunk in chunked(self.stream_text):
+                yield chunk
+
+        get_client.return_value.aio.models.generate_content_stream = mock.AsyncMock(return_value=stream())
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(self.url)
+        body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+        self.assertEqual(body.count('event: field'), len(CampaignItem.GENERATED_FIELDS))
+        item = await CampaignItem.objects.aget(pk=self.item.pk)
+        self.assertEqual(item.x_content, 'generated x_content')
+
+
+@override_settings(GEMINI_RATE_LIMIT=rate_limit_settings(), PROMPT_CACHE={'ENABLED': False})
+class StructuredOutputTests(TestCase):
+
+    def test_parses_fenced_and_wrapped_json(self):
+        text = 'Sure! ```json\n{"x_content": "Hi"}\n``` Enjoy.'
+        self.assertEqual(parse_generated_content(text, ['x_content']), {'x_content': 'Hi'})
+
+    def test_recovers_fields_from_truncated_response(self):
+        text = '{"x_content": "Hi", "blog_content": "A long post that was cut o'
+        self.assertEqual(parse_generated_content(text, ['x_content', 'blog_content']), {'x_content': 'Hi'})
+
+    def test_drops_empty_and_non_string_values(self):
+        text = '{"x_content": "  ", "blog_content": 42, "image_prompt": "A cat"}'
+        self.assertEqual(
+            parse_generated_content(text, ['x_content', 'blog_content', 'image_prompt']),
+            {'image_prompt': 'A cat'},
+        )
+
+    @mock.patch('apps.campaigns.services.get_client')
+    def test_retries_only_missing_fields(self, get_client):
+        client = get_client.return_value
+        client.models.generate_content.side_effect = [
+            SimpleNamespace(text='{"x_content": "Hi", "blog_content": "Po'),
+            SimpleNamespace(text='{"blog_content": "Post"}'),
+        ]
+        result = generate_campaign_content('brief', 'org', 'campaign', fields=['x_content', 'blog_content'])
+        self.assertEqual(result, {'x_content': 'Hi', 'blog_content': 'Post'})
+        retry_schema = client.models.generate_content.call_args_list[1].kwargs['config'].response_schema
+        self.assertEqual(list(retry_schema.properties), ['blog_content'])
+
+
+@override_settings(
+    GEMINI_RATE_LIMIT=rate_limit_settings(),
+    GENERATION_CACHE={'BACKEND': None},
+    GENERATION_FAN_OUT={'ENABLED': True},
+    PROMPT_CACHE={'ENABLED': False},
+)
+class FanOutGenerationTests(TestCase):
+    """
+    Fields are split into groups generated concurrently, short ones on the
+    light model, and one failing group does not cost the others their fields.
+    """
+    def test_groups_and_routing(self):
+        self.assertEqual(fan_out_groups(['x_content', 'blog_content', 'facebook_content', 'image_prompt']), [
+            (LIGHT_MODEL_NAME, ['x_content', 'image_prompt']),
+            (MODEL_NAME, ['blog_content']),
+            (MODEL_NAME, ['facebook_content']),
+        ])
+        self.assertEqual(fan_out_groups(['blog_content']), [(MODEL_NAME, ['blog_content'])])
+        with override_settings(GENERATION_FAN_OUT={'ENABLED': False}):
+            self.assertEqual(fan_out_groups(['x_content', 'blog_content']), [(MODEL_NAME, ['x_content', 'blog_content'])])
+
+    def test_results_are_merged(self):
+        with FakeGeminiServer() as server, override_settings(GEMINI_API_KEY='test-key', GEMINI_BASE_URL=server.url):
+            gemini.reset_client()
+            self.addCleanup(gemini.reset_client)
+            result = generate_campaign_content('brief', 'org', 'campaign')
+        self.assertEqual(set(result), set(CampaignItem.GENERATED_FIELDS))
+        self.assertEqual(server.usage[LIGHT_MODEL_NAME]['requests'], 1)
+        self.assertEqual(server.usage[MODEL_NAME]['requests'], 3)
+
+    async def test_async_client_fans_out_on_the_event_loop(self):
+        with FakeGeminiServer(latency=0.2) as server, \
+                override_settings(GEMINI_API_KEY='test-key', GEMINI_BASE_URL=server.url):
+            gemini.reset_client()
+            self.addCleanup(gemini.reset_client)
+            gemini.get_client()
+            start = time.perf_counter()
+            results = await asyncio.gather(*(
+                agenerate_campaign_content(f'brief {n}', 'org', 'campaign') for n in range(5)
+            ))
+            elapsed = time.perf_counter() - start
+        self.assertTrue(all(set(result) == set(CampaignItem.GENERATED_FIELDS) for result in results))
+        self.assertEqual(server.usage[MODEL_NAME]['requests'], 15)
+        # 20 calls of 0.2s each, all waiting at the same time.
+        self.assertLess(elapsed, 0.8)
+
+    @mock.patch('apps.campaigns.services.get_client')
+    def test_failing_group_is_isolated(self, get_client):
+        def generate_content(model, contents, config):
+            if model == LIGHT_MODEL_NAME:
+                raise ValueError("model overloaded")
+            return SimpleNamespace(text=json.dumps(GENERATED))
+
+        get_client.return_value.models.generate_content.side_effect = generate_content
+        with self.assertLogs('apps.campaigns.services', 'ERROR'):
+            result = generate_campaign_content('brief', 'org', 'campaign')
+        self.assertEqual(set(result), set(CampaignItem.GENERATED_FIELDS) - {'x_content', 'image_prompt', 'video_prompt'})
+
+    @override_settings(GENERATION_CACHE={'BACKEND': 'apps.campaigns.cache.DatabaseBackend'})
+    @mock.patch('apps.campaigns.services.get_client')
+    def test_streamed_results_are_cached_under_the_flagship_model(self, get_client):
+        short = {'x_content': 'Streamed x content.'}
+        get_client.return_value.models.generate_content_stream.return_value = [
+            SimpleNamespace(text=json.dumps(short), usage_metadata=None),
+        ]
+        get_client.return_value.models.generate_content.return_value = SimpleNamespace(
+            text=json.dumps({'x_content': 'Light x content.'}), usage_metadata=None,
+        )
+        self.assertEqual(dict(stream_campaign_content('brief', 'org', 'campaign', fields=['x_content'])), short)
+        # The stream called MODEL_NAME, so generate (routed to the light model)
+        # does not get its output, and the stream's own cache entry is reused.
+        self.assertEqual(
+            generate_campaign_content('brief', 'org', 'campaign', fields=['x_content']),
+            {'x_content': 'Light x content.'},
+        )
+        self.assertEqual(get_client.return_value.models.generate_content.call_args.kwargs['model'], LIGHT_MODEL_NAME)
+        self.assertEqual(dict(stream_campaign_content('brief', 'org', 'campaign', fields=['x_content'])), short)
+        get_client.return_value.models.generate_content_stream.assert_called_once()
+
+
+class BulkImportTests(CampaignTestMixin, TestCase):
+
+    CSV = b"title,input_content\nFirst,Brief one\n,Missing title\nSecond,Brief two\n"
+
+    def test_jsonl_rows_report_invalid_lines(self):
+        rows = read_rows(io.BytesIO(b'{"title": "A", "input_content": "a"}\nnot json\n[1]\n'), 'jsonl')
+        items, errors = build_items(self.campaign, rows)
+        self.assertEqual([item.title for item in items], ['A'])
+        self.assertEqual([error.row for error in errors], [2, 3])
+
+    def test_import_view_bulk_creates_items_and_queues_jobs(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('campaign-item-import', kwargs={'campaign_pk': self.campaign.pk}),
+            {'file': SimpleUploadedFile('briefs.csv', self.CSV, content_type='text/csv')},
+            follow=True,
+        )
+        self.assertRedirects(response, self.campaign.get_absolute_url())
+        self.assertEqual(self.campaign.items.count(), 3)
+        self.assertEqual(GenerationJob.objects.filter(item__title__in=['First', 'Second']).count(), 2)
+        self.assertContains(response, 'Row 2: Missing title.')
+
+    def test_import_view_reports_malformed_csv(self):
+        self.client.force_login(self.user)
+        data = b"title,input_content\nHuge," + b"x" * 200000 + b"\n"
+        response = self.client.post(
+            reverse('campaign-item-import', kwargs={'campaign_pk': self.campaign.pk}),
+            {'file': SimpleUploadedFile('briefs.csv', data, content_type='text/csv')},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('field larger than field limit', response.context['form'].errors['file'][0])
+        self.assertEqual(self.campaign.items.count(), 1)
+
+    @mock.patch('apps.campaigns.importers.BATCH_SIZE', 1)
+    def test_failed_batch_leaves_no_items_or_jobs(self):
+        inserts = []
+
+        def fail_second_batch(execute, sql, params, many, context):
+            if sql.startswith(f'INSERT INTO "{CampaignItem._meta.db_table}"'):
+                inserts.append(sql)
+                if len(inserts) == 2:
+                    raise DatabaseError("disk I/O error")
+            return execute(sql, params, many, context)
+
+        self.client.force_login(self.user)
+        with connection.execute_wrapper(fail_second_batch), self.assertRaises(DatabaseError):
+            self.client.post(
+                reverse('campaign-item-import', kwargs={'campaign_pk': self.campaign.pk}),
+                {'file': SimpleUploadedFile('briefs.csv', self.CSV, content_type='text/csv')},
+            )
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(self.campaign.items.count(), 1)
+        self.assertFalse(GenerationJob.objects.exists())
+
+    def test_import_view_is_owner_only(self):
+        other = User.objects.create_user(username='other', password='pass12345')
+        self.client.force_login(other)
+        response = self.client.get(reverse('campaign-item-import', kwargs={'campaign_pk': self.campaign.pk}))
+        self.assertEqual(response.status_code, 404)
+
+    @mock.patch('apps.campaigns.importers.agenerate_campaign_content')
+    def test_command_generates_with_bounded_concurrency(self, generate):
+        generate.side_effect = lambda input_content, **kwargs: None if input_content == 'Brief two' else GENERATED
+        with tempfile.NamedTemporaryFile(suffix='.csv') as handle:
+            handle.write(self.CSV)
+            handle.flush()
+            stdout, stderr = io.StringIO(), io.StringIO()
+            call_command('import_campaign_items', self.campaign.pk, handle.name, concurrency=2, stdout=stdout, stderr=stderr)
+
+        self.assertEqual(CampaignItem.objects.get(title='First').x_content, 'generated x_content')
+        self.assertIsNone(CampaignItem.objects.get(title='Second').x_content)
+        self.assertIn('Row 2: Missing title.', stderr.getvalue())
+        self.assertIn("Row 3: Generation failed for 'Second'.", stderr.getvalue())
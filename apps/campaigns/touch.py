@@ -0,0 +1,91 @@
+import contextvars
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+# Campaign ids collected by the innermost open deferred_touches() block, if any.
+_deferred = contextvars.ContextVar('deferred_campaign_touches', default=None)
+
+# Sent after campaigns are touched (and committed), with `campaign_ids` and `using`.
+campaigns_touched = Signal()
+
+
+def _flush(campaign_ids, using):
+    from .models import Campaign
+
+    if campaign_ids:
+        Campaign.objects.using(using).filter(pk__in=campaign_ids).update(updated_at=timezone.now())
+        campaigns_touched.send(sender=Campaign, campaign_ids=campaign_ids, using=using)
+
+
+def _pending_for_transaction(using):
+    """
+    Returns the set of campaign ids waiting for the current transaction to
+    commit, registering the on_commit flush the first time.
+
+    If an earlier transaction (or savepoint) was rolled back, its callback is
+    gone from the connection and a fresh set is started.
+    """
+    connection = connections[using]
+    flush = getattr(connection, '_campaign_touches', None)
+    if flush is not None and any(entry[1] is flush for entry in connection.run_on_commit):
+        return flush.campaign_ids
+
+    campaign_ids = set()
+
+    def flush():
+        connection._campaign_touches = None
+        _flush(campaign_ids, using)
+
+    flush.campaign_ids = campaign_ids
+    connection._campaign_touches = flush
+    transaction.on_commit(flush, using=using)
+    return campaign_ids
+
+
+def touch_campaigns(campaign_ids, using=DEFAULT_DB_ALIAS):
+    """
+    Bumps updated_at on the given campaigns so they move to the top of the list.
+
+    Outside a transaction this is a single UPDATE ... WHERE id IN (...). Inside
+    a deferred_touches() block or a transaction, the ids are collected and
+    flushed once per campaign when the block exits or the transaction commits.
+    Call it after bulk_create/bulk_update, which skip CampaignItem.save().
+    """
+    campaign_ids = {pk for pk in campaign_ids if pk is not None}
+    if not campaign_ids:
+        return
+
+    deferred = _deferred.get()
+    if deferred is not None:
+        deferred.update(campaign_ids)
+    elif connections[using].in_atomic_block:
+        _pending_for_transaction(using).update(campaign_ids)
+    else:
+        _flush(campaign_ids, using)
+
+
+@contextmanager
+def deferred_touches(using=DEFAULT_DB_ALIAS):
+    """
+    Collects campaign touches made inside the block and flushes them with one
+    UPDATE on exit. Blocks can be nested; the outermost one flushes.
+
+    Usage:
+        with deferred_touches():
+            for item in items:
+                item.save()
+    """
+    if _deferred.get() is not None:
+        yield
+        return
+
+    campaign_ids = set()
+    token = _deferred.set(campaign_ids)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+    _flush(campaign_ids, using)
@@ -0,0 +1,301 @@
+import hashlib
+import io
+import logging
+import re
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNKED_UPLOADS = {
+    # Bytes per chunk. A request holds at most READ_SIZE of it in memory.
+    'CHUNK_SIZE': 8 * 1024 * 1024,
+    'MAX_SIZE': 5 * 1024 ** 3,
+    # Unfinished uploads idle for this many seconds are deleted by the worker.
+    'EXPIRE_AFTER': 60 * 60 * 24,
+}
+
+CHUNK_PREFIX = 'campaign_videos/chunks'
+# Bytes read from the request or from storage at a time.
+READ_SIZE = 64 * 1024
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _config():
+    return {**DEFAULT_CHUNKED_UPLOADS, **getattr(settings, 'CHUNKED_UPLOADS', {})}
+
+
+class UploadError(Exception):
+    """A chunked upload request that cannot be accepted, with the HTTP status to answer it with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class _BlockStream(io.RawIOBase):
+    """A read-only file over an iterator of byte blocks, so storage can pull them one at a time."""
+
+    def __init__(self, blocks):
+        self._blocks = iter(blocks)
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self._pending:
+            self._pending = next(self._blocks, b'')
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def _stream_file(blocks, name, size):
+    file = File(_BlockStream(blocks), name=name)
+    file.size = size
+    return file
+
+
+def start_upload(item, filename, size, sha256=''):
+    """
+    Starts an upload of a video for `item`, or returns the unfinished upload
+    of the same file (same name, size and checksum) so it can be resumed.
+
+    Raises:
+        UploadError: If the file is empty, too large or the checksum is malformed.
+    """
+    from .models import VideoUpload
+
+    config = _config()
+    sha256 = (sha256 or '').lower()
+    if not filename:
+        raise UploadError("A file name is required.")
+    if not isinstance(size, int) or size <= 0:
+        raise UploadError("The file size must be a positive number of bytes.")
+    if size > config['MAX_SIZE']:
+        raise UploadError(f"Videos can be at most {config['MAX_SIZE']} bytes.", status=413)
+    if sha256 and not SHA256_RE.match(sha256):
+        raise UploadError("The checksum must be a hex-encoded SHA-256.")
+
+    upload = item.video_uploads.filter(
+        status=VideoUpload.Status.UPLOADING, filename=filename, size=size, sha256=sha256,
+    ).order_by('-updated_at').first()
+    if upload is None:
+        upload = VideoUpload.objects.create(
+            item=item, filename=filename, size=size, sha256=sha256, chunk_size=config['CHUNK_SIZE'],
+        )
+    return upload
+
+
+def received_chunks(upload) -> list[int]:
+    return list(upload.chunks.order_by('index').values_list('index', flat=True))
+
+
+def write_chunk(upload, index, stream, length, checksum):
+    """
+    Stores one chunk, reading it from `stream` (the request) a block at a
+    time and hashing it on the way. A chunk already stored with the same
+    checksum is not written again, so retries are cheap.
+
+    Raises:
+        UploadError: If the upload is finished, the chunk has the wrong size
+            or is cut short, or its content does not match `checksum`.
+    """
+    from .models import VideoUpload, VideoUploadChunk
+
+    checksum = (checksum or '').lower()
+    if upload.status != VideoUpload.Status.UPLOADING:
+        raise UploadError("This upload has all its chunks and is being completed.", status=409)
+    if not 0 <= index < upload.chunk_count:
+        raise UploadError(f"Chunk index must be between 0 and {upload.chunk_count - 1}.", status=404)
+    if not SHA256_RE.match(checksum):
+        raise UploadError("Send the chunk's hex-encoded SHA-256 in the X-Chunk-SHA256 header.")
+    expected = upload.chunk_length(index)
+    if length != expected:
+        raise UploadError(f"Chunk {index} must be exactly {expected} bytes.")
+
+    existing = upload.chunks.filter(index=index).first()
+    if existing is not None and existing.sha256 == checksum:
+        return existing
+
+    digest = hashlib.sha256()
+
+    def blocks():
+        remaining = length
+        while remaining:
+            block = stream.read(min(READ_SIZE, remaining))
+            if not block:
+                raise UploadError(f"Chunk {index} ended after {length - remaining} of {length} bytes.")
+            digest.update(block)
+            remaining -= len(block)
+            yield block
+
+    # A fresh name per attempt, so a failed write never clobbers a stored chunk.
+    name = f"{CHUNK_PREFIX}/{upload.pk}/{index}-{uuid.uuid4().hex[:8]}.part"
+    try:
+        name = default_storage.save(name, _stream_file(blocks(), name, length))
+    except UploadError:
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        raise
+    if digest.hexdigest() != checksum:
+        default_storage.delete(name)
+        raise UploadError(f"Chunk {index} does not match its checksum; send it again.", status=422)
+
+    try:
+        with transaction.atomic():
+            chunk, created = VideoUploadChunk.objects.get_or_create(
+                upload=upload, index=index, defaults={'file': name, 'sha256': checksum},
+            )
+    except IntegrityError:
+        # The same chunk arrived twice at once; the other request recorded it.
+        chunk, created = VideoUploadChunk.objects.get(upload=upload, index=index), False
+    if not created:
+        if chunk.file.name != name:
+            chunk.file.delete(save=False)
+        chunk.file, chunk.sha256 = name, checksum
+        chunk.save(update_fields=['file', 'sha256'])
+    VideoUpload.objects.filter(pk=upload.pk).update(updated_at=timezone.now())
+    return chunk
+
+
+def _delete_chunks(upload):
+    for chunk in upload.chunks.all():
+        chunk.file.delete(save=False)
+    upload.chunks.all().delete()
+
+
+def complete_upload(upload):
+    """
+    Queues a fully received upload for the worker to assemble (see
+    assemble_upload), so the request never copies the video. Completing an
+    upload that is already queued, assembling or complete is a no-op.
+
+    Raises:
+        UploadError: If chunks are missing.
+    """
+    from .models import VideoUpload
+
+    if upload.status != VideoUpload.Status.UPLOADING:
+        return upload
+    missing = sorted(set(range(upload.chunk_count)) - set(received_chunks(upload)))
+    if missing:
+        raise UploadError(f"{len(missing)} chunk(s) have not been received.", status=409)
+
+    VideoUpload.objects.filter(pk=upload.pk, status=VideoUpload.Status.UPLOADING).update(
+        status=VideoUpload.Status.QUEUED, error='', updated_at=timezone.now(),
+    )
+    upload.refresh_from_db()
+    return upload
+
+
+def claim_next_upload():
+    """
+    Atomically claims the oldest queued VideoUpload, like claim_next_job().
+
+    Returns:
+        The claimed VideoUpload, or None if there is nothing to assemble.
+    """
+    from .models import VideoUpload
+
+    candidates = (
+        VideoUpload.objects
+        .filter(status=VideoUpload.Status.QUEUED)
+        .order_by('updated_at', 'pk')
+        .values_list('pk', flat=True)[:10]
+    )
+    for pk in candidates:
+        claimed = VideoUpload.objects.filter(pk=pk, status=VideoUpload.Status.QUEUED).update(
+            status=VideoUpload.Status.ASSEMBLING,
+            updated_at=timezone.now(),
+        )
+        if claimed:
+            return VideoUpload.objects.select_related('item').get(pk=pk)
+    return None
+
+
+def requeue_stale_uploads(stale_after):
+    """Puts uploads left ASSEMBLING by a dead worker back into the queue."""
+    from .models import VideoUpload
+
+    return VideoUpload.objects.filter(
+        status=VideoUpload.Status.ASSEMBLING,
+        updated_at__lt=timezone.now() - stale_after,
+    ).update(status=VideoUpload.Status.QUEUED)
+
+
+def _fail(upload, error):
+    """Sends a failed assembly back to UPLOADING, with the reason for the client."""
+    from .models import VideoUpload
+
+    upload.status, upload.error = VideoUpload.Status.UPLOADING, error
+    upload.save(update_fields=['status', 'error', 'updated_at'])
+    return upload
+
+
+def assemble_upload(upload):
+    """
+    Joins a claimed upload's chunks, in order, into the item's `video` file
+    and saves the item. The chunks are streamed from storage into the new
+    file, so memory use does not grow with the video. The video it replaces
+    is deleted once the item points at the new one.
+
+    A failed assembly puts the upload back to UPLOADING with an `error`; if
+    the joined file does not match the upload's checksum, the chunks are
+    discarded too and have to be sent again.
+    """
+    from .models import CampaignItem, VideoUpload
+
+    item = upload.item
+    previous = item.video.name
+    digest = hashlib.sha256()
+
+    def blocks():
+        for chunk in upload.chunks.order_by('index'):
+            with chunk.file.open('rb') as file:
+                for block in file.chunks(READ_SIZE):
+                    digest.update(block)
+                    yield block
+
+    try:
+        item.video.save(upload.filename, _stream_file(blocks(), upload.filename, upload.size), save=False)
+    except Exception as e:
+        logger.exception(f"Upload {upload.pk} could not be assembled: {e}")
+        return _fail(upload, "The video could not be assembled; complete the upload again.")
+    if upload.sha256 and digest.hexdigest() != upload.sha256:
+        item.video.delete(save=False)
+        _delete_chunks(upload)
+        return _fail(upload, "The assembled video does not match its checksum; upload it again.")
+
+    item.save(update_fields=['video', 'updated_at'])
+    if previous and previous != item.video.name and not CampaignItem.objects.filter(video=previous).exists():
+        item.video.storage.delete(previous)
+    upload.status, upload.error = VideoUpload.Status.COMPLETE, ''
+    upload.save(update_fields=['status', 'error', 'updated_at'])
+    _delete_chunks(upload)
+    logger.info(f"Assembled {upload.chunk_count} chunk(s) into {item.video.name} for item {item.pk}")
+    return upload
+
+
+def delete_expired_uploads():
+    """Deletes uploads still waiting for chunks, and their chunk files, that have been idle for EXPIRE_AFTER."""
+    from .models import VideoUpload
+
+    cutoff = timezone.now() - timedelta(seconds=_config()['EXPIRE_AFTER'])
+    expired = VideoUpload.objects.filter(updated_at__lt=cutoff, status=VideoUpload.Status.UPLOADING)
+    count = 0
+    for upload in expired:
+        _delete_chunks(upload)
+        upload.delete()
+        count += 1
+    return count
@@ -5,8 +5,17 @@ from .views import (
     CampaignCreateView,
     CampaignUpdateView,
     CampaignDeleteView,
+    CampaignItemListView,
     CampaignItemCreateView,
     CampaignItemUpdateView,
+    CampaignItemStatusView,
+    CampaignItemRegenerateView,
+    CampaignItemStreamView,
+    CampaignItemImportView,
+    CampaignItemVideoUploadView,
+    VideoUploadView,
+    VideoUploadChunkView,
+    VideoUploadCompleteView,
 )
 
 # This urls.py is included from the project's main urls.py
@@ -21,6 +30,17 @@ urlpatterns = [
     path('campaign/<int:pk>/delete/', CampaignDeleteView.as_view(), name='campaign-delete'),
 
     # Campaign Item URLs
+    path('campaign/<int:pk>/items/', CampaignItemListView.as_view(), name='campaign-item-list'),
     path('campaign/<int:campaign_pk>/item/create/', CampaignItemCreateView.as_view(), name='campaign-item-create'),
+    path('campaign/<int:campaign_pk>/item/import/', CampaignItemImportView.as_view(), name='campaign-item-import'),
     path('item/<int:pk>/edit/', CampaignItemUpdateView.as_view(), name='campaign-item-update'),
+    path('item/<int:pk>/status/', CampaignItemStatusView.as_view(), name='campaign-item-status'),
+    path('item/<int:pk>/regenerate/', CampaignItemRegenerateView.as_view(), name='campaign-item-regenerate'),
+    path('item/<int:pk>/stream/', CampaignItemStreamView.as_view(), name='campaign-item-stream'),
+
+    # Resumable, chunked video uploads
+    path('item/<int:pk>/video/upload/', CampaignItemVideoUploadView.as_view(), name='campaign-item-video-upload'),
+    path('video-upload/<uuid:upload_id>/', VideoUploadView.as_view(), name='video-upload'),
+    path('video-upload/<uuid:upload_id>/chunks/<int:index>/', VideoUploadChunkView.as_view(), name='video-upload-chunk'),
+    path('video-upload/<uuid:upload_id>/complete/', VideoUploadCompleteView.as_view(), name='video-upload-complete'),
 ]
\ No newline at end of file
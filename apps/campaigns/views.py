@@ -1,38 +1,126 @@
-from django.shortcuts import get_object_or_404
+import csv
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import QuerySet
+from django.shortcuts import get_object_or_404, redirect
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.urls import reverse_lazy, reverse
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+from django.views import View
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, FormView, TemplateView
+from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
 from django.contrib import messages
-from django.db.models import Q
 
-from .models import Campaign, CampaignItem
-from .forms import CampaignForm, CampaignItemForm
-from .services import generate_campaign_content
+from . import pagecache
+from .models import Campaign, CampaignItem, VideoUpload
+from .forms import CampaignForm, CampaignItemForm, CampaignItemImportForm, RegenerateFieldsForm
+from .importers import detect_format, import_items
+from .jobs import enqueue_generation, enqueue_generation_bulk, latest_job_for
+from .pagination import KeysetPaginator
+from .ratelimit import GeminiUnavailable
+from .search import search_campaigns
+from .services import astream_campaign_content, cached_campaign_content, stream_campaign_content
+from .uploads import UploadError, complete_upload, received_chunks, start_upload, write_chunk
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
 
 # --- Mixins for Authorization and Services ---
 
-class UserOwnsCampaignMixin(UserPassesTestMixin):
+class OwnerScopedObjectMixin:
+    """
+    Loads the view's object through a queryset limited to the request user's
+    rows, so other users' objects are a 404 without a separate ownership
+    check. The object is fetched once per request and reused.
+    """
+    owner_lookup = 'user'
+
+    def get_queryset(self):
+        return super().get_queryset().filter(**{self.owner_lookup: self.request.user})
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
+
+class UserOwnsCampaignMixin(OwnerScopedObjectMixin):
     """
     Ensures that the user trying to access the object is the owner.
     Used for Campaign Detail, Update, and Delete views.
     """
-    def test_func(self):
-        campaign = self.get_object()
-        return self.request.user == campaign.user
+    owner_lookup = 'user'
 
-class UserOwnsCampaignItemMixin(UserPassesTestMixin):
+class UserOwnsCampaignItemMixin(OwnerScopedObjectMixin):
     """
     Ensures the user owns the parent campaign of the item.
-    Used for CampaignItem Update view.
+    Used for CampaignItem Update view. The campaign and image are loaded in the same query.
+    """
+    owner_lookup = 'campaign__user'
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('campaign', 'image_asset')
+
+class OwnedCampaignMixin:
+    """
+    Loads the parent campaign named by the `campaign_pk` URL argument, if the
+    request user owns it (404 otherwise). Fetched once per request.
+    Used by the views that add items to a campaign.
+    """
+    def get_campaign(self):
+        if not hasattr(self, '_campaign'):
+            self._campaign = get_object_or_404(Campaign, pk=self.kwargs['campaign_pk'], user=self.request.user)
+        return self._campaign
+
+class CachedPageMixin:
     """
-    def test_func(self):
-        item = self.get_object()
-        return self.request.user == item.campaign.user
+    Serves GET requests from the page cache (see pagecache.py). Pages are
+    keyed by the versions of the scopes returned by get_cache_scopes(), which
+    are bumped whenever the data behind them changes, and carry an ETag so a
+    browser revalidating an unchanged page gets a 304 without a render.
+    """
+    def get_cache_scopes(self):
+        return [pagecache.user_scope(self.request.user.pk)]
+
+    def get(self, request, *args, **kwargs):
+        key = pagecache.page_cache_key(request, self.get_cache_scopes())
+        if key is None:
+            return super().get(request, *args, **kwargs)
+
+        etag = quote_etag(key.rsplit(':', 1)[1][:32])
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            response = not_modified
+        elif cached := pagecache.get_page(key):
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+        else:
+            response = super().get(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            if response.status_code != 200:
+                return response
+            pagecache.set_page(key, response.content, response['Content-Type'])
+
+        response['ETag'] = etag
+        # Always revalidate, and never store in shared caches.
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Cookie'])
+        return response
 
 class GeminiContentGeneratorMixin:
     """
-    Mixin to handle the call to the Gemini service on form submission.
+    Mixin to queue a Gemini generation job on form submission.
+    The item is saved straight away and the content is generated by the
+    `runworker` management command, so the request never waits on the API.
+    That is also why the create/update views stay synchronous under ASGI.
     """
     def form_valid(self, form):
         input_content = form.cleaned_data.get('input_content')
@@ -40,59 +128,101 @@ class GeminiContentGeneratorMixin:
             messages.error(self.request, "Input content is required to generate a campaign.")
             return self.form_invalid(form)
 
-        # Get campaign objectives from the parent campaign
-        # This is safe because both Create and Update views ensure
-        # form.instance.campaign is set before this is called.
-        campaign_objectives = form.instance.campaign.objectives
-
         # Safely get organization objectives from the user's profile
         try:
             org_objectives = self.request.user.profile.org_objectives
         except AttributeError:
             org_objectives = None
 
-        # Call the service to get the generated content
-        generated_data = generate_campaign_content(
+        # Identical inputs were generated before: reuse that content instantly.
+        # This is safe because both Create and Update views ensure
+        # form.instance.campaign is set before this is called.
+        cached_data = cached_campaign_content(
             input_content=input_content,
             org_context=org_objectives,
-            campaign_context=campaign_objectives,
+            campaign_context=form.instance.campaign.objectives,
         )
+        if cached_data:
+            # Only fill the fields left blank; anything typed into the form wins.
+            for key, value in cached_data.items():
+                if not form.cleaned_data.get(key):
+                    setattr(form.instance, key, value)
+            self.success_message = "Campaign item content saved successfully!"
+            return super().form_valid(form)
 
-        if generated_data:
-            # If the service succeeds, populate the form instance with the new data
-            for key, value in generated_data.items():
-                setattr(form.instance, key, value)
-            
-            # Use the default success_message from the view
-            # but you could customize it here if needed.
-            # self.success_message = "Campaign item content generated and saved successfully!"
-        else:
-            # If the service fails, add an error and re-render the form
-            messages.error(self.request, "There was an error generating content. Please check your API key and try again.")
-            return self.form_invalid(form)
-        
-        return super().form_valid(form)
+        # Save the item first (the parent's form_valid sets self.object),
+        # then hand the generation off to a background worker.
+        response = super().form_valid(form)
+        enqueue_generation(self.object)
+        return response
 
 # --- Campaign Views (Unchanged) ---
 
-class CampaignListView(LoginRequiredMixin, ListView):
+class CampaignListView(LoginRequiredMixin, CachedPageMixin, ListView):
     model = Campaign
     template_name = 'campaigns/campaign_list.html'
     context_object_name = 'campaigns'
     paginate_by = 10
 
     def get_queryset(self):
-        queryset = super().get_queryset().filter(user=self.request.user)
-        query = self.request.GET.get('q')
+        query = self.request.GET.get('q', '').strip()
         if query:
-            queryset = queryset.filter(Q(title__icontains=query) | Q(objectives__icontains=query))
-        return queryset
+            # Ranked full-text search over the campaigns and their items (see search.py).
+            return search_campaigns(self.request.user, query)
+        return super().get_queryset().filter(user=self.request.user)
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Search results are ranked in memory, so they keep page numbers. The
+        dashboard itself is paged by cursor, which stays as fast on page 500
+        as on page 1 (see pagination.py and campaign_user_updated_idx).
+        """
+        if not isinstance(queryset, QuerySet):
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size, ordering=Campaign._meta.ordering)
+        page = paginator.page(self.request.GET.get('cursor'))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+class CampaignItemPageMixin:
+    """
+    Pages a campaign's items as lightweight summaries (see
+    CampaignItemQuerySet.summaries), oldest first, by cursor.
+    """
+    items_per_page = 12
 
-class CampaignDetailView(LoginRequiredMixin, UserOwnsCampaignMixin, DetailView):
+    def get_items_page(self, campaign):
+        paginator = KeysetPaginator(campaign.items.summaries(), self.items_per_page, ordering=('id',))
+        return paginator.page(self.request.GET.get('cursor'))
+
+class CampaignDetailView(LoginRequiredMixin, UserOwnsCampaignMixin, CampaignItemPageMixin, CachedPageMixin, DetailView):
     model = Campaign
     template_name = 'campaigns/campaign_detail.html'
     context_object_name = 'campaign'
 
+    def get_cache_scopes(self):
+        return [pagecache.campaign_scope(self.kwargs['pk'])]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['items_page'] = self.get_items_page(self.object)
+        return context
+
+class CampaignItemListView(LoginRequiredMixin, CampaignItemPageMixin, CachedPageMixin, TemplateView):
+    """
+    Returns the next page of item cards as an HTML fragment, fetched by the
+    campaign page as the user scrolls.
+    """
+    template_name = 'campaigns/partials/_item_cards.html'
+
+    def get_cache_scopes(self):
+        return [pagecache.campaign_scope(self.kwargs['pk'])]
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['campaign'] = get_object_or_404(Campaign, pk=self.kwargs['pk'], user=self.request.user)
+        context['items_page'] = self.get_items_page(context['campaign'])
+        return context
+
 class CampaignCreateView(LoginRequiredMixin, SuccessMessageMixin, CreateView):
     model = Campaign
     form_class = CampaignForm
@@ -117,29 +247,29 @@ class CampaignDeleteView(LoginRequiredMixin, UserOwnsCampaignMixin, SuccessMessa
 
 # --- Campaign Item Views (MODIFIED) ---
 
-class CampaignItemCreateView(LoginRequiredMixin, GeminiContentGeneratorMixin, SuccessMessageMixin, CreateView):
+class CampaignItemCreateView(LoginRequiredMixin, OwnedCampaignMixin, GeminiContentGeneratorMixin, SuccessMessageMixin, CreateView):
     """
     Handles adding a new content item. Inherits from the Gemini mixin.
     """
     model = CampaignItem
     form_class = CampaignItemForm
     template_name = 'campaigns/campaign_item_form.html'
-    success_message = "Campaign item content generated and saved successfully!"
+    success_message = "Campaign item saved. Content is being generated and will appear shortly."
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['campaign'] = get_object_or_404(Campaign, pk=self.kwargs['campaign_pk'])
+        context['campaign'] = self.get_campaign()
         return context
 
     def form_valid(self, form):
         # First, assign the parent campaign before doing anything else
-        campaign = get_object_or_404(Campaign, pk=self.kwargs['campaign_pk'])
-        form.instance.campaign = campaign
+        form.instance.campaign = self.get_campaign()
         # Now, call the parent's (mixin's) form_valid to run the Gemini service
         return super().form_valid(form)
 
     def get_success_url(self):
-        return reverse('campaign-detail', kwargs={'pk': self.kwargs['campaign_pk']})
+        # Land on the item page, which polls until generation completes.
+        return reverse('campaign-item-update', kwargs={'pk': self.object.pk})
 
 class CampaignItemUpdateView(LoginRequiredMixin, GeminiContentGeneratorMixin, UserOwnsCampaignItemMixin, SuccessMessageMixin, UpdateView):
     """
@@ -148,12 +278,289 @@ class CampaignItemUpdateView(LoginRequiredMixin, GeminiContentGeneratorMixin, Us
     model = CampaignItem
     form_class = CampaignItemForm
     template_name = 'campaigns/campaign_item_form.html'
-    success_message = "Campaign item content regenerated and saved successfully!"
+    success_message = "Campaign item saved. Content is being regenerated and will appear shortly."
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['campaign'] = self.object.campaign
+        context['generation_job'] = latest_job_for(self.object)
+        context['regenerable_fields'] = CampaignItem.GENERATED_FIELDS
         return context
     
     def get_success_url(self):
-        return reverse('campaign-detail', kwargs={'pk': self.object.campaign.pk})
\ No newline at end of file
+        return reverse('campaign-item-update', kwargs={'pk': self.object.pk})
+
+class CampaignItemStatusView(LoginRequiredMixin, View):
+    """
+    Returns the state of an item's latest generation job as JSON.
+    Polled by the item page while content is being generated.
+    """
+    def get(self, request, pk):
+        item = get_object_or_404(CampaignItem, pk=pk, campaign__user=request.user)
+        job = latest_job_for(item)
+        if job is None:
+            return JsonResponse({'status': 'idle'})
+        return JsonResponse({
+            'status': job.status,
+            'error': job.error,
+            'finished_at': job.finished_at,
+        })
+
+class CampaignItemRegenerateView(LoginRequiredMixin, View):
+    """
+    Regenerates only the selected generated fields of an item.
+    Fields outside the selection, including hand-edited ones, are left untouched,
+    and the prompt and output only cover the selection.
+    """
+    def post(self, request, pk):
+        item = get_object_or_404(
+            CampaignItem.objects.select_related('campaign'), pk=pk, campaign__user=request.user
+        )
+        wants_json = 'application/json' in request.headers.get('Accept', '')
+
+        form = RegenerateFieldsForm(request.POST)
+        if not form.is_valid():
+            if wants_json:
+                return JsonResponse({'errors': form.errors}, status=400)
+            messages.error(request, "Select at least one field to regenerate.")
+            return redirect('campaign-item-update', pk=item.pk)
+        fields = form.cleaned_data['fields']
+
+        # Safely get organization objectives from the user's profile
+        try:
+            org_objectives = request.user.profile.org_objectives
+        except AttributeError:
+            org_objectives = None
+
+        cached_data = cached_campaign_content(
+            input_content=item.input_content,
+            org_context=org_objectives,
+            campaign_context=item.campaign.objectives,
+            fields=fields,
+        )
+        if cached_data:
+            for key in fields:
+                setattr(item, key, cached_data.get(key, getattr(item, key)))
+            item.save(update_fields=[*fields, 'updated_at'])
+            status = 'cached'
+            messages.success(request, "Selected content regenerated and saved successfully!")
+        else:
+            enqueue_generation(item, fields=fields)
+            status = 'queued'
+            messages.success(request, "Selected content is being regenerated and will appear shortly.")
+
+        if wants_json:
+            return JsonResponse({'status': status, 'fields': fields})
+        return redirect('campaign-item-update', pk=item.pk)
+
+def _sse_event(event, data):
+    """Formats one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class CampaignItemStreamView(LoginRequiredMixin, View):
+    """
+    Regenerates an item's content and streams each field to the browser as an
+    SSE event the moment it is complete. The finished content is saved at the
+    end of the stream.
+
+    Under ASGI (contentgen/asgi.py) the stream is driven by the SDK's async
+    client, so an open stream holds no worker thread. Under WSGI it falls back
+    to the synchronous client.
+    """
+    def post(self, request, pk):
+        item = get_object_or_404(
+            CampaignItem.objects.select_related('campaign'), pk=pk, campaign__user=request.user
+        )
+        form = RegenerateFieldsForm(request.POST)
+        fields = form.cleaned_data['fields'] if form.is_valid() else list(CampaignItem.GENERATED_FIELDS)
+
+        # Safely get organization objectives from the user's profile
+        try:
+            org_objectives = request.user.profile.org_objectives
+        except AttributeError:
+            org_objectives = None
+
+        context = (item.input_content, org_objectives, item.campaign.objectives, fields, item.campaign_id)
+        if isinstance(request, ASGIRequest):
+            events = self.async_events(item, context)
+        else:
+            events = self.sync_events(item, context)
+
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop reverse proxies (nginx) from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def sync_events(self, item, context):
+        generated = {}
+        try:
+            for name, value in stream_campaign_content(*context):
+                generated[name] = value
+                yield _sse_event('field', {'field': name, 'value': value})
+        except GeminiUnavailable as e:
+            logger.warning(f"Streaming refused by the Gemini rate limiter: {e}")
+            yield _sse_event('error', {'message': "Gemini is busy right now. Please try again in a moment."})
+        except Exception as e:
+            logger.error(f"An error occurred while streaming from the Gemini API: {e}")
+            yield _sse_event('error', {'message': "There was an error generating content. Please try again."})
+        yield self._save(item, generated)
+
+    async def async_events(self, item, context):
+        generated = {}
+        try:
+            async for name, value in astream_campaign_content(*context):
+                generated[name] = value
+                yield _sse_event('field', {'field': name, 'value': value})
+        except GeminiUnavailable as e:
+            logger.warning(f"Streaming refused by the Gemini rate limiter: {e}")
+            yield _sse_event('error', {'message': "Gemini is busy right now. Please try again in a moment."})
+        except Exception as e:
+            logger.error(f"An error occurred while streaming from the Gemini API: {e}")
+            yield _sse_event('error', {'message': "There was an error generating content. Please try again."})
+        yield await sync_to_async(self._save)(item, generated)
+
+    def _save(self, item, generated):
+        """Persists whatever fields were completed and returns the final 'done' event."""
+        updated_fields = [name for name in generated if name in item.GENERATED_FIELDS]
+        for name in updated_fields:
+            setattr(item, name, generated[name])
+        if updated_fields:
+            item.save(update_fields=[*updated_fields, 'updated_at'])
+        return _sse_event('done', {'saved': updated_fields})
+
+class CampaignItemImportView(LoginRequiredMixin, OwnedCampaignMixin, FormView):
+    """
+    Bulk-imports items from an uploaded CSV/JSONL file into a campaign.
+    Items are inserted in batches and their generation jobs are queued, so the
+    request does not wait on a single Gemini call.
+    """
+    form_class = CampaignItemImportForm
+    template_name = 'campaigns/campaign_item_import.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['campaign'] = self.get_campaign()
+        return context
+
+    def form_valid(self, form):
+        upload = form.cleaned_data['file']
+        try:
+            # Items and their jobs are committed together, so a failed batch
+            # leaves neither rows without jobs nor jobs without rows.
+            with transaction.atomic():
+                items, errors = import_items(self.get_campaign(), upload, detect_format(upload.name))
+                if items:
+                    enqueue_generation_bulk(items)
+        except UnicodeDecodeError:
+            form.add_error('file', "The file must be UTF-8 encoded.")
+            return self.form_invalid(form)
+        except (csv.Error, ValueError) as e:
+            # Malformed CSV (e.g. an oversized field) or a value the database refuses.
+            form.add_error('file', f"The file could not be read: {e}")
+            return self.form_invalid(form)
+
+        if items:
+            messages.success(
+                self.request,
+                f"Imported {len(items)} item(s). Their content is being generated in the background.",
+            )
+        # Report the first few problem rows; the rest are summarized.
+        for error in errors[:10]:
+            messages.warning(self.request, str(error))
+        if len(errors) > 10:
+            messages.warning(self.request, f"...and {len(errors) - 10} more row(s) were skipped.")
+        if not items and not errors:
+            messages.warning(self.request, "The file did not contain any rows.")
+        return redirect(self.get_campaign())
+
+
+# --- Resumable video uploads ---
+
+def _upload_state(upload):
+    """The JSON the upload client works from: where to send chunks and which ones are already in."""
+    state = {
+        'id': str(upload.pk),
+        'url': reverse('video-upload', kwargs={'upload_id': upload.pk}),
+        'filename': upload.filename,
+        'size': upload.size,
+        'chunk_size': upload.chunk_size,
+        'chunk_count': upload.chunk_count,
+        'received': received_chunks(upload),
+        'status': upload.status,
+        'error': upload.error,
+    }
+    if upload.status == VideoUpload.Status.COMPLETE:
+        state['video_url'] = upload.item.video.url
+    return state
+
+
+class OwnedVideoUploadMixin:
+    """
+    Loads the upload named by the `upload_id` URL argument, if the request
+    user owns its item's campaign (404 otherwise).
+    """
+    def get_upload(self):
+        return get_object_or_404(
+            VideoUpload.objects.select_related('item'),
+            pk=self.kwargs['upload_id'],
+            item__campaign__user=self.request.user,
+        )
+
+
+class CampaignItemVideoUploadView(LoginRequiredMixin, View):
+    """
+    Starts a chunked upload of an item's video, or picks up the unfinished
+    upload of the same file. The client then PUTs each chunk to
+    VideoUploadChunkView, in any order and as often as needed, and finishes
+    with VideoUploadCompleteView. See uploads.py.
+    """
+    def post(self, request, pk):
+        item = get_object_or_404(CampaignItem, pk=pk, campaign__user=request.user)
+        try:
+            data = json.loads(request.body)
+            upload = start_upload(item, data.get('filename'), data.get('size'), data.get('sha256'))
+        except (ValueError, AttributeError):
+            return JsonResponse({'error': "Expected a JSON object with 'filename' and 'size'."}, status=400)
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+        return JsonResponse(_upload_state(upload), status=201)
+
+class VideoUploadView(LoginRequiredMixin, OwnedVideoUploadMixin, View):
+    """Returns an upload's state, so an interrupted upload can resume with the missing chunks."""
+    def get(self, request, upload_id):
+        return JsonResponse(_upload_state(self.get_upload()))
+
+class VideoUploadChunkView(LoginRequiredMixin, OwnedVideoUploadMixin, View):
+    """
+    Stores one chunk sent as the raw request body, with its SHA-256 in the
+    X-Chunk-SHA256 header. The body is streamed to storage as it is read and
+    never loaded into memory as a whole.
+    """
+    def put(self, request, upload_id, index):
+        upload = self.get_upload()
+        try:
+            length = int(request.headers.get('Content-Length', ''))
+        except ValueError:
+            return JsonResponse({'error': "A Content-Length header is required."}, status=411)
+        try:
+            write_chunk(upload, index, request, length, request.headers.get('X-Chunk-SHA256'))
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+        return JsonResponse({'index': index, 'received': received_chunks(upload)})
+
+class VideoUploadCompleteView(LoginRequiredMixin, OwnedVideoUploadMixin, View):
+    """
+    Queues the received chunks to be joined into the item's video by the
+    worker, once all of them are in. The client polls VideoUploadView until
+    the status is 'complete'.
+    """
+    def post(self, request, upload_id):
+        upload = self.get_upload()
+        try:
+            complete_upload(upload)
+        except UploadError as e:
+            return JsonResponse({**_upload_state(upload), 'error': str(e)}, status=e.status)
+        status = 200 if upload.status == VideoUpload.Status.COMPLETE else 202
+        return JsonResponse(_upload_state(upload), status=status)
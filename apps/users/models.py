@@ -15,9 +15,41 @@ class Profile(models.Model):
     org_name = models.CharField(max_length=255, blank=True, null=True)
     org_objectives = models.TextField(blank=True, null=True)
 
+    # Fields whose changes are tracked, so unchanged profiles are never re-saved.
+    TRACKED_FIELDS = ('org_name', 'org_objectives')
+
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot(kwargs.get('update_fields'))
+
+    def _snapshot(self, fields=None):
+        """Records the current values of the tracked fields as the saved state."""
+        saved = getattr(self, '_saved_values', {})
+        for name in self.TRACKED_FIELDS if fields is None else fields:
+            if name in self.TRACKED_FIELDS:
+                saved[name] = getattr(self, name)
+        self._saved_values = saved
+
+    def get_dirty_fields(self) -> list[str]:
+        """
+        Returns the tracked fields changed since the profile was loaded or saved.
+        Every tracked field counts as changed on a profile that was never saved.
+        """
+        saved = getattr(self, '_saved_values', {})
+        return [
+            name for name in self.TRACKED_FIELDS
+            if name not in saved or saved[name] != getattr(self, name)
+        ]
+
 # --- Django Signals to auto-create/update Profile ---
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
@@ -31,6 +63,20 @@ def create_user_profile(sender, instance, created, **kwargs):
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def save_user_profile(sender, instance, **kwargs):
     """
-    A signal to save the Profile whenever the User object is saved.
+    A signal to save the Profile along with the User object, but only when the
+    profile was loaded on this user and has unsaved changes. User saves that
+    never touched the profile (such as the last_login update on every login)
+    cost no extra queries.
     """
-    instance.profile.save()
\ No newline at end of file
+    profile_relation = instance._meta.get_field('profile')
+    if not profile_relation.is_cached(instance):
+        return
+    profile = profile_relation.get_cached_value(instance)
+    if profile is None:
+        return
+    if profile._state.adding:
+        profile.save()
+        return
+    dirty_fields = profile.get_dirty_fields()
+    if dirty_fields:
+        profile.save(update_fields=dirty_fields)
\ No newline at end of file
@@ -0,0 +1,48 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from .models import Profile
+
+
+class ProfileSaveTests(TestCase):
+    """
+    The Profile is only written when it was loaded and actually changed.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='pass12345')
+
+    def test_login_does_not_touch_profile(self):
+        # SELECT user, session lookup + insert, last_login UPDATE, session
+        # update (plus savepoints). No SELECT or UPDATE of the profile.
+        with self.assertNumQueries(9) as context:
+            response = self.client.post(reverse('login'), {'username': 'owner', 'password': 'pass12345'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(any('users_profile' in query['sql'] for query in context.captured_queries))
+
+    def test_registration_creates_profile_once(self):
+        data = {
+            'username': 'newcomer', 'email': 'new@example.com',
+            'password1': 'Xyz!12345abc', 'password2': 'Xyz!12345abc',
+        }
+        # Two username uniqueness checks, the user INSERT and the profile INSERT.
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('register'), data)
+        self.assertRedirects(response, reverse('login'))
+        self.assertTrue(Profile.objects.filter(user__username='newcomer').exists())
+
+    def test_unchanged_profile_is_not_saved(self):
+        user = User.objects.select_related('profile').get(pk=self.user.pk)
+        self.assertEqual(user.profile.get_dirty_fields(), [])
+        with self.assertNumQueries(1):
+            user.save()
+
+    def test_changed_profile_is_saved_with_user(self):
+        user = User.objects.select_related('profile').get(pk=self.user.pk)
+        user.profile.org_name = 'Acme'
+        self.assertEqual(user.profile.get_dirty_fields(), ['org_name'])
+        # The user UPDATE and an UPDATE of just the changed profile column.
+        with self.assertNumQueries(2):
+            user.save()
+        self.assertEqual(Profile.objects.get(user=self.user).org_name, 'Acme')
+        self.assertEqual(user.profile.get_dirty_fields(), [])
@@ -0,0 +1,121 @@
+"""
+Benchmark: many concurrent generations on threads versus the async client.
+
+Runs `--generations` generations with at most `--concurrency` in flight, once
+with generate_campaign_content on a thread pool (the old importer, one thread
+per in-flight call) and once with agenerate_campaign_content on one event
+loop (`runworker --concurrency`, the importer, ASGI views). Reports the wall
+time, throughput and the most threads the process used.
+
+    python -m benchmarks.bench_async_generation --generations 200 --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+
+BRIEF = "We are launching a self-serve analytics dashboard for small online shops next week."
+ORG = "We build simple, affordable tools that help independent retailers grow."
+CAMPAIGN = "Drive sign-ups for the dashboard beta among existing customers."
+
+
+def _configure(base_url, concurrency):
+    settings.configure(
+        GEMINI_API_KEY='benchmark-key',
+        GEMINI_BASE_URL=base_url,
+        GEMINI_TIMEOUT=60.0,
+        GEMINI_MAX_CONNECTIONS=concurrency,
+        GEMINI_RATE_LIMIT={
+            # A fresh quota and circuit breaker, whatever earlier runs left behind.
+            'STATE_FILE': os.path.join(tempfile.mkdtemp(), 'limits.json'),
+            'REQUESTS_PER_MINUTE': 10000000,
+            'TOKENS_PER_MINUTE': 10000000000,
+        },
+        GENERATION_CACHE={'BACKEND': None},
+    )
+    django.setup()
+
+
+class ThreadSampler(threading.Thread):
+    """Records the largest number of threads alive, leaving out the stand-in server's own."""
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.peak = 0
+        self.stopping = threading.Event()
+
+    def run(self):
+        while not self.stopping.wait(0.01):
+            alive = sum(
+                1 for thread in threading.enumerate()
+                if 'process_request' not in thread.name and thread is not self
+            )
+            self.peak = max(self.peak, alive)
+
+
+def _threaded(generations, concurrency):
+    from apps.campaigns.services import generate_campaign_content
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(
+            lambda n: generate_campaign_content(f"{BRIEF} #{n}", ORG, CAMPAIGN), range(generations)
+        ))
+    return results
+
+
+async def _async(generations, concurrency):
+    from apps.campaigns.services import agenerate_campaign_content
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def generate(n):
+        async with semaphore:
+            return await agenerate_campaign_content(f"{BRIEF} #{n}", ORG, CAMPAIGN)
+
+    return await asyncio.gather(*(generate(n) for n in range(generations)))
+
+
+def _run(label, func, generations):
+    sampler = ThreadSampler()
+    sampler.start()
+    start = time.perf_counter()
+    results = func()
+    elapsed = time.perf_counter() - start
+    sampler.stopping.set()
+    sampler.join()
+    assert all(results), "some generations failed"
+    print(
+        f"{label:<8} {elapsed:7.2f} s   {generations / elapsed:7.1f} generations/s   "
+        f"peak threads {sampler.peak}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--generations', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=1.0, help="Seconds the stand-in takes per call.")
+    args = parser.parse_args()
+
+    from benchmarks.fake_gemini import FakeGeminiServer
+
+    with FakeGeminiServer(latency=args.latency) as server:
+        _configure(server.url, args.concurrency)
+
+        from apps.campaigns.gemini import get_client
+
+        # Warm up imports and the pooled client outside the measurement.
+        get_client().models.generate_content(model='gemini-2.5-flash', contents='warm-up')
+
+        print(f"{args.generations} generations, {args.concurrency} in flight, {args.latency}s per call:")
+        _run('threads', lambda: _threaded(args.generations, args.concurrency), args.generations)
+        _run('async', lambda: asyncio.run(_async(args.generations, args.concurrency)), args.generations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark: plain TextFields versus CompressedTextField for generated content.
+
+Creates two tables shaped like CampaignItem, one with plain text columns and
+one with compressed columns, fills both with the same generated-looking
+copy and compares stored size, bulk insert time and read times.
+
+    python -m benchmarks.bench_compression --items 5000 --codec zlib
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import django
+from django.conf import settings
+
+# Typical length in characters of each generated field.
+FIELD_LENGTHS = {
+    'linkedin_content': 1500, 'x_content': 260, 'facebook_content': 900, 'instagram_content': 700,
+    'youtube_content': 2500, 'quora_content': 1800, 'reddit_content': 1600, 'blog_content': 7000,
+    'image_prompt': 300, 'video_prompt': 400,
+}
+
+WORDS = (
+    'the and to of a in for is our your with you that this on it are we be as can at from more '
+    'campaign launch product team customers new growth brand content audience marketing today '
+    'learn how help build better results strategy data platform story share community insights '
+    'every week time first simple powerful teams work faster easy support launching announce '
+    'discover why matters future trust quality value experience grow engagement conversion'
+).split()
+
+
+def _text(rng, length):
+    weights = [1 / (rank + 1) for rank in range(len(WORDS))]
+    paragraphs, size = [], 0
+    while size < length:
+        sentence = ' '.join(rng.choices(WORDS, weights, k=rng.randint(8, 20))).capitalize() + '.'
+        if rng.random() < 0.15:
+            sentence = f"\n\n## {sentence[:40].title()}\n\n{sentence}"
+        paragraphs.append(sentence)
+        size += len(sentence) + 1
+    return ' '.join(paragraphs)[:length]
+
+
+def _configure(database_url, codec):
+    import environ
+
+    settings.configure(
+        INSTALLED_APPS=[
+            'django.contrib.auth', 'django.contrib.contenttypes',
+            'apps.users', 'apps.campaigns',
+        ],
+        DATABASES={'default': environ.Env.db_url_config(database_url)},
+        DEFAULT_AUTO_FIELD='django.db.models.BigAutoField',
+        USE_TZ=True,
+        COMPRESSED_TEXT={'CODEC': codec},
+    )
+    django.setup()
+
+
+def _models():
+    from django.db import connection, models
+    from apps.campaigns.fields import CompressedTextField
+
+    def make(name, field_class):
+        attrs = {
+            '__module__': __name__,
+            'Meta': type('Meta', (), {'app_label': 'campaigns', 'db_table': f'bench_{name.lower()}'}),
+            'title': models.CharField(max_length=255),
+        }
+        attrs.update((field, field_class(blank=True, null=True)) for field in FIELD_LENGTHS)
+        return type(name, (models.Model,), attrs)
+
+    plain, compressed = make('PlainItem', models.TextField), make('CompressedItem', CompressedTextField)
+    with connection.schema_editor() as editor:
+        editor.create_model(plain)
+        editor.create_model(compressed)
+    return plain, compressed
+
+
+def _stored_bytes(model):
+    from django.db import connection
+
+    columns = ' + '.join(f"coalesce(length({field}), 0)" for field in FIELD_LENGTHS)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT sum({columns}) FROM {model._meta.db_table}")
+        payload = cursor.fetchone()[0]
+        if connection.vendor == 'postgresql':
+            # On disk, after TOAST's own compression of large values.
+            cursor.execute("SELECT pg_total_relation_size(%s)", [model._meta.db_table])
+            return payload, cursor.fetchone()[0]
+    return payload, None
+
+
+def _median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--codec', choices=('zstd', 'zlib'), default='zstd')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', help="Defaults to a temporary SQLite file.")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')}"
+    _configure(database_url, args.codec)
+
+    from apps.campaigns import fields
+
+    if args.codec == 'zstd' and fields.zstandard is None:
+        print("zstandard is not installed; compressing with zlib.")
+    plain, compressed = _models()
+
+    rng = random.Random(42)
+    rows = [
+        {'title': f'Item {n}', **{field: _text(rng, length) for field, length in FIELD_LENGTHS.items()}}
+        for n in range(args.items)
+    ]
+    text_bytes = sum(len(value.encode('utf-8')) for row in rows for key, value in row.items() if key != 'title')
+    print(f"{args.items} items, {text_bytes / 1e6:.1f} MB of generated text")
+
+    for model in (plain, compressed):
+        start = time.perf_counter()
+        model.objects.bulk_create([model(**row) for row in rows], batch_size=500)
+        write_ms = (time.perf_counter() - start) * 1000
+
+        read_all_ms = _median_ms(lambda: list(model.objects.all()), args.repeat)
+        pks = list(model.objects.values_list('pk', flat=True))
+        sample = rng.sample(pks, min(200, len(pks)))
+        read_one_ms = _median_ms(lambda: [model.objects.get(pk=pk) for pk in sample], args.repeat) / len(sample)
+
+        payload, on_disk = _stored_bytes(model)
+        disk = f"   on disk {on_disk / 1e6:7.1f} MB" if on_disk is not None else ''
+        print(
+            f"{model.__name__:<15} stored {payload / 1e6:7.1f} MB{disk}   "
+            f"bulk insert {write_ms:8.0f} ms   read all {read_all_ms:8.0f} ms   "
+            f"read one {read_one_ms:6.3f} ms"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark: one generation call for every field versus fanned-out groups.
+
+Runs generate_campaign_content both ways against the local stand-in server,
+which takes longer the more tokens it writes (`--token-ms`, faster on the
+light model), and reports end-to-end latency plus the tokens and list-price
+cost per generation for each model.
+
+    python -m benchmarks.bench_fan_out --runs 20 --token-ms 4
+"""
+import argparse
+import statistics
+import time
+
+import django
+from django.conf import settings
+from django.test.utils import override_settings
+
+# Rough length of each field in real output, in words.
+FIELD_WORDS = {
+    'linkedin_content': 200, 'x_content': 40, 'facebook_content': 120, 'instagram_content': 80,
+    'youtube_content': 150, 'quora_content': 200, 'reddit_content': 200, 'blog_content': 400,
+    'image_prompt': 50, 'video_prompt': 60,
+}
+
+# USD per million tokens (input, output), from the public Gemini API price list.
+PRICES = {
+    'gemini-2.5-flash': (0.30, 2.50),
+    'gemini-2.5-flash-lite': (0.10, 0.40),
+}
+
+BRIEF = "We are launching a self-serve analytics dashboard for small online shops next week."
+ORG = "We build simple, affordable tools that help independent retailers grow."
+CAMPAIGN = "Drive sign-ups for the dashboard beta among existing customers."
+
+
+def _configure(base_url):
+    settings.configure(
+        GEMINI_API_KEY='benchmark-key',
+        GEMINI_BASE_URL=base_url,
+        GEMINI_TIMEOUT=60.0,
+        GEMINI_RATE_LIMIT={'REQUESTS_PER_MINUTE': 100000, 'TOKENS_PER_MINUTE': 100000000},
+        GENERATION_CACHE={'BACKEND': None},
+    )
+    django.setup()
+
+
+def _run(label, runs, server, fan_out):
+    from apps.campaigns.services import generate_campaign_content
+
+    server.usage.clear()
+    timings = []
+    with override_settings(GENERATION_FAN_OUT={'ENABLED': fan_out}):
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = generate_campaign_content(BRIEF, ORG, CAMPAIGN)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert result and len(result) == len(FIELD_WORDS), result
+
+    timings.sort()
+    print(
+        f"{label:<8} mean {statistics.mean(timings):8.1f} ms   "
+        f"p50 {timings[len(timings) // 2]:8.1f} ms   "
+        f"p95 {timings[max(0, int(len(timings) * 0.95) - 1)]:8.1f} ms"
+    )
+    total_cost = 0.0
+    for model, usage in sorted(server.usage.items()):
+        input_price, output_price = PRICES.get(model, (0.0, 0.0))
+        cost = (usage['prompt_tokens'] * input_price + usage['output_tokens'] * output_price) / 1e6 / runs
+        total_cost += cost
+        print(
+            f"{'':<8} {model:<22} calls {usage['requests'] / runs:4.1f}   "
+            f"input {usage['prompt_tokens'] / runs:7.0f}   output {usage['output_tokens'] / runs:7.0f} tokens"
+        )
+    print(f"{'':<8} cost per generation ${total_cost:.5f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.3, help="Seconds before the first token (per call).")
+    parser.add_argument('--token-ms', type=float, default=4.0, help="Milliseconds per output token on gemini-2.5-flash.")
+    parser.add_argument('--light-speedup', type=float, default=2.0, help="How much faster the light model writes.")
+    args = parser.parse_args()
+
+    from benchmarks.fake_gemini import FakeGeminiServer
+
+    token_latency = args.token_ms / 1000
+    with FakeGeminiServer(
+        latency=args.latency,
+        content_words=FIELD_WORDS,
+        token_latency=token_latency,
+        model_token_latency={'gemini-2.5-flash-lite': token_latency / args.light_speedup},
+    ) as server:
+        _configure(server.url)
+
+        from apps.campaigns.gemini import get_client
+        from apps.campaigns.services import fan_out_groups, resolve_fields
+
+        # Warm up imports and the pooled client outside the measurement.
+        get_client().models.generate_content(model='gemini-2.5-flash', contents='warm-up')
+
+        with override_settings(GENERATION_FAN_OUT={'ENABLED': True}):
+            groups = fan_out_groups(resolve_fields())
+        print(f"{args.runs} generations; fan-out groups:")
+        for model, fields in groups:
+            print(f"  {model:<22} {', '.join(fields)}")
+        _run('single', args.runs, server, fan_out=False)
+        _run('fan-out', args.runs, server, fan_out=True)
+
+
+if __name__ == '__main__':
+    main()
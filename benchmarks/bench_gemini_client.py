@@ -0,0 +1,73 @@
+"""
+Micro-benchmark: a new genai.Client per call versus the pooled client.
+
+Runs both strategies against the local stand-in server and reports per-call
+latency and how many TCP connections each one opened.
+
+    python -m benchmarks.bench_gemini_client --calls 200
+"""
+import argparse
+import statistics
+import time
+
+import django
+from django.conf import settings
+
+
+def _configure(base_url):
+    settings.configure(
+        GEMINI_API_KEY='benchmark-key',
+        GEMINI_BASE_URL=base_url,
+        GEMINI_TIMEOUT=10.0,
+    )
+    django.setup()
+
+
+def _run(label, make_client, calls, server):
+    connections_before = server.connection_count
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        client = make_client()
+        client.models.generate_content(model='gemini-2.5-flash', contents='Benchmark prompt')
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(
+        f"{label:<10} mean {statistics.mean(timings):7.2f} ms   "
+        f"p50 {timings[len(timings) // 2]:7.2f} ms   "
+        f"p95 {timings[int(len(timings) * 0.95) - 1]:7.2f} ms   "
+        f"connections {server.connection_count - connections_before}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.0, help="Simulated server latency in seconds.")
+    args = parser.parse_args()
+
+    from benchmarks.fake_gemini import FakeGeminiServer
+
+    with FakeGeminiServer(latency=args.latency) as server:
+        _configure(server.url)
+
+        from google import genai
+        from google.genai import types
+        from apps.campaigns.gemini import get_client
+
+        def per_call_client():
+            return genai.Client(
+                api_key=settings.GEMINI_API_KEY,
+                http_options=types.HttpOptions(base_url=server.url),
+            )
+
+        # Warm up imports and the pooled client outside the measurement.
+        get_client().models.generate_content(model='gemini-2.5-flash', contents='warm-up')
+
+        print(f"{args.calls} calls against {server.url}")
+        _run('per-call', per_call_client, args.calls, server)
+        _run('pooled', get_client, args.calls, server)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark: substring search versus the full-text search index.
+
+Seeds a throwaway SQLite database (or the database in --database-url) with
+users, campaigns and items, then times the old `icontains` search and
+search_campaigns() for a few queries.
+
+    python -m benchmarks.bench_search --items 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import django
+from django.conf import settings
+
+from benchmarks.seed import sentence, vocabulary
+
+QUERIES = ('launch', 'webinar onboarding', 'loyal', 'podcast', 'nonexistentword')
+
+
+def _configure(database_url):
+    import environ
+
+    settings.configure(
+        INSTALLED_APPS=[
+            'django.contrib.auth', 'django.contrib.contenttypes',
+            'apps.users', 'apps.campaigns',
+        ],
+        DATABASES={'default': environ.Env.db_url_config(database_url)},
+        DEFAULT_AUTO_FIELD='django.db.models.BigAutoField',
+        USE_TZ=True,
+    )
+    django.setup()
+
+
+def _seed(items, users, items_per_campaign):
+    from django.contrib.auth.models import User
+    from apps.campaigns.models import Campaign, CampaignItem
+    from apps.campaigns.search import rebuild_index
+
+    rng = random.Random(42)
+    words = vocabulary(rng)
+    owners = User.objects.bulk_create([User(username=f'user{n}') for n in range(users)])
+    campaign_count = max(1, items // items_per_campaign)
+    campaigns = Campaign.objects.bulk_create(
+        [
+            Campaign(
+                user=owners[n % users],
+                title=sentence(rng, words, 4),
+                objectives=sentence(rng, words, 20),
+            )
+            for n in range(campaign_count)
+        ],
+        batch_size=1000,
+    )
+    batch = []
+    for n in range(items):
+        batch.append(CampaignItem(
+            campaign=campaigns[n % campaign_count],
+            title=sentence(rng, words, 5),
+            input_content=sentence(rng, words, 40),
+            linkedin_content=sentence(rng, words, 60),
+            blog_content=sentence(rng, words, 120),
+        ))
+        if len(batch) == 5000:
+            CampaignItem.objects.bulk_create(batch)
+            batch = []
+    CampaignItem.objects.bulk_create(batch)
+    # bulk_create skips the save signals, so index everything in one pass.
+    rebuild_index()
+    return owners[0]
+
+
+def _substring_search(user, query):
+    """What the list view did before: icontains, counted and sliced by the paginator."""
+    from django.core.paginator import Paginator
+    from django.db.models import Q
+    from apps.campaigns.models import Campaign
+
+    queryset = (
+        Campaign.objects.filter(user=user)
+        .filter(
+            Q(title__icontains=query) | Q(objectives__icontains=query)
+            | Q(items__title__icontains=query) | Q(items__input_content__icontains=query)
+            | Q(items__linkedin_content__icontains=query) | Q(items__blog_content__icontains=query)
+        )
+        .distinct()
+    )
+    return list(Paginator(queryset, 10).page(1))
+
+
+def _indexed_search(user, query):
+    from django.core.paginator import Paginator
+    from apps.campaigns.search import search_campaigns
+
+    return list(Paginator(search_campaigns(user, query), 10).page(1))
+
+
+def _time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--items-per-campaign', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', help="Defaults to a temporary SQLite file.")
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')}"
+    _configure(database_url)
+
+    from django.core.management import call_command
+    from apps.campaigns.search import get_search_backend
+
+    call_command('migrate', verbosity=0)
+    start = time.perf_counter()
+    user = _seed(args.items, args.users, args.items_per_campaign)
+    print(f"Seeded {args.items} items in {time.perf_counter() - start:.1f}s "
+          f"({type(get_search_backend()).__name__})")
+
+    for query in QUERIES:
+        substring_ms, _ = _time(lambda: _substring_search(user, query), args.repeat)
+        indexed_ms, results = _time(lambda: _indexed_search(user, query), args.repeat)
+        print(f"{query!r:<22} icontains {substring_ms:8.2f} ms   indexed {indexed_ms:8.2f} ms   "
+              f"top hits {len(results)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: process cold start, from interpreter launch to the first response.
+
+Starts fresh Python processes that load the WSGI application and serve one
+request, and reports how long settings/app loading and the first request
+take. It also lists the slowest imports (python -X importtime) and whether the
+heavy SDKs were imported before any generation happened.
+
+    python -m benchmarks.bench_startup --runs 10 --path /accounts/login/
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+# Run in each child process; prints one JSON line.
+CHILD = r'''
+import io, json, os, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'contentgen.settings')
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+loaded = time.perf_counter()
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '',
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+    'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+    'wsgi.multithread': False, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+}
+statuses = []
+body = b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+done = time.perf_counter()
+print(json.dumps({
+    'load_ms': (loaded - start) * 1000,
+    'first_request_ms': (done - loaded) * 1000,
+    'status': statuses[0],
+    'modules': sorted(sys.modules),
+}))
+'''
+
+# Imports that should only happen when they are needed.
+HEAVY_MODULES = ('google.genai', 'google.cloud.secretmanager')
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def _run_child(path, importtime=False):
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', CHILD, path]
+    start = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    return {**json.loads(result.stdout.strip().splitlines()[-1]), 'wall_ms': wall_ms}, result.stderr
+
+
+def _slowest_imports(stderr, top):
+    """Top-level and first-level imports by cumulative time, from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match and len(match.group(3)) <= 3:
+            rows.append((int(match.group(2)) / 1000, match.group(4)))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/accounts/login/', help="URL path of the first request.")
+    parser.add_argument('--top', type=int, default=15, help="How many of the slowest imports to list.")
+    parser.add_argument('--json', help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'contentgen.settings')
+    runs = [_run_child(args.path)[0] for _ in range(args.runs)]
+    profile, stderr = _run_child(args.path, importtime=True)
+
+    summary = {}
+    for key in ('wall_ms', 'load_ms', 'first_request_ms'):
+        values = [run[key] for run in runs]
+        summary[key] = {'median': statistics.median(values), 'min': min(values), 'max': max(values)}
+        print(f"{key:<17} median {summary[key]['median']:8.1f} ms   min {min(values):8.1f}   max {max(values):8.1f}")
+    print(f"first response: {runs[0]['status']}")
+
+    loaded = [name for name in HEAVY_MODULES if name in profile['modules']]
+    print(f"heavy SDKs imported at start-up: {', '.join(loaded) or 'none'}")
+
+    slowest = _slowest_imports(stderr, args.top)
+    print("\nslowest imports (cumulative):")
+    for cumulative_ms, name in slowest:
+        print(f"  {cumulative_ms:8.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump({
+                'path': args.path, 'runs': args.runs, **summary, 'heavy_modules': loaded,
+                'slowest_imports': [{'module': name, 'cumulative_ms': ms} for ms, name in slowest],
+            }, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""
+A local stand-in for the Gemini REST API.
+
+Serves just enough of `models/{model}:generateContent` for the SDK to
+round-trip a request, so benchmarks and tests can exercise the real client
+code without network access or an API key. Point the service at it with
+the GEMINI_BASE_URL setting:
+
+    with FakeGeminiServer(latency=0.05) as server:
+        settings.GEMINI_BASE_URL = server.url
+
+Generation time can follow the output length, like a real model decoding
+tokens: `content_words` makes each field that many words long and
+`token_latency` (or `model_token_latency` per model) adds a delay per
+output token. Token usage per model is tallied in `usage`.
+
+Quota and outage handling can be exercised with `rate_limit` (429 with
+Retry-After above N requests per second), `fail_next` (503s) and
+`error_rate` (a random share of 500/503s). `streamGenerateContent` is
+answered as Server-Sent Events, split into `stream_chunks` pieces sent
+`stream_interval` seconds apart.
+
+`cachedContents` can be created and deleted, and generation requests that
+name one are billed its tokens as `cachedContentTokenCount`; an unknown or
+deleted cache is refused with 403, as the real API does.
+"""
+import collections
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIELDS = (
+    'linkedin_content', 'x_content', 'facebook_content', 'instagram_content',
+    'youtube_content', 'quora_content', 'reddit_content', 'blog_content',
+    'image_prompt', 'video_prompt',
+)
+
+# The google.rpc status names the real API reports for each simulated failure.
+FAILURE_STATUSES = {429: 'RESOURCE_EXHAUSTED', 500: 'INTERNAL', 503: 'UNAVAILABLE'}
+
+MODEL_PATH = re.compile(r'/models/(?P<model>[^/:]+):(?P<method>\w+)')
+CACHE_PATH = re.compile(r'/(?P<name>cachedContents(?:/[\w-]+)?)(?:\?|$)')
+
+
+FILLER = 'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor'.split()
+
+
+def fake_content(fields=FIELDS, words=None):
+    """
+    Returns a generated-content payload with one entry per field.
+
+    Args:
+        words: Optional {field: word count} padding fields to a realistic length.
+    """
+    content = {}
+    for field in fields:
+        padding = [FILLER[n % len(FILLER)] for n in range((words or {}).get(field, 0))]
+        content[field] = ' '.join([f"Fake {field.replace('_', ' ')}.", *padding])
+    return content
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep connections alive between requests.
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; don't let Nagle delay the body.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        cache_match = CACHE_PATH.search(self.path)
+        if cache_match:
+            self._create_cache(json.loads(body or b'{}'))
+            return
+        match = MODEL_PATH.search(self.path)
+        if not match:
+            self._send_json(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+            return
+
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            rejection = server.reject()
+        if rejection:
+            status, headers = rejection
+            self._send_json(status, {'error': {
+                'code': status, 'message': 'Simulated failure', 'status': FAILURE_STATUSES[status],
+            }}, headers)
+            return
+
+        request = json.loads(body or b'{}')
+        with server.lock:
+            server.requests.append(request)
+            cached_tokens = server.cached_contents.get(request.get('cachedContent'))
+        if 'cachedContent' in request and cached_tokens is None:
+            self._send_json(403, {'error': {
+                'code': 403, 'message': 'CachedContent not found (or permission denied)', 'status': 'PERMISSION_DENIED',
+            }})
+            return
+        config = request.get('generationConfig', {})
+        schema = config.get('responseSchema') or {}
+        fields = list(schema.get('properties', {})) or FIELDS
+        text = json.dumps(fake_content(fields, server.content_words))
+        if config.get('responseMimeType') != 'application/json':
+            # Without JSON mode the real model tends to wrap its answer in a fence.
+            text = '```json\n' + text + '\n```'
+        # Like the real API, the prompt count includes the cached tokens.
+        prompt_tokens = max(1, len(body) // 4) + (cached_tokens or 0)
+        output_tokens = max(1, len(text) // 4)
+        usage = {
+            'promptTokenCount': prompt_tokens,
+            'candidatesTokenCount': output_tokens,
+            'totalTokenCount': prompt_tokens + output_tokens,
+        }
+        if cached_tokens:
+            usage['cachedContentTokenCount'] = cached_tokens
+        model = match.group('model')
+        with server.lock:
+            server.usage[model].update(
+                requests=1, prompt_tokens=prompt_tokens, cached_tokens=cached_tokens or 0, output_tokens=output_tokens,
+            )
+        delay = server.latency + output_tokens * server.model_token_latency.get(model, server.token_latency)
+        if delay:
+            time.sleep(delay)
+        if match.group('method') == 'streamGenerateContent':
+            self._send_stream(text, usage, match.group('model'))
+            return
+        self._send_json(200, {
+            'candidates': [{
+                'content': {'parts': [{'text': text}], 'role': 'model'},
+                'finishReason': 'STOP',
+                'index': 0,
+            }],
+            'usageMetadata': usage,
+            'modelVersion': match.group('model'),
+        })
+
+    def do_DELETE(self):
+        match = CACHE_PATH.search(self.path)
+        with self.server.lock:
+            deleted = match and self.server.cached_contents.pop(match.group('name'), None) is not None
+        if not deleted:
+            self._send_json(404, {'error': {'code': 404, 'message': 'Not found', 'status': 'NOT_FOUND'}})
+            return
+        self._send_json(200, {})
+
+    def _create_cache(self, request):
+        server = self.server
+        tokens = max(1, len(json.dumps(request.get('contents', ''))) // 4)
+        with server.lock:
+            server.cache_count += 1
+            name = f'cachedContents/fake-{server.cache_count}'
+            server.cached_contents[name] = tokens
+        self._send_json(200, {
+            'name': name,
+            'model': request.get('model'),
+            'displayName': request.get('displayName', ''),
+            'expireTime': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() + 3600)),
+            'usageMetadata': {'totalTokenCount': tokens},
+        })
+
+    def _send_stream(self, text, usage, model):
+        """Sends the text as SSE events, like `streamGenerateContent?alt=sse`."""
+        pieces = max(1, self.server.stream_chunks)
+        size = -(-len(text) // pieces)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for start in range(0, len(text), size):
+            last = start + size >= len(text)
+            candidate = {'content': {'parts': [{'text': text[start:start + size]}], 'role': 'model'}, 'index': 0}
+            if last:
+                candidate['finishReason'] = 'STOP'
+            event = {'candidates': [candidate], 'modelVersion': model}
+            if last:
+                event['usageMetadata'] = usage
+            data = f"data: {json.dumps(event)}\r\n\r\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+            if not last and self.server.stream_interval:
+                time.sleep(self.server.stream_interval)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    """
+    Runs the stand-in API on a background thread. Use as a context manager.
+
+    Args:
+        latency: Seconds to sleep before answering each generation request.
+        content_words: {field: words} to pad generated fields with.
+        token_latency: Extra seconds per output token (simulated decoding).
+        model_token_latency: {model: seconds per output token}, overriding
+            token_latency for faster or slower models.
+        rate_limit: If set, requests beyond this many per second are
+            answered with 429 and a Retry-After header, like a real quota.
+        fail_next: Number of upcoming requests to answer with 503.
+        error_rate: Share (0-1) of requests answered with a random 500 or 503.
+        stream_chunks: Number of events a streamed response is split into.
+        stream_interval: Seconds between streamed events.
+        seed: Seeds the random errors, so runs are repeatable.
+    """
+    daemon_threads = True
+    # Hundreds of clients may connect at once; the default backlog of 5 drops their SYNs.
+    request_queue_size = 1024
+
+    def __init__(self, latency=0.0, rate_limit=None, fail_next=0, error_rate=0.0,
+                 stream_chunks=10, stream_interval=0.0, seed=None, content_words=None,
+                 token_latency=0.0, model_token_latency=None, host='127.0.0.1', port=0):
+        super().__init__((host, port), FakeGeminiHandler)
+        self.latency = latency
+        self.content_words = content_words or {}
+        self.token_latency = token_latency
+        self.model_token_latency = model_token_latency or {}
+        self.rate_limit = rate_limit
+        self.fail_next = fail_next
+        self.error_rate = error_rate
+        self.stream_chunks = stream_chunks
+        self.stream_interval = stream_interval
+        self._random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.connection_count = 0
+        self.rejected_count = 0
+        # name -> token count of the cachedContents that exist.
+        self.cached_contents = {}
+        self.cache_count = 0
+        # Bodies of the generation requests served, for tests to inspect.
+        self.requests = collections.deque(maxlen=100)
+        # model -> Counter of requests, prompt_tokens, cached_tokens and output_tokens.
+        self.usage = collections.defaultdict(collections.Counter)
+        self._window = []
+        self._thread = None
+
+    def reject(self):
+        """
+        Decides whether the current request fails. Called with self.lock held.
+
+        Returns:
+            None to serve the request, or a (status, headers) tuple.
+        """
+        if self.fail_next:
+            self.fail_next -= 1
+            self.rejected_count += 1
+            return 503, {}
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.rejected_count += 1
+            return self._random.choice((500, 503)), {}
+        if self.rate_limit:
+            now = time.monotonic()
+            self._window = [t for t in self._window if now - t < 1.0]
+            if len(self._window) >= self.rate_limit:
+                self.rejected_count += 1
+                return 429, {'Retry-After': '1'}
+            self._window.append(now)
+        return None
+
+    def process_request(self, request, client_address):
+        # Called once per accepted TCP connection, not per HTTP request.
+        with self.lock:
+            self.connection_count += 1
+        super().process_request(request, client_address)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
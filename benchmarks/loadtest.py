@@ -0,0 +1,314 @@
+"""
+Load test: the campaign list, search, detail, item create and stream pages under concurrency.
+
+Drives the app in-process, one logged-in test client per thread, against a
+database seeded by benchmarks.seed, with Gemini answered by the local
+stand-in server. Reports p50/p95/p99 latency, throughput and queries per
+request for each scenario, and writes them to a JSON file that --compare
+can diff against another run.
+
+    python -m benchmarks.seed --scale 100k --database-url sqlite:////tmp/load.sqlite3
+    python -m benchmarks.loadtest --database-url sqlite:////tmp/load.sqlite3 --output after.json
+    python -m benchmarks.loadtest --compare before.json after.json --fail-over 10
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fake_gemini import FakeGeminiServer
+from benchmarks.seed import PLANTED, USERNAME_PREFIX, setup_django
+
+# Share of requests that go to each scenario.
+SCENARIOS = {'list': 35, 'search': 20, 'detail': 30, 'create': 10, 'stream': 5}
+SEARCH_QUERIES = (*PLANTED, 'webinar onboarding', 'nonexistentword')
+
+
+def _percentiles(values):
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return {'p50': value, 'p95': value, 'p99': value}
+    cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {'p50': cuts[49], 'p95': cuts[94], 'p99': cuts[98]}
+
+
+def _configure_environment(args, gemini_url):
+    """Settings come from contentgen/settings.py; these override what matters for a load test."""
+    os.environ.update({
+        'DEBUG': 'False',
+        'GEMINI_API_KEY': 'loadtest-key',
+        'GEMINI_BASE_URL': gemini_url,
+        # The stand-in has no quota; keep the shared limiter out of the measurements.
+        'GEMINI_REQUESTS_PER_MINUTE': '1000000',
+        'GEMINI_TOKENS_PER_MINUTE': '1000000000',
+        'GEMINI_RATE_LIMIT_STATE_FILE': os.path.join(tempfile.mkdtemp(), 'limits.json'),
+        # Cached pages would hide the queries this is meant to measure.
+        'PAGE_CACHE_TIMEOUT': str(600 if args.page_cache else 0),
+    })
+    setup_django(args.database_url)
+
+
+class Worker(threading.Thread):
+    """Sends requests as one user until told to stop, recording each one."""
+
+    def __init__(self, user, campaign_ids, weights, seed, stop, record):
+        super().__init__(daemon=True)
+        from django.test import Client
+        from apps.campaigns.models import CampaignItem
+
+        self.client = Client(raise_request_exception=False)
+        self.client.force_login(user)
+        self.campaign_ids = campaign_ids
+        # Looked up now so the lookup is not counted against the stream scenario.
+        self.item_ids = list(
+            CampaignItem.objects.filter(campaign_id__in=campaign_ids).values_list('pk', flat=True)[:200]
+        )
+        self.weights = weights
+        self.rng = random.Random(seed)
+        self.stop = stop
+        self.record = record
+
+    def request(self, scenario):
+        from django.urls import reverse
+
+        campaign_id = self.rng.choice(self.campaign_ids)
+        if scenario == 'list':
+            return self.client.get(reverse('campaign-list'))
+        if scenario == 'search':
+            return self.client.get(reverse('campaign-list'), {'q': self.rng.choice(SEARCH_QUERIES)})
+        if scenario == 'detail':
+            return self.client.get(reverse('campaign-detail', args=[campaign_id]))
+        if scenario == 'create':
+            return self.client.post(reverse('campaign-item-create', args=[campaign_id]), {
+                'title': f'Load test item {self.rng.random():.8f}',
+                'input_content': f'Brief {self.rng.random():.8f} for the launch webinar.',
+            })
+        if scenario == 'stream' and self.item_ids:
+            item_id = self.rng.choice(self.item_ids)
+            response = self.client.post(reverse('campaign-item-stream', args=[item_id]), {'fields': ['x_content']})
+            # Time the whole stream, not just the first byte.
+            content = b''.join(response.streaming_content)
+            if b'event: error' in content:
+                # A stream reports failures in-band, after a 200.
+                response.status_code = 502
+            return response
+        return self.client.get(reverse('campaign-detail', args=[campaign_id]))
+
+    def run(self):
+        from django.db import close_old_connections, connection
+
+        scenarios, weights = zip(*self.weights.items())
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_queries):
+            while not self.stop.is_set():
+                scenario = self.rng.choices(scenarios, weights)[0]
+                queries = 0
+                start = time.perf_counter()
+                try:
+                    status = self.request(scenario).status_code
+                except Exception:
+                    status = 599
+                self.record(scenario, (time.perf_counter() - start) * 1000, queries, status)
+        close_old_connections()
+
+
+def run(args):
+    from django.contrib.auth.models import User
+    from apps.campaigns.models import Campaign
+
+    users = list(User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('pk')[:args.concurrency])
+    if not users:
+        sys.exit("No seeded users found; run `python -m benchmarks.seed` against this database first.")
+    campaign_ids = {
+        user.pk: list(Campaign.objects.filter(user=user).values_list('pk', flat=True)[:200]) for user in users
+    }
+
+    weights = {name: weight for name, weight in SCENARIOS.items() if name in args.scenarios}
+    samples = {name: [] for name in weights}
+    recording = threading.Event()
+    lock = threading.Lock()
+
+    def record(scenario, elapsed_ms, queries, status):
+        if recording.is_set():
+            with lock:
+                samples[scenario].append((elapsed_ms, queries, status))
+
+    stop = threading.Event()
+    workers = [
+        Worker(users[n % len(users)], campaign_ids[users[n % len(users)].pk], weights, n, stop, record)
+        for n in range(args.concurrency)
+        if campaign_ids[users[n % len(users)].pk]
+    ]
+    for worker in workers:
+        worker.start()
+    time.sleep(args.warmup)
+    recording.set()
+    started = time.perf_counter()
+    time.sleep(args.duration)
+    recording.clear()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    scenarios = {}
+    for name, rows in samples.items():
+        latencies = [row[0] for row in rows]
+        queries = [row[1] for row in rows]
+        scenarios[name] = {
+            'requests': len(rows),
+            'errors': sum(1 for row in rows if row[2] >= 500),
+            'throughput_rps': len(rows) / elapsed,
+            'latency_ms': {
+                **_percentiles(latencies),
+                'mean': statistics.mean(latencies) if latencies else 0.0,
+                'max': max(latencies, default=0.0),
+            },
+            'queries': {
+                'mean': statistics.mean(queries) if queries else 0.0,
+                'max': max(queries, default=0),
+            },
+        }
+    total = sum(s['requests'] for s in scenarios.values())
+    return {
+        'total': {
+            'requests': total,
+            'errors': sum(s['errors'] for s in scenarios.values()),
+            'throughput_rps': total / elapsed,
+        },
+        'scenarios': scenarios,
+    }
+
+
+def _metadata(args):
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from apps.campaigns.models import Campaign, CampaignItem
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'database': connection.vendor,
+        'rows': {
+            'users': User.objects.count(),
+            'campaigns': Campaign.objects.count(),
+            'items': CampaignItem.objects.count(),
+        },
+        'concurrency': args.concurrency,
+        'duration_s': args.duration,
+        'gemini_latency_s': args.gemini_latency,
+        'gemini_error_rate': args.gemini_error_rate,
+        'page_cache': args.page_cache,
+    }
+
+
+def _print_results(results):
+    print(f"{'scenario':<8} {'requests':>9} {'errors':>7} {'req/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for name, result in results['scenarios'].items():
+        latency = result['latency_ms']
+        print(f"{name:<8} {result['requests']:>9} {result['errors']:>7} {result['throughput_rps']:>8.1f} "
+              f"{latency['p50']:>8.1f} {latency['p95']:>8.1f} {latency['p99']:>8.1f} {result['queries']['mean']:>8.1f}")
+    total = results['total']
+    print(f"{'total':<8} {total['requests']:>9} {total['errors']:>7} {total['throughput_rps']:>8.1f}")
+
+
+def compare(before_path, after_path, fail_over=None):
+    """
+    Prints the change in latency, throughput and queries per scenario.
+
+    Returns:
+        The scenarios whose p95 got worse by more than `fail_over` percent.
+    """
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+6.1f}%" if old else '   n/a'
+
+    regressions = []
+    print(f"{before_path} ({before['meta'].get('commit')}) -> {after_path} ({after['meta'].get('commit')})")
+    print(f"{'scenario':<8} {'p50 ms':>21} {'p95 ms':>21} {'p99 ms':>21} {'req/s':>19} {'queries':>15}")
+    for name, new in after['scenarios'].items():
+        old = before['scenarios'].get(name)
+        if old is None:
+            continue
+        columns = []
+        for key in ('p50', 'p95', 'p99'):
+            a, b = old['latency_ms'][key], new['latency_ms'][key]
+            columns.append(f"{a:6.1f} -> {b:6.1f} {change(a, b)}")
+        a, b = old['throughput_rps'], new['throughput_rps']
+        columns.append(f"{a:5.1f} -> {b:5.1f} {change(a, b)}")
+        a, b = old['queries']['mean'], new['queries']['mean']
+        columns.append(f"{a:5.1f} -> {b:5.1f}")
+        print(f"{name:<8} " + '  '.join(columns))
+
+        p95_old, p95_new = old['latency_ms']['p95'], new['latency_ms']['p95']
+        if fail_over is not None and p95_old and (p95_new - p95_old) / p95_old * 100 > fail_over:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--database-url', help="Defaults to DATABASE_URL from the environment or .env.")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds to measure for.")
+    parser.add_argument('--warmup', type=float, default=3.0, help="Seconds to run before measuring.")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        type=lambda value: value.split(','), help="Comma-separated subset of the scenarios.")
+    parser.add_argument('--gemini-latency', type=float, default=0.5, help="Seconds the stand-in takes to answer.")
+    parser.add_argument('--gemini-error-rate', type=float, default=0.0, help="Share of Gemini calls that fail.")
+    parser.add_argument('--page-cache', action='store_true', help="Leave the page cache on.")
+    parser.add_argument('--output', default='loadtest.json', help="Where to write the results.")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="Diff two result files and exit.")
+    parser.add_argument('--fail-over', type=float,
+                        help="With --compare, exit with status 1 if any p95 got worse by more than this percent.")
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, fail_over=args.fail_over)
+        if regressions:
+            sys.exit(f"p95 regressed by more than {args.fail_over}%: {', '.join(regressions)}")
+        return
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    # Streamed in a few pieces, so stream timings include the stand-in's latency.
+    server = FakeGeminiServer(
+        latency=args.gemini_latency, error_rate=args.gemini_error_rate, stream_chunks=5, seed=0,
+    )
+    with server:
+        _configure_environment(args, server.url)
+        results = {'meta': _metadata(args), **run(args)}
+        results['meta']['gemini_requests'] = server.request_count
+
+    _print_results(results)
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
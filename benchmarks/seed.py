@@ -0,0 +1,135 @@
+"""
+Seeds a database with users, campaigns and items for benchmarks and load tests.
+
+Every user gets the password `loadtest`. Items carry generated-looking copy
+from a Zipf-distributed vocabulary, so search terms range from common to
+rare, and the search index is rebuilt at the end.
+
+    python -m benchmarks.seed --scale 100k --database-url postgres://localhost/contentgen_bench
+"""
+import argparse
+import os
+import random
+import time
+
+import django
+
+SCALES = {
+    # name: (users, campaigns, items)
+    '10k': (100, 1_000, 10_000),
+    '100k': (1_000, 10_000, 100_000),
+    '1m': (10_000, 100_000, 1_000_000),
+}
+USERNAME_PREFIX = 'loaduser'
+PASSWORD = 'loadtest'
+BATCH_SIZE = 5000
+
+SYLLABLES = 'ka lo mi ne ru sa ti vo ze pa qua dri mon tel vex bor lin ast'.split()
+# Real words are mixed into a Zipf-distributed synthetic vocabulary, so some are
+# common and some rare, as in real copy.
+PLANTED = ('launch', 'webinar', 'onboarding', 'loyalty', 'rocket', 'podcast')
+
+
+def vocabulary(rng, size=5000):
+    words = {
+        ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size * 2)
+    }
+    words = sorted(words)[:size]
+    rng.shuffle(words)
+    # From common ('launch') to rare ('podcast').
+    for rank, word in zip((3, 40, 90, 400, 2500, 4000), PLANTED):
+        words.insert(rank, word)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    return words, weights
+
+
+def sentence(rng, words, length=12):
+    return ' '.join(rng.choices(*words, k=length)).capitalize() + '.'
+
+
+def setup_django(database_url=None):
+    """Loads the project settings, pointed at `database_url` if given."""
+    if database_url:
+        os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'contentgen.settings')
+    django.setup()
+
+
+def seed(users, campaigns, items, log=print):
+    """
+    Inserts the rows with bulk_create, in batches.
+
+    Returns:
+        The number of (users, campaigns, items) created.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from apps.campaigns.models import Campaign, CampaignItem
+    from apps.campaigns.search import rebuild_index
+
+    rng = random.Random(42)
+    words = vocabulary(rng)
+    # Hashing is deliberately slow, so every user shares one hash.
+    password = make_password(PASSWORD)
+
+    start = time.perf_counter()
+    owners = User.objects.bulk_create(
+        [User(username=f'{USERNAME_PREFIX}{n}', password=password) for n in range(users)],
+        batch_size=BATCH_SIZE,
+    )
+    campaign_rows = []
+    for start_index in range(0, campaigns, BATCH_SIZE):
+        campaign_rows += Campaign.objects.bulk_create([
+            Campaign(
+                user=owners[n % users],
+                title=sentence(rng, words, 4),
+                objectives=sentence(rng, words, 20),
+            )
+            for n in range(start_index, min(campaigns, start_index + BATCH_SIZE))
+        ])
+    log(f"{users} users and {campaigns} campaigns in {time.perf_counter() - start:.1f}s")
+
+    for start_index in range(0, items, BATCH_SIZE):
+        CampaignItem.objects.bulk_create([
+            CampaignItem(
+                campaign=campaign_rows[n % campaigns],
+                title=sentence(rng, words, 5),
+                input_content=sentence(rng, words, 40),
+                linkedin_content=sentence(rng, words, 60),
+                x_content=sentence(rng, words, 12),
+                blog_content=sentence(rng, words, 120),
+            )
+            for n in range(start_index, min(items, start_index + BATCH_SIZE))
+        ])
+        if (start_index // BATCH_SIZE) % 20 == 19:
+            log(f"  {start_index + BATCH_SIZE} items...")
+    log(f"{items} items after {time.perf_counter() - start:.1f}s")
+
+    # bulk_create skips the save signals, so index everything in one pass.
+    rebuild_index()
+    log(f"Search index rebuilt after {time.perf_counter() - start:.1f}s")
+    return users, campaigns, items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scale', choices=SCALES, default='10k')
+    parser.add_argument('--database-url', help="Defaults to DATABASE_URL from the environment or .env.")
+    parser.add_argument('--flush', action='store_true', help="Delete all existing data first.")
+    args = parser.parse_args()
+
+    setup_django(args.database_url)
+
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    if args.flush:
+        call_command('flush', interactive=False, verbosity=0)
+    elif User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+        parser.error("The database has already been seeded; pass --flush to start over.")
+    seed(*SCALES[args.scale])
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,17 @@ ASGI config for contentgen project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+This is what production serves (see app.yaml), with gunicorn managing
+uvicorn workers:
+
+    gunicorn -k uvicorn_worker.UvicornWorker -w 4 contentgen.asgi:application
+
+Async views, such as the item stream, then await Gemini on the worker's event
+loop, so one worker can hold many open generations. Sync views still work;
+Django runs each of them in a thread. To run the same stack locally:
+
+    uvicorn contentgen.asgi:application --reload
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,430 @@
+"""
+Request and Gemini metrics: a Server-Timing header on every response and a
+Prometheus text endpoint at /metrics.
+
+    MIDDLEWARE: MetricsMiddleware, right after StaticFilesMiddleware
+    urls.py: path('metrics', metrics_view)
+
+Each process counts in memory and writes its totals to its own file in
+METRICS['DIRECTORY'] at most every FLUSH_INTERVAL seconds, so recording a
+sample never waits on another gunicorn worker. /metrics adds up all the files
+in the directory. Files left behind by exited processes are folded into one
+archive file, so counters keep growing across worker restarts.
+"""
+import atexit
+import contextvars
+import hmac
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.views.decorators.cache import never_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: exited processes' files are kept as they are.
+    fcntl = None
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_METRICS = {
+    # Shared by every process on the host; empty it when deploying new code.
+    'DIRECTORY': os.path.join(tempfile.gettempdir(), 'contentgen-metrics'),
+    # How often a process writes its totals; /metrics lags by up to this much.
+    'FLUSH_INTERVAL': 5.0,
+    # Scrapers send "Authorization: Bearer <TOKEN>"; staff users need no token.
+    'TOKEN': None,
+    'SERVER_TIMING': True,
+}
+
+# Seconds, from a cached page to a full generation.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+ARCHIVE_NAME = 'archive.json'
+LOCK_NAME = '.lock'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+HTTP_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# name -> metric, in definition order.
+REGISTRY = {}
+
+
+def _config():
+    return {**DEFAULT_METRICS, **getattr(settings, 'METRICS', {})}
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        if name in REGISTRY:
+            raise ValueError(f"A metric named {name} is already registered.")
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        REGISTRY[name] = self
+
+    def _key(self, labels) -> str:
+        if labels.keys() != set(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels: {', '.join(self.labelnames)}.")
+        return json.dumps([str(labels[name]) for name in self.labelnames])
+
+    def samples(self, key, value) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A total that only goes up, e.g. Counter('..._total', "Help.", ['model']).inc(model=m)."""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        _store.add(self.name, self._key(labels), amount)
+
+    def samples(self, key, value):
+        labels = dict(zip(self.labelnames, json.loads(key)))
+        return [f'{self.name}{_format_labels(labels)} {value}']
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative `le` buckets, plus their sum and count."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        # The last slot is +Inf.
+        _store.observe(self.name, self._key(labels), bisect_left(self.buckets, value), len(self.buckets) + 1, value)
+
+    def samples(self, key, value):
+        # value is the per-bucket counts followed by the sum.
+        if len(value) != len(self.buckets) + 2:
+            # Written by a process running different buckets; cannot be merged.
+            return []
+        labels = dict(zip(self.labelnames, json.loads(key)))
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), value[:-1]):
+            cumulative += count
+            le = bound if bound == '+Inf' else repr(float(bound))
+            lines.append(f'{self.name}_bucket{_format_labels({**labels, "le": le})} {cumulative}')
+        lines.append(f'{self.name}_sum{_format_labels(labels)} {value[-1]}')
+        lines.append(f'{self.name}_count{_format_labels(labels)} {cumulative}')
+        return lines
+
+
+class _ProcessStore:
+    """This process's totals: {metric name: {label key: value}}, written to its own file."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        # The pid alone could be reused by a later process and overwrite this one's totals.
+        self.filename = f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json'
+        self.flushed_at = time.monotonic()
+
+    def add(self, name, key, amount):
+        with self.lock:
+            series = self.values.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, key, index, size, value):
+        with self.lock:
+            series = self.values.setdefault(name, {})
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * size + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def flush(self, force=False):
+        """Writes the totals if FLUSH_INTERVAL has passed since the last write (or `force`)."""
+        config = _config()
+        with self.lock:
+            now = time.monotonic()
+            if not self.values or (not force and now - self.flushed_at < config['FLUSH_INTERVAL']):
+                return
+            self.flushed_at = now
+            payload = json.dumps(self.values)
+        try:
+            os.makedirs(config['DIRECTORY'], exist_ok=True)
+            _write_atomic(os.path.join(config['DIRECTORY'], self.filename), payload)
+        except OSError as e:
+            logger.warning(f"Could not write metrics to {config['DIRECTORY']}: {e}")
+
+
+def _write_atomic(path, payload):
+    # Renamed into place, so /metrics never reads a half-written file.
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+            handle.write(payload)
+        os.replace(temp_path, path)
+    except OSError:
+        os.unlink(temp_path)
+        raise
+
+
+_store = _ProcessStore()
+
+
+def _reset_store():
+    """Starts a forked child with empty totals; the parent's are its own to report."""
+    global _store
+    _store = _ProcessStore()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_store)
+atexit.register(lambda: _store.flush(force=True))
+
+
+def flush(force=False):
+    """Writes this process's totals (see _ProcessStore.flush)."""
+    _store.flush(force=force)
+
+
+def _read(path) -> dict:
+    try:
+        with open(path, encoding='utf-8') as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return {}
+
+
+def _merge(totals, values):
+    for name, series in values.items():
+        target = totals.setdefault(name, {})
+        for key, value in series.items():
+            if key not in target:
+                target[key] = value
+            elif isinstance(value, list):
+                current = target[key]
+                if len(current) == len(value):
+                    target[key] = [a + b for a, b in zip(current, value)]
+            else:
+                target[key] += value
+
+
+def _process_exited(filename) -> bool:
+    try:
+        os.kill(int(filename.split('-', 1)[0]), 0)
+    except ValueError:
+        return False
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+@contextmanager
+def _directory_lock(directory):
+    with open(os.path.join(directory, LOCK_NAME), 'a') as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        yield
+
+
+def collect(directory) -> dict:
+    """
+    Returns the totals of every process that wrote to `directory`, after
+    folding the files of exited processes into the archive.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with _directory_lock(directory):
+        filenames = [name for name in os.listdir(directory) if name.endswith('.json')]
+        exited = [name for name in filenames if name != ARCHIVE_NAME and _process_exited(name)]
+        if exited and fcntl is not None:
+            archive = _read(os.path.join(directory, ARCHIVE_NAME))
+            for name in exited:
+                _merge(archive, _read(os.path.join(directory, name)))
+            _write_atomic(os.path.join(directory, ARCHIVE_NAME), json.dumps(archive))
+            for name in exited:
+                os.unlink(os.path.join(directory, name))
+            filenames = [name for name in filenames if name not in exited]
+            if ARCHIVE_NAME not in filenames:
+                filenames.append(ARCHIVE_NAME)
+
+        totals = {}
+        for name in filenames:
+            _merge(totals, _read(os.path.join(directory, name)))
+    return totals
+
+
+def render(totals) -> str:
+    """Formats totals in the Prometheus text exposition format."""
+    lines = []
+    for name, metric in REGISTRY.items():
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        for key, value in sorted(totals.get(name, {}).items()):
+            lines.extend(metric.samples(key, value))
+    return '\n'.join(lines) + '\n'
+
+
+REQUEST_DURATION = Histogram(
+    'contentgen_http_request_duration_seconds',
+    "Time from the request reaching the application to the response headers.",
+    ['method', 'view', 'status'],
+)
+REQUEST_QUERIES = Histogram(
+    'contentgen_http_request_queries',
+    "Database queries made while handling a request.",
+    ['view'],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    'contentgen_http_request_db_duration_seconds',
+    "Time a request spent waiting on database queries.",
+    ['view'],
+)
+
+
+# --- Per-request timings ---
+
+# {name: (count, seconds)} for the request being handled, e.g. {'db': (3, 0.004)}.
+_timings = contextvars.ContextVar('contentgen_request_timings', default=None)
+
+# Server-Timing descriptions; anything else is counted in "calls".
+TIMING_UNITS = {'db': 'queries'}
+
+
+def record_timing(name, seconds):
+    """Adds one `name` operation taking `seconds` to the current request's Server-Timing header."""
+    timings = _timings.get()
+    if timings is not None:
+        count, total = timings.get(name, (0, 0.0))
+        timings[name] = (count + 1, total + seconds)
+
+
+def server_timing(total, timings) -> str:
+    """Builds the Server-Timing header value: total time first, then each recorded operation."""
+    entries = [f'total;dur={total * 1000:.1f}']
+    for name, (count, seconds) in timings.items():
+        entries.append(f'{name};dur={seconds * 1000:.1f};desc="{count} {TIMING_UNITS.get(name, "calls")}"')
+    return ', '.join(entries)
+
+
+def _time_query(execute, sql, params, many, context):
+    if _timings.get() is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record_timing('db', time.perf_counter() - start)
+
+
+def _install_query_timer(connection, **kwargs):
+    # The wrapper stays on the connection object for its lifetime, and does
+    # nothing outside a request.
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+connection_created.connect(_install_query_timer)
+
+
+class MetricsMiddleware:
+    """
+    Times every request, with its database queries and Gemini calls, sends
+    the breakdown in a Server-Timing header and records it in the request
+    histograms.
+
+    Streamed responses are measured up to their headers; the Gemini time of
+    the stream itself is recorded by the service layer.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connections opened before this middleware was loaded missed the signal.
+        for connection in connections.all(initialized_only=True):
+            _install_query_timer(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, time.perf_counter() - start, timings)
+
+    async def __acall__(self, request):
+        timings = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, time.perf_counter() - start, timings)
+
+    def finish(self, request, response, elapsed, timings):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        queries, db_seconds = timings.get('db', (0, 0.0))
+        REQUEST_DURATION.observe(
+            elapsed,
+            method=request.method if request.method in HTTP_METHODS else 'other',
+            view=view,
+            status=response.status_code,
+        )
+        REQUEST_QUERIES.observe(queries, view=view)
+        REQUEST_DB_DURATION.observe(db_seconds, view=view)
+
+        config = _config()
+        if config['SERVER_TIMING']:
+            response['Server-Timing'] = server_timing(elapsed, timings)
+        _store.flush()
+        return response
+
+
+@never_cache
+def metrics_view(request):
+    """Serves the totals of every process on this host in the Prometheus text format."""
+    config = _config()
+    user = getattr(request, 'user', None)
+    token = config['TOKEN']
+    authorized = bool(token) and hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()
+    )
+    if not (authorized or (user is not None and user.is_staff)):
+        raise PermissionDenied
+    _store.flush(force=True)
+    return HttpResponse(render(collect(config['DIRECTORY'])), content_type=CONTENT_TYPE)
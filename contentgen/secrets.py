@@ -0,0 +1,89 @@
+"""
+Loads the settings secrets (a .env-format payload kept in Secret Manager)
+for settings.py.
+
+Fetching them is a network round trip, plus the Secret Manager client import,
+on every process start. The payload is therefore kept in a local snapshot file
+and reused until it is SECRETS_SNAPSHOT_TTL seconds old. All the workers of an
+instance, and any restart within the TTL, then start without calling Google
+Cloud. When a refresh fails, the stale snapshot is used rather than failing
+the start.
+"""
+import logging
+import os
+import tempfile
+import time
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(tempfile.gettempdir(), 'contentgen-secrets.env')
+DEFAULT_TTL = 60 * 15
+
+
+def fetch_secrets(project_id: str, secret_name: str) -> str:
+    """Reads the latest version of the secret from Secret Manager."""
+    from google.cloud import secretmanager
+
+    client = secretmanager.SecretManagerServiceClient()
+    name = f"projects/{project_id}/secrets/{secret_name}/versions/latest"
+    return client.access_secret_version(name=name).payload.data.decode("UTF-8")
+
+
+def _read_snapshot(path):
+    """Returns (payload, age in seconds) of the snapshot, or (None, None) if there is none."""
+    try:
+        with open(path, encoding='utf-8') as snapshot:
+            return snapshot.read(), time.time() - os.fstat(snapshot.fileno()).st_mtime
+    except OSError:
+        return None, None
+
+
+def _write_snapshot(path, payload):
+    # Written to a private temporary file and renamed, so concurrent starts
+    # never read a half-written snapshot and other users cannot read it at all.
+    directory = os.path.dirname(path) or '.'
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.contentgen-secrets-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as snapshot:
+            snapshot.write(payload)
+        os.replace(temp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write the secrets snapshot {path}: {e}")
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+
+def load_secrets(project_id, secret_name, snapshot_path=None, ttl=None, refresh=False) -> str:
+    """
+    Returns the secrets payload, from the snapshot while it is fresh and from
+    Secret Manager otherwise (refreshing the snapshot).
+
+    Args:
+        snapshot_path: Where the snapshot is kept; defaults to the temp directory.
+        ttl: Seconds a snapshot is used for; 0 always fetches.
+        refresh: Fetch even if the snapshot is fresh.
+
+    Raises:
+        Whatever Secret Manager raises, if it cannot be reached and there is
+        no snapshot to fall back on.
+    """
+    snapshot_path = snapshot_path or DEFAULT_SNAPSHOT_PATH
+    ttl = DEFAULT_TTL if ttl is None else ttl
+
+    payload, age = _read_snapshot(snapshot_path)
+    if payload is not None and age < ttl and not refresh:
+        return payload
+
+    try:
+        fresh = fetch_secrets(project_id, secret_name)
+    except Exception as e:
+        if payload is None:
+            raise
+        logger.warning(f"Could not refresh secrets ({e}); using the {age:.0f}s old snapshot.")
+        return payload
+    if ttl > 0:
+        _write_snapshot(snapshot_path, fresh)
+    return fresh
@@ -10,11 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import io
 from pathlib import Path
-from decouple import config
-from google.cloud import secretmanager
+from urllib.parse import urlparse
 import os # Import os to access environment variables
 import environ
+
+from .secrets import load_secrets
 env = environ.Env(
     # set casting, default value
     DEBUG=(bool, True)
@@ -26,19 +28,19 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # [START gaestd_py_django_secret_config]
 env = environ.Env(DEBUG=(bool, False))
 env_file = os.path.join(BASE_DIR, ".env")
-print(f"Env file: {env_file}")
 
 if os.path.isfile(env_file):
     # Use a local secret file, if provided
     env.read_env(env_file)
 elif os.environ.get("GOOGLE_CLOUD_PROJECT", None):
-    # Pull secrets from Secret Manager
-    project_id = os.environ.get("GOOGLE_CLOUD_PROJECT")
-
-    client = secretmanager.SecretManagerServiceClient()
-    settings_name = os.environ.get("SETTINGS_NAME", "django_settings")
-    name = f"projects/{project_id}/secrets/{settings_name}/versions/latest"
-    payload = client.access_secret_version(name=name).payload.data.decode("UTF-8")
+    # Pull secrets from Secret Manager, through a local snapshot that is reused
+    # for SECRETS_SNAPSHOT_TTL seconds (see contentgen/secrets.py).
+    payload = load_secrets(
+        os.environ.get("GOOGLE_CLOUD_PROJECT"),
+        os.environ.get("SETTINGS_NAME", "django_settings"),
+        snapshot_path=os.environ.get("SECRETS_SNAPSHOT_PATH"),
+        ttl=int(os.environ.get("SECRETS_SNAPSHOT_TTL", 60 * 15)),
+    )
 
     env.read_env(io.StringIO(payload))
 else:
@@ -59,6 +61,76 @@ DEBUG = env('DEBUG')
 # Add this line to load your Gemini API Key from the .env file
 GEMINI_API_KEY = env('GEMINI_API_KEY', default=None)
 
+# Gemini HTTP client tuning. A single pooled client is shared per process.
+# GEMINI_TIMEOUT is in seconds; GEMINI_BASE_URL points the SDK at a stand-in server.
+GEMINI_TIMEOUT = env.float('GEMINI_TIMEOUT', default=60.0)
+GEMINI_MAX_CONNECTIONS = env.int('GEMINI_MAX_CONNECTIONS', default=20)
+GEMINI_KEEPALIVE_EXPIRY = env.float('GEMINI_KEEPALIVE_EXPIRY', default=60.0)
+GEMINI_BASE_URL = env('GEMINI_BASE_URL', default=None)
+
+# Quota and failure handling shared by every process on the host (see apps/campaigns/ratelimit.py).
+# Set the per-minute limits a little below the project's Gemini quota.
+GEMINI_RATE_LIMIT = {
+    'REQUESTS_PER_MINUTE': env.int('GEMINI_REQUESTS_PER_MINUTE', default=60),
+    'TOKENS_PER_MINUTE': env.int('GEMINI_TOKENS_PER_MINUTE', default=250000),
+    'MAX_WAIT': env.float('GEMINI_RATE_LIMIT_MAX_WAIT', default=30.0),
+    'MAX_ATTEMPTS': env.int('GEMINI_MAX_ATTEMPTS', default=4),
+    'FAILURE_THRESHOLD': env.int('GEMINI_CIRCUIT_FAILURE_THRESHOLD', default=5),
+    'RESET_TIMEOUT': env.float('GEMINI_CIRCUIT_RESET_TIMEOUT', default=30.0),
+}
+if env('GEMINI_RATE_LIMIT_STATE_FILE', default=None):
+    GEMINI_RATE_LIMIT['STATE_FILE'] = env('GEMINI_RATE_LIMIT_STATE_FILE')
+
+# Generated content is cached by a hash of the prompt inputs, model and prompt version.
+# Use 'apps.campaigns.cache.DjangoCacheBackend' to keep entries in a Django cache instead,
+# or set BACKEND to None to disable caching.
+GENERATION_CACHE = {
+    'BACKEND': env('GENERATION_CACHE_BACKEND', default='apps.campaigns.cache.DatabaseBackend'),
+    'TTL': env.int('GENERATION_CACHE_TTL', default=60 * 60 * 24 * 30),
+    'MAX_ENTRIES': env.int('GENERATION_CACHE_MAX_ENTRIES', default=10000),
+    # DatabaseBackend evicts on about one write in EVICT_EVERY.
+    'OPTIONS': {'EVICT_EVERY': env.int('GENERATION_CACHE_EVICT_EVERY', default=100)},
+}
+
+# Generate the content fields in concurrent groups, short fields on a lighter model
+# (see fan_out_groups in apps/campaigns/services.py). Off by default: it costs more
+# input tokens, since every group sends the prompt.
+GENERATION_FAN_OUT = {
+    'ENABLED': env.bool('GENERATION_FAN_OUT', default=False),
+}
+
+# Each campaign's instructions and org/campaign objectives are sent once as a Gemini cached
+# content, and item calls only send their input (see apps/campaigns/promptcache.py).
+# Shorter prefixes than PROMPT_CACHE_MIN_TOKENS are not cached; the API refuses them.
+PROMPT_CACHE = {
+    'ENABLED': env.bool('PROMPT_CACHE_ENABLED', default=True),
+    'TTL': env.int('PROMPT_CACHE_TTL', default=60 * 60),
+    'MIN_TOKENS': env.int('PROMPT_CACHE_MIN_TOKENS', default=1024),
+}
+
+# Long generated content is stored compressed (see apps/campaigns/fields.py).
+# 'zstd' needs the optional zstandard package and otherwise falls back to 'zlib'.
+COMPRESSED_TEXT = {
+    'CODEC': env('COMPRESSED_TEXT_CODEC', default='zstd'),
+    'THRESHOLD': env.int('COMPRESSED_TEXT_THRESHOLD', default=256),
+}
+
+# Videos are uploaded in resumable chunks (see apps/campaigns/uploads.py).
+CHUNKED_UPLOADS = {
+    'CHUNK_SIZE': env.int('VIDEO_UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024),
+    'MAX_SIZE': env.int('VIDEO_UPLOAD_MAX_SIZE', default=5 * 1024 ** 3),
+}
+
+# Request and Gemini metrics, served at /metrics in the Prometheus format (see contentgen/metrics.py).
+# Every process on the host writes its totals to METRICS_DIRECTORY; /metrics is open to
+# staff users and to scrapers sending "Authorization: Bearer <METRICS_TOKEN>".
+METRICS = {
+    'TOKEN': env('METRICS_TOKEN', default=None),
+    'FLUSH_INTERVAL': env.float('METRICS_FLUSH_INTERVAL', default=5.0),
+}
+if env('METRICS_DIRECTORY', default=None):
+    METRICS['DIRECTORY'] = env('METRICS_DIRECTORY')
+
 # [START gaestd_py_django_csrf]
 # SECURITY WARNING: It's recommended that you use this when
 # running in production. The URL will be known once you first deploy
@@ -86,6 +158,8 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    # Lookups used by search.py on PostgreSQL (title__trigram_similar).
+    'django.contrib.postgres',
 
     # Third-Party Apps
     'tailwind',
@@ -104,6 +178,10 @@ INTERNAL_IPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Serves collected static files before sessions and auth are touched.
+    'contentgen.static.StaticFilesMiddleware',
+    # Times everything below it (static files are not measured); see contentgen/metrics.py.
+    'contentgen.metrics.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -146,6 +224,23 @@ DATABASES = {
     'default': env.db(),
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# locmem is per process. Cached pages stay correct anyway (their versions are kept
+# in the database), but with more than one worker a shared cache (e.g. redis:// or
+# memcache://) in CACHE_URL lets them share rendered pages.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Rendered dashboard and campaign pages, invalidated by versioned keys (see apps/campaigns/pagecache.py).
+# Set PAGE_CACHE_TIMEOUT to 0 to disable.
+PAGE_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': env.int('PAGE_CACHE_TIMEOUT', default=60 * 10),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -187,6 +282,17 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles' # For production 'collectstatic'
 
+# collectstatic writes content-hashed copies plus .gz/.br variants (brotli needs
+# the optional brotli package); see contentgen/static.py.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'contentgen.static.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Media files (User-uploaded content)
 # https://docs.djangoproject.com/en/5.2/topics/files/
 
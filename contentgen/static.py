@@ -0,0 +1,208 @@
+"""
+Static file pipeline: content-hashed names and precompressed variants written
+at collectstatic time, served in-process with far-future cache headers.
+
+    STORAGES['staticfiles'] = CompressedManifestStaticFilesStorage
+    MIDDLEWARE: StaticFilesMiddleware, right after SecurityMiddleware
+
+Files whose name carries a content hash (from staticfiles.json) can never
+change, so browsers are told to keep them for a year without revalidating;
+a repeat page load fetches no static bytes at all.
+"""
+import gzip
+import json
+import logging
+import mimetypes
+import os
+from urllib.parse import urlparse
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # Optional; only gzip variants are written without it.
+    brotli = None
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+# Text formats worth compressing; images, fonts and video already are.
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico', '.wasm',
+}
+# Smaller files gain nothing once headers are counted.
+MIN_COMPRESS_SIZE = 256
+
+# Content-Encoding -> file suffix, in order of preference.
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Unhashed names (e.g. referenced from outside the templates) may change on deploy.
+MUTABLE_CACHE_CONTROL = 'public, max-age=60'
+
+
+def compress_variants(content: bytes) -> dict[str, bytes]:
+    """Returns the br/gzip encodings of `content` that are actually smaller than it."""
+    variants = {'gzip': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(content, quality=11)
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(content)}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes `.gz` (and, with the brotli
+    package, `.br`) copies of text files next to the originals, for
+    StaticFilesMiddleware to serve.
+    """
+    # Before collectstatic has run (development, tests) the plain name is used.
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = {*paths, *self.hashed_files.values()}
+        compressed = sum(self._compress(name) for name in sorted(names))
+        logger.info(f"Wrote compressed variants of {compressed} static file(s).")
+
+    def _compress(self, name) -> int:
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS or not self.exists(name):
+            return 0
+        with self.open(name) as file:
+            content = file.read()
+        variants = compress_variants(content) if len(content) >= MIN_COMPRESS_SIZE else {}
+        for encoding, suffix in ENCODINGS.items():
+            # A leftover variant from an earlier run would be served in place of new content.
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            if encoding in variants:
+                self._save(name + suffix, ContentFile(variants[encoding]))
+        return int(bool(variants))
+
+
+def _accepted_encodings(header) -> set[str]:
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticFilesMiddleware:
+    """
+    Serves files under STATIC_URL from STATIC_ROOT before the rest of the
+    middleware runs, picking the brotli or gzip variant the client accepts.
+
+    STATIC_ROOT is indexed once per process, so serving a file costs no
+    filesystem lookups beyond the open(). Paths that are not in the index
+    are passed on, to runserver's finders in development or to a 404.
+
+    It runs natively under ASGI too: a sync-only middleware this high in the
+    stack would hold a thread for the whole of every request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.prefix = urlparse(settings.STATIC_URL or '').path
+        self.files = self.build_index(settings.STATIC_ROOT) if self.prefix and settings.STATIC_ROOT else {}
+
+    @staticmethod
+    def build_index(root) -> dict:
+        root = str(root)
+        try:
+            with open(os.path.join(root, 'staticfiles.json'), encoding='utf-8') as manifest:
+                hashed = set(json.load(manifest).get('paths', {}).values())
+        except (OSError, ValueError):
+            hashed = set()
+
+        files = {}
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                if name.endswith(tuple(ENCODINGS.values())) and os.path.exists(path.rsplit('.', 1)[0]):
+                    continue
+                stat = os.stat(path)
+                variants = {
+                    encoding: (path + suffix, os.path.getsize(path + suffix))
+                    for encoding, suffix in ENCODINGS.items()
+                    if os.path.exists(path + suffix)
+                }
+                content_type, _ = mimetypes.guess_type(name)
+                files[name] = {
+                    'variants': {'identity': (path, stat.st_size), **variants},
+                    'content_type': content_type or 'application/octet-stream',
+                    'etag': f'"{stat.st_size:x}-{int(stat.st_mtime):x}"',
+                    'last_modified': http_date(stat.st_mtime),
+                    'cache_control': IMMUTABLE_CACHE_CONTROL if name in hashed else MUTABLE_CACHE_CONTROL,
+                }
+        return files
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        entry = self.lookup(request)
+        if entry is not None:
+            return self.serve(request, entry)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        entry = self.lookup(request)
+        if entry is not None:
+            return self.serve(request, entry)
+        return await self.get_response(request)
+
+    def lookup(self, request):
+        """Returns the index entry for a static file request, or None."""
+        if request.path_info.startswith(self.prefix) and request.method in ('GET', 'HEAD'):
+            return self.files.get(request.path_info[len(self.prefix):])
+        return None
+
+    def serve(self, request, entry):
+        accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        encoding = next((name for name in ENCODINGS if name in accepted and name in entry['variants']), 'identity')
+        path, size = entry['variants'][encoding]
+        etag = entry['etag'] if encoding == 'identity' else f"{entry['etag'][:-1]}-{encoding}\""
+
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        elif request.method == 'HEAD':
+            response = HttpResponse(content_type=entry['content_type'])
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=entry['content_type'])
+            # FileResponse names the file it was given, which may be the .br/.gz copy.
+            del response['Content-Disposition']
+        if request.method == 'HEAD' and response.status_code == 200:
+            response['Content-Length'] = size
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+        if len(entry['variants']) > 1:
+            response['Vary'] = 'Accept-Encoding'
+        response['ETag'] = etag
+        response['Last-Modified'] = entry['last_modified']
+        response['Cache-Control'] = entry['cache_control']
+        return response
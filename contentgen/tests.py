@@ -0,0 +1,187 @@
+import gzip
+import json
+import os
+import tempfile
+import time
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from . import metrics
+from .secrets import load_secrets
+from .static import StaticFilesMiddleware
+
+
+class StaticPipelineTests(SimpleTestCase):
+    """
+    collectstatic writes hashed names plus compressed variants, and the
+    middleware serves them with the best encoding and immutable headers.
+    """
+    def setUp(self):
+        source = self.enterContext(tempfile.TemporaryDirectory())
+        self.root = self.enterContext(tempfile.TemporaryDirectory())
+        os.makedirs(os.path.join(source, 'css'))
+        self.css = 'body { color: #333; }\n' * 100 + '.logo { background: url("../img/logo.png"); }\n'
+        with open(os.path.join(source, 'css', 'site.css'), 'w') as file:
+            file.write(self.css)
+        os.makedirs(os.path.join(source, 'img'))
+        with open(os.path.join(source, 'img', 'logo.png'), 'wb') as file:
+            file.write(b'\x89PNG not really')
+
+        self.enterContext(override_settings(
+            DEBUG=False,
+            STATIC_ROOT=self.root,
+            STATICFILES_DIRS=[source],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+        ))
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(self.root, 'staticfiles.json')) as manifest:
+            self.hashed = json.load(manifest)['paths']['css/site.css']
+
+    def test_collectstatic_writes_hashed_names_and_variants(self):
+        self.assertRegex(self.hashed, r'^css/site\.[0-9a-f]{12}\.css$')
+        self.assertEqual(static('css/site.css'), f'/static/{self.hashed}')
+
+        with open(os.path.join(self.root, self.hashed), 'rb') as file:
+            content = file.read()
+        with gzip.open(os.path.join(self.root, self.hashed + '.gz')) as file:
+            self.assertEqual(file.read(), content)
+        # Images are not compressed again.
+        self.assertFalse([name for name in os.listdir(os.path.join(self.root, 'img')) if name.endswith('.gz')])
+
+    def test_hashed_files_are_served_compressed_and_immutable(self):
+        client = Client()
+        response = client.get(f'/static/{self.hashed}', headers={'Accept-Encoding': 'br;q=0, gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        body = b''.join(response.streaming_content)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertIn(b'color: #333', gzip.decompress(body))
+
+        # A client that revalidates anyway gets an empty 304.
+        response = client.get(f'/static/{self.hashed}', headers={'Accept-Encoding': 'gzip', 'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_plain_names_and_unknown_paths(self):
+        client = Client()
+        response = client.get('/static/css/site.css')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(b''.join(response.streaming_content).decode(), self.css)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(client.get('/static/css/missing.css').status_code, 404)
+
+    async def test_middleware_is_async_under_asgi(self):
+        middleware = StaticFilesMiddleware(mock.AsyncMock(return_value=HttpResponse('app')))
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(AsyncRequestFactory().get(f'/static/{self.hashed}'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        response.close()
+        response = await middleware(AsyncRequestFactory().get('/'))
+        self.assertEqual(response.content, b'app')
+
+
+class SecretsSnapshotTests(SimpleTestCase):
+    """
+    Secret Manager is only called when the local snapshot is missing or older
+    than the TTL, and a stale snapshot covers for a failed refresh.
+    """
+    def setUp(self):
+        self.path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'secrets.env')
+        self.fetch = self.enterContext(mock.patch('contentgen.secrets.fetch_secrets', return_value='SECRET_KEY=fresh\n'))
+
+    def load(self, **kwargs):
+        return load_secrets('project', 'django_settings', snapshot_path=self.path, ttl=60, **kwargs)
+
+    def age_snapshot(self, seconds):
+        stamp = time.time() - seconds
+        os.utime(self.path, (stamp, stamp))
+
+    def test_fresh_snapshot_is_reused(self):
+        self.assertEqual(self.load(), 'SECRET_KEY=fresh\n')
+        self.fetch.return_value = 'SECRET_KEY=rotated\n'
+        self.assertEqual(self.load(), 'SECRET_KEY=fresh\n')
+        self.assertEqual(self.fetch.call_count, 1)
+        self.assertEqual(os.stat(self.path).st_mode & 0o077, 0)
+
+        self.assertEqual(self.load(refresh=True), 'SECRET_KEY=rotated\n')
+        self.age_snapshot(61)
+        self.fetch.return_value = 'SECRET_KEY=expired\n'
+        self.assertEqual(self.load(), 'SECRET_KEY=expired\n')
+
+    def test_stale_snapshot_covers_for_a_failed_refresh(self):
+        self.load()
+        self.age_snapshot(3600)
+        self.fetch.side_effect = ConnectionError("unreachable")
+        with self.assertLogs('contentgen.secrets', 'WARNING'):
+            self.assertEqual(self.load(), 'SECRET_KEY=fresh\n')
+
+        os.remove(self.path)
+        with self.assertRaises(ConnectionError):
+            self.load()
+
+
+class MetricsTests(TestCase):
+    """
+    Requests get a Server-Timing breakdown, and /metrics adds up the totals
+    every process wrote to the metrics directory.
+    """
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(METRICS={
+            'DIRECTORY': self.directory, 'FLUSH_INTERVAL': 0, 'TOKEN': 'scrape-token',
+        }))
+        # Start from empty totals, as a new worker would.
+        metrics._reset_store()
+        self.user = User.objects.create_user(username='staff', password='pass12345', is_staff=True)
+
+    def scrape(self):
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode()
+
+    def test_server_timing_and_request_histograms(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('campaign-list'))
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+
+        text = self.scrape()
+        self.assertIn('# TYPE contentgen_http_request_duration_seconds histogram', text)
+        self.assertIn(
+            'contentgen_http_request_duration_seconds_count{method="GET",view="campaign-list",status="200"} 1', text
+        )
+        self.assertIn('contentgen_http_request_queries_bucket{view="campaign-list",le="+Inf"} 1', text)
+
+    def test_endpoint_needs_the_token_or_a_staff_user(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_totals_of_exited_processes_are_archived(self):
+        metrics.REQUEST_QUERIES.observe(3, view='example')
+        metrics.flush(force=True)
+        # A worker that has since exited (no process can have this pid).
+        with open(os.path.join(self.directory, '4194305-deadbeef.json'), 'w') as file:
+            json.dump({'contentgen_http_request_queries': {'["example"]': [0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 4.0]}}, file)
+
+        for _ in range(2):
+            totals = metrics.collect(self.directory)
+            self.assertEqual(totals['contentgen_http_request_queries']['["example"]'][-1], 7.0)
+        self.assertEqual(
+            sorted(name for name in os.listdir(self.directory) if name.endswith('.json')),
+            sorted([metrics.ARCHIVE_NAME, metrics._store.filename]),
+        )
+        text = metrics.render(totals)
+        self.assertIn('contentgen_http_request_queries_bucket{view="example",le="2.0"} 0', text)
+        self.assertIn('contentgen_http_request_queries_bucket{view="example",le="5.0"} 2', text)
+        self.assertIn('contentgen_http_request_queries_count{view="example"} 2', text)
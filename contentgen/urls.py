@@ -19,10 +19,15 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from .metrics import metrics_view
+
 urlpatterns = [
     # Django Admin
     path('admin/', admin.site.urls),
 
+    # Prometheus scrape endpoint (see contentgen/metrics.py)
+    path('metrics', metrics_view, name='metrics'),
+
     # User Authentication and Profiles
     # All URLs starting with 'accounts/' will be handled by the users app
     path('accounts/', include('apps.users.urls')),